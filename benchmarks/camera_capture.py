@@ -0,0 +1,136 @@
+"""
+Reads the camera in every capture mode of the camera manager and reports the frames per second and the cpu usage of
+the whole pipeline, this process and its ffmpeg children, on the device.
+
+Run from the repository root on the device, with the camera free:
+    python -m benchmarks.camera_capture [/dev/video0] [seconds]
+    direct: cv2.VideoCapture on the camera
+    pipe: an ffmpeg decoding the camera to a bgr24 rawvideo pipe
+    loopback: the ffmpeg to a v4l2loopback virtual camera and cv2.VideoCapture on it, the old pipeline
+The frames are read into a preallocated frame like the camera manager does, without other processing.
+
+The per frame cost of the rotation stage is measured on a synthetic frame for every rotation, with imutils.rotate
+the capture loop used before and with the FrameRotator writing into a preallocated frame. The per frame cost of a
+photo from an mjpeg frame is measured with the decode and encode of the other modes and the passthrough of the mjpeg
+mode. Both run without a camera.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import imutils
+import numpy as np
+import psutil
+
+from utils.camera_tools import (CAPTURE_MODES, LOOPBACK_CAPTURE, open_camera, create_virtual_cameras,
+                                remove_virtual_cameras, stream_to_virtual_camera)
+from constants.numbers import JPG_SAVE_QUALITY
+from utils.frame_rotation import FrameRotator
+from utils.mjpeg import decode, decode_preview, write_jpeg
+
+WIDTH, HEIGHT = 640, 480
+SECONDS = 20
+WARMUP = 3  # seconds, skipped before measuring
+ROTATIONS = (0, 90, 180, 270, 15)  # degrees
+REPEAT = 300
+
+
+def cpu_seconds(process):
+    """User and system cpu seconds of `process` and its running children."""
+    total = 0.0
+    for p in [process] + process.children(recursive=True):
+        try:
+            times = p.cpu_times()
+            total += times.user + times.system
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def measure(camera, mode, seconds):
+    virtual_camera = None
+    source = camera
+    if mode == LOOPBACK_CAPTURE:
+        virtual_cameras = create_virtual_cameras()
+        if not virtual_cameras:
+            return None
+        source = f"/dev/{virtual_cameras[0]}"
+        virtual_camera = stream_to_virtual_camera(camera, source, WIDTH, HEIGHT)
+        time.sleep(5)
+    try:
+        capture = open_camera(source, WIDTH, HEIGHT, mode)
+    except Exception as e:
+        logging.warning(f"Failed to open {source} in {mode} mode: {e}")
+        return None
+    try:
+        if not capture.isOpened():
+            return None
+        ret, frame = capture.read()
+        if not ret:
+            return None
+        slot = np.empty_like(frame)
+        warmup_end = time.monotonic() + WARMUP
+        while time.monotonic() < warmup_end:
+            capture.read(slot)
+
+        process = psutil.Process()
+        started, cpu_started = time.monotonic(), cpu_seconds(process)
+        frames = 0
+        while time.monotonic() - started < seconds:
+            ret, _ = capture.read(slot)
+            if not ret:
+                break
+            frames += 1
+        elapsed, cpu = time.monotonic() - started, cpu_seconds(process) - cpu_started
+        return frames / elapsed, cpu / elapsed, cpu / max(frames, 1), frame.shape
+    finally:
+        capture.release()
+        if virtual_camera is not None:
+            virtual_camera.kill()
+            virtual_camera.wait()
+            remove_virtual_cameras()
+
+
+def cost(function, frame):
+    """Seconds per frame of `function`."""
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        function(frame)
+    return (time.perf_counter() - started) / REPEAT
+
+
+if __name__ == "__main__":
+    frame = np.random.default_rng(0).integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    print(f"Rotation of a {WIDTH}x{HEIGHT} frame, per frame")
+    for angle in ROTATIONS:
+        rotator = FrameRotator(angle)
+        out = np.empty(rotator.output_shape(frame.shape), dtype=frame.dtype)
+        before = cost(lambda f: imutils.rotate(f, angle), frame)
+        after = cost(lambda f: rotator.rotate(f, out), frame)
+        print(f"    {angle:>8} | imutils.rotate: {before * 1000:6.3f} ms | rotator: {after * 1000:6.3f} ms")
+
+    scene = cv2.GaussianBlur(frame, (15, 15), 0)
+    jpeg = cv2.imencode(".jpg", scene, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].reshape(1, -1)
+    photo = os.path.join(tempfile.gettempdir(), "camera_capture.jpg")
+    print(f"Photo of a {WIDTH}x{HEIGHT} mjpeg frame of {jpeg.size / 1024:.0f}KB, per frame")
+    for name, function in (("decode", decode),
+                           ("decode preview", decode_preview),
+                           ("decode and imwrite", lambda j: cv2.imwrite(photo, decode(j),
+                                                                        [cv2.IMWRITE_JPEG_QUALITY, JPG_SAVE_QUALITY])),
+                           ("write_jpeg", lambda j: write_jpeg(photo, j, "2023-01-08 10:00:00 | NO FIX"))):
+        print(f"    {name:>18} | {cost(function, jpeg) * 1000:6.3f} ms")
+
+    camera = sys.argv[1] if len(sys.argv) > 1 else "/dev/video0"
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else SECONDS
+    print(f"{camera} at {WIDTH}x{HEIGHT} for {seconds:.0f} seconds, {psutil.cpu_count()} cpus")
+    for mode in CAPTURE_MODES:
+        result = measure(camera, mode, seconds)
+        if result is None:
+            print(f"    {mode:>8} | not available")
+            continue
+        fps, cpu, cpu_per_frame, shape = result
+        print(f"    {mode:>8} | {fps:5.1f} fps | cpu: {cpu:6.1%} | {cpu_per_frame * 1000:6.2f} ms cpu per frame | "
+              f"{shape[1]}x{shape[0]}")
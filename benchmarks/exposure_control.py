@@ -0,0 +1,127 @@
+"""
+Drives the exposure control of the camera with a simulated camera through brightness steps, a tunnel, clouds and
+a low sun, and compares the one step per frame update of the old pipeline with the exposure controller.
+
+Run from the repository root, no camera is needed:
+    python -m benchmarks.exposure_control
+The simulated brightness is the scene luminance times the exposure, saturated at 255 with noise, and a set exposure
+is applied two frames later like a usb camera does.
+    settle: seconds from a scene change until the brightness stays in EXPOSURE_TARGET +- EXPOSURE_BAND
+    in band: share of the frames in the band
+    sets: exposure changes sent to the camera
+    crossings: times the brightness left the band while the scene didn't change, oscillation
+"""
+import random
+
+import numpy as np
+
+from constants.numbers import EXPOSURE_TARGET, EXPOSURE_BAND
+from utils.exposure_controller import ExposureController, meter
+from utils.v4l2_controls import ControlRange, V4L2_EXPOSURE_MANUAL, V4L2_EXPOSURE_APERTURE_PRIORITY
+
+FPS = 30
+DELAY = 2  # frames until a set exposure is applied
+EXPOSURE_RANGE = ControlRange("Exposure (Absolute)", 3, 2047, 1, 250)
+# seconds of each scene and its luminance, the brightness of one unit of exposure
+SCENES = [(10, 0.45), (15, 0.07), (10, 0.45), (10, 1.6), (10, 0.3), (10, 0.06), (10, 0.45), (10, 0.6)]
+
+
+class SimulatedControls:
+    """The controls of a camera, with the interface of V4l2Controls."""
+
+    device = "simulated"
+
+    def __init__(self):
+        self.mode = V4L2_EXPOSURE_APERTURE_PRIORITY
+        self.exposure = EXPOSURE_RANGE.default
+        self.pending = []
+        self.set_count = 0
+
+    def get_exposure_mode(self):
+        return self.mode
+
+    def set_exposure_mode(self, mode):
+        self.mode = mode
+
+    def query_exposure(self):
+        return EXPOSURE_RANGE
+
+    def get_exposure(self):
+        return self.exposure
+
+    def set_exposure(self, exposure):
+        self.exposure = EXPOSURE_RANGE.clamp(int(exposure))
+        self.pending.append([DELAY, self.exposure])
+        self.set_count += 1
+        return self.exposure
+
+    def close(self):
+        pass
+
+
+class SimulatedCamera:
+    def __init__(self, controls, seed=1):
+        self.controls = controls
+        self.applied = controls.exposure
+        self.random = random.Random(seed)
+
+    def read(self, luminance):
+        for change in self.controls.pending:
+            change[0] -= 1
+            if change[0] == 0:
+                self.applied = change[1]
+        self.controls.pending = [change for change in self.controls.pending if change[0] > 0]
+        brightness = min(luminance * self.applied * self.random.uniform(0.97, 1.03), 255)
+        return np.full((480, 640, 3), brightness, dtype=np.uint8)
+
+
+def update_exposure(controls, frame, min_value=75, max_value=150):
+    """The exposure update of the old pipeline, one step per frame out of the band."""
+    mean = frame.mean()
+    if min_value < mean < max_value:
+        return
+    exposure = controls.get_exposure()
+    if not controls.get_exposure_mode() == V4L2_EXPOSURE_MANUAL:
+        controls.set_exposure_mode(V4L2_EXPOSURE_MANUAL)
+    if mean < min_value:
+        controls.set_exposure(exposure + 1)
+    elif mean > max_value:
+        controls.set_exposure(exposure - 1)
+
+
+def run(method):
+    controls = SimulatedControls()
+    camera = SimulatedCamera(controls)
+    controller = ExposureController(controls)
+    settle_times, in_band, crossings, frames = [], 0, 0, 0
+    for seconds, luminance in SCENES:
+        settled_at, was_in_band = None, None
+        for frame_number in range(seconds * FPS):
+            timestamp = frames / FPS
+            frame = camera.read(luminance)
+            if method == "controller":
+                controller.update(frame, timestamp)
+            else:
+                update_exposure(controls, frame)
+            inside = abs(meter(frame) - EXPOSURE_TARGET) <= EXPOSURE_BAND
+            in_band += inside
+            if inside and settled_at is None:
+                settled_at = frame_number / FPS
+            elif not inside and settled_at is not None:
+                if was_in_band:
+                    crossings += 1
+                settled_at = None
+            was_in_band = inside
+            frames += 1
+        settle_times.append(settled_at)
+    return settle_times, in_band / frames, controls.set_count, crossings, controller
+
+
+if __name__ == "__main__":
+    print(f"{len(SCENES)} scenes at {FPS} fps, target {EXPOSURE_TARGET} +- {EXPOSURE_BAND}")
+    for method in ("one step per frame", "controller"):
+        settle_times, in_band, sets, crossings, controller = run(method)
+        settles = " ".join(f"{t:5.1f}" if t is not None else "  ---" for t in settle_times)
+        print(f"    {method:>18} | settle (s): {settles} | in band: {in_band:6.1%} | sets: {sets:5} | "
+              f"crossings: {crossings}")
+    print(f"    controller stats: {controller.stats()}")
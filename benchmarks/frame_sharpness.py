@@ -0,0 +1,67 @@
+"""
+Measures the cost of scoring the sharpness of a 640x480 frame, which runs for every frame the camera reads, and
+checks that motion blurred frames score lower than the sharp one.
+
+Run from the repository root:
+    python -m benchmarks.frame_sharpness
+"""
+import time
+
+import cv2
+import numpy as np
+
+from utils.frame_quality import sharpness, downscale
+
+WIDTH, HEIGHT = 640, 480
+REPEAT = 300
+FRAME_INTERVAL = 1 / 30  # seconds
+
+
+def gradient_energy(frame, width=160):
+    """Mean squared sobel gradient, the other scorer considered."""
+    small = downscale(frame, width)
+    grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    dx = cv2.Sobel(grey, cv2.CV_32F, 1, 0)
+    dy = cv2.Sobel(grey, cv2.CV_32F, 0, 1)
+    return float(np.mean(dx * dx + dy * dy))
+
+
+def street_frame():
+    """Random blocks and lines, roughly the edges of a street scene."""
+    rng = np.random.default_rng(0)
+    frame = np.full((HEIGHT, WIDTH, 3), 90, np.uint8)
+    for _ in range(150):
+        x, y = int(rng.integers(0, WIDTH)), int(rng.integers(0, HEIGHT))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(frame, (x, y), (x + int(rng.integers(5, 80)), y + int(rng.integers(5, 80))), color, -1)
+    for _ in range(50):
+        points = rng.integers(0, (WIDTH, HEIGHT), (2, 2))
+        cv2.line(frame, tuple(map(int, points[0])), tuple(map(int, points[1])), (255, 255, 255), 2)
+    return frame
+
+
+def motion_blur(frame, length):
+    kernel = np.zeros((length, length), np.float32)
+    kernel[length // 2, :] = 1 / length
+    return cv2.filter2D(frame, -1, kernel)
+
+
+def cost(scorer, frame, **kwargs):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        scorer(frame, **kwargs)
+    return (time.perf_counter() - started) / REPEAT
+
+
+if __name__ == "__main__":
+    frame = street_frame()
+    frames = {f"blur {length:2} px": motion_blur(frame, length) for length in (3, 9, 25)}
+    frames = {"sharp": frame, **frames}
+    print(f"{WIDTH}x{HEIGHT} frames, one frame interval is {FRAME_INTERVAL * 1000:.1f} ms")
+    for name, scorer, kwargs in (("laplacian 160 px", sharpness, {"width": 160}),
+                                 ("laplacian 320 px", sharpness, {"width": 320}),
+                                 ("laplacian 640 px", sharpness, {"width": 640}),
+                                 ("gradient 160 px", gradient_energy, {})):
+        scores = " | ".join(f"{label}: {scorer(f, **kwargs):8.1f}" for label, f in frames.items())
+        milliseconds = cost(scorer, frame, **kwargs) * 1000
+        print(f"    {name:>16} | {milliseconds:6.3f} ms ({milliseconds / (FRAME_INTERVAL * 1000):5.1%}) | {scores}")
@@ -0,0 +1,85 @@
+"""
+Compares the parse throughput and the memory per instance of `GPSData` with the class it replaced, which parsed
+the dates and built the location dict of every fix when it was created.
+
+Run from the repository root:
+    python -m benchmarks.gps_data_parse
+"""
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from constants.gps_commands import GPS_DATA, FIX_DATA, NO_FIX_DATA
+from utils.gps_data import GPSData, ddm2dd
+
+PARSE_COUNT = 50000
+MEMORY_COUNT = 10000
+
+
+class EagerGPSData:
+    """The previous GPSData, without its methods."""
+
+    def __init__(self, gps_string):
+        self.gps_string = gps_string.strip("\r\n").strip("$GPSACP: ")
+        self.gps_data = self.gps_string.split(",")
+        self.UTC = self.gps_data[0]
+        self.lat = self.gps_data[1]
+        self.lat_dir = ""
+        self.lng = self.gps_data[2]
+        self.lng_dir = ""
+        self.hdop = self.gps_data[3]
+        self.altitude = self.gps_data[4]
+        self.fix = self.gps_data[5]
+        self.cog = self.gps_data[6]
+        self.spkm = self.gps_data[7]
+        self.spkn = self.gps_data[8]
+        self.date = self.gps_data[9]
+        self.nsat_gps = self.gps_data[10]
+        self.nsat_glonass = self.gps_data[11]
+
+        self.fix2d = self.fix in ("2", "3")
+        self.fix3d = self.fix == "3"
+
+        if self.fix2d:
+            self.fix = int(self.fix)
+            self.UTC_date = datetime.strptime(self.date + self.UTC, "%d%m%y%H%M%S.%f")
+            self.local_date = self.UTC_date.replace(tzinfo=timezone.utc).astimezone(tz=None)
+            self.local_date_str = self.local_date.strftime("%y%m%d-%H%M%S")
+            self.lat_dir = self.lat[-1]
+            self.lat = ddm2dd(self.lat[:-1])
+            self.lng_dir = self.lng[-1]
+            self.lng = ddm2dd(self.lng[:-1])
+            self.gps_location = {"lat": self.lat, "lng": self.lng}
+            self.altitude = float(self.altitude)
+            self.hdop = float(self.hdop)
+            self.cog = float(self.cog)
+            self.spkm = float(self.spkm)
+            self.spkn = float(self.spkn)
+            self.nsat_gps = int(self.nsat_gps)
+            self.nsat_glonass = int(self.nsat_glonass)
+
+
+def parse_rate(cls, gps_string):
+    started = time.perf_counter()
+    for _ in range(PARSE_COUNT):
+        cls(gps_string)
+    return PARSE_COUNT / (time.perf_counter() - started)
+
+
+def instance_size(cls, gps_string):
+    gps_strings = [gps_string[:-2] + str(i % 10) + "\r\n" for i in range(MEMORY_COUNT)]  # no shared strings
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [cls(s) for s in gps_strings]
+    size = (tracemalloc.get_traced_memory()[0] - before) / len(instances)
+    tracemalloc.stop()
+    return size
+
+
+if __name__ == "__main__":
+    for name, gps_string in (("fix", GPS_DATA + FIX_DATA), ("no fix", GPS_DATA + NO_FIX_DATA)):
+        print(f"{name}:")
+        for cls in (EagerGPSData, GPSData):
+            print(f"    {cls.__name__:>12} | {parse_rate(cls, gps_string):9.0f} parses/s | "
+                  f"{instance_size(cls, gps_string):6.0f} bytes per instance")
+    print("GPSData.no_fix() is shared, the placeholder costs nothing after the first one.")
@@ -0,0 +1,86 @@
+"""
+Measures the per-request latency of a new connection per request (module level `requests.post`)
+against the pooled keep-alive sessions of `utils.request_handler`, on a local stand-in HTTP server.
+The server can delay every new connection to stand in for the tcp and tls handshakes over a cellular link.
+
+Run from the repository root:
+    python -m benchmarks.http_session
+"""
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import utils.request_handler as rh
+
+REQUEST_COUNT = 100
+CONNECT_DELAYS = (0, 0.15)  # seconds, about 3 round trips of a cellular link
+PAYLOAD = {"date": "2023-01-08 17:43:13", "lat": "40.787670", "lng": "29.440515", "speed": "4.7"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connect_delay = 0
+
+    def setup(self):
+        time.sleep(self.connect_delay)
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps("success").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(post, url, thread_count=1):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        for _ in range(count):
+            start_time = time.perf_counter()
+            response = post(url=url, json=PAYLOAD, timeout=5)
+            elapsed = time.perf_counter() - start_time
+            assert response.status_code == 200
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(REQUEST_COUNT // thread_count,)) for _ in range(thread_count)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - start_time
+    latencies.sort()
+    return (statistics.mean(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000,
+            len(latencies) / total_time)
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server_url = f"http://127.0.0.1:{server.server_address[1]}/uploadGarbageDeviceLocations/test"
+
+    for connect_delay in CONNECT_DELAYS:
+        Handler.connect_delay = connect_delay
+        for threads in (1, 4):
+            for name, post_function in (("requests.post", requests.post), ("request_handler.post", rh.post)):
+                rh.close_sessions()
+                mean, p95, rate = measure(post_function, server_url, threads)
+                print(f"connect delay: {connect_delay * 1000:3.0f} ms | {name:>20} | {threads} threads | "
+                      f"mean: {mean:7.2f} ms | p95: {p95:7.2f} ms | {rate:7.1f} req/s")
+
+    rh.close_sessions()
+    server.shutdown()
@@ -0,0 +1,70 @@
+"""
+Compares the closest garbage location lookup of `tools.check_locations` with `LocationIndex` and `LocationArray`.
+
+Run from the repository root:
+    python -m benchmarks.location_lookup
+"""
+import random
+import time
+
+from tools import check_locations
+from utils.location_array import LocationArray
+from utils.location_index import LocationIndex
+
+CENTER = (40.78843793216758, 29.44000664126109)
+SPREAD = 0.3  # degrees, roughly a 30 km wide city
+QUERY_COUNT = 200
+
+
+class FakeGPSData:
+    def __init__(self, lat, lng):
+        self.gps_location = {"lat": lat, "lng": lng}
+
+
+def random_locations(count):
+    return [{"id": str(i),
+             "lat": str(round(CENTER[0] + random.uniform(-SPREAD, SPREAD), 6)),
+             "lng": str(round(CENTER[1] + random.uniform(-SPREAD, SPREAD), 6))}
+            for i in range(count)]
+
+
+def run(count):
+    locations = random_locations(count)
+    queries = [FakeGPSData(CENTER[0] + random.uniform(-SPREAD, SPREAD),
+                           CENTER[1] + random.uniform(-SPREAD, SPREAD)) for _ in range(QUERY_COUNT)]
+    query_count = QUERY_COUNT if count <= 10000 else QUERY_COUNT // 10
+
+    start_time = time.perf_counter()
+    index = LocationIndex(locations)
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    linear_results = [check_locations(gps_data, locations) for gps_data in queries[:query_count]]
+    linear_time = (time.perf_counter() - start_time) / query_count
+
+    start_time = time.perf_counter()
+    index_results = [index.nearest(gps_data.gps_location) for gps_data in queries]
+    index_time = (time.perf_counter() - start_time) / len(queries)
+
+    array = LocationArray(locations)
+    start_time = time.perf_counter()
+    array_results = [array.closest(gps_data.gps_location) for gps_data in queries]
+    array_time = (time.perf_counter() - start_time) / len(queries)
+
+    for (linear_distance, linear_id), (index_distance, location), (array_distance, array_index) in zip(
+            linear_results, index_results, array_results):
+        assert linear_distance == index_distance and linear_id == location["id"]
+        assert array_distance == linear_distance and array.ids[array_index] == linear_id
+
+    print(f"{count:>7} locations | "
+          f"build: {build_time * 1000:8.1f} ms | "
+          f"check_locations: {linear_time * 1000:8.3f} ms | "
+          f"LocationArray: {array_time * 1000:7.3f} ms | "
+          f"LocationIndex.nearest: {index_time * 1000:6.3f} ms | "
+          f"speedup: {linear_time / array_time:6.1f}x / {linear_time / index_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    for location_count in (1000, 10000, 100000):
+        run(location_count)
@@ -0,0 +1,171 @@
+"""
+Replays gps tracks through the distance check of the recorder, once with the raw fixes and once with the
+predictions of the position filter, and scores the captures at the containers.
+
+Run from the repository root, with the daily segments of LOCATION_RECORDS or the given segments:
+    python -m benchmarks.proximity_replay [_location_records/2023-01-08.trk ...]
+Recorded tracks have no ground truth, they are compared with the track smoothed offline by a centered moving
+average of REFERENCE_WINDOW fixes. The containers are read from the garbage list, or put at the stops of the track
+when there is no list. A synthetic drive with multipath jumps, compared with its noise-free track, is replayed when
+there are no records.
+
+A visit is a time the reference is closer than MAX_DISTANCE to a container below SPEED_LIMIT.
+    hit: the check triggered for the container during the visit
+    miss: it didn't
+    flicker: trigger changes during the visits, a steady check has one per visit
+    false: seconds the check triggered while the reference was out of the distance
+"""
+import glob
+import math
+import random
+import sys
+
+import numpy as np
+
+from constants.folders import LOCATION_RECORDS
+from utils.garbage_list_getter import read_garbage_list
+from utils.location_array import haversine
+from utils.location_index import LocationIndex
+from utils.position_filter import PositionFilter
+from utils.track_store import RECORD_DTYPE, RECORD_MARKER, SEGMENT_EXTENSION, read_segment, record_to_gps_data
+
+MAX_DISTANCE = 30  # meters, maximum_garbage_distance of the device config
+SPEED_LIMIT = 5  # km/h
+TICK = 0.2  # seconds between the checks, GPS_FILTER_INTERVAL
+REFERENCE_WINDOW = 9  # fixes
+
+
+def synthetic_drive(seconds=1800, seed=1):
+    """Return noisy records with multipath jumps and the noise-free reference, one fix per second."""
+    random.seed(seed)
+    lat, lng = 40.78843793216758, 29.44000664126109
+    course, speed = 90.0, 0.0
+    records = np.zeros(seconds, dtype=RECORD_DTYPE)
+    reference = np.zeros(seconds, dtype=RECORD_DTYPE)
+    jump = (0, 0, 0)  # seconds left, north and east offset in meters
+    for second in range(seconds):
+        phase = second % 120
+        if phase < 10:
+            speed = max(speed - 5, 0)  # stop at a container for 30 seconds
+        elif phase < 40:
+            speed = 0
+        else:
+            speed = min(speed + 5, 35)
+        if second % 600 == 300:
+            course = (course + 90) % 360
+        meters = speed / 3.6
+        lat += meters * math.cos(math.radians(course)) / 111195
+        lng += meters * math.sin(math.radians(course)) / (111195 * math.cos(math.radians(lat)))
+        hdop = 1.0
+        if jump[0] == 0 and random.random() < 0.04:
+            angle = random.uniform(0, 2 * math.pi)
+            distance = random.uniform(20, 45)
+            jump = (random.randint(2, 5), distance * math.cos(angle), distance * math.sin(angle))
+        north, east = random.gauss(0, 3), random.gauss(0, 3)
+        if jump[0] > 0:
+            hdop = 2.5
+            north, east = north + jump[1], east + jump[2]
+            jump = (jump[0] - 1, jump[1], jump[2])
+        timestamp = 1673168400.0 + second
+        reference[second] = (timestamp, lat, lng, speed, course % 360, 1.0, 3, RECORD_MARKER)
+        records[second] = (timestamp, lat + north / 111195, lng + east / (111195 * math.cos(math.radians(lat))),
+                           max(speed + random.gauss(0, 1), 0), course % 360, hdop, 3, RECORD_MARKER)
+    return records, reference
+
+
+def smoothed(records, window=REFERENCE_WINDOW):
+    reference = records.copy()
+    kernel = np.ones(window) / window
+    for field in ("lat", "lng", "speed"):
+        padded = np.pad(records[field].astype(float), window // 2, mode="edge")
+        reference[field] = np.convolve(padded, kernel, mode="valid")
+    return reference
+
+
+def stop_containers(reference, offset=8):
+    """Put a container next to every place the reference track stops."""
+    containers = []
+    stopped = False
+    for record in reference:
+        if record["speed"] < 1 and not stopped:
+            lat = float(record["lat"]) + offset / 111195
+            if all(haversine(lat, float(record["lng"]), c["lat"], c["lng"]) > 2 * MAX_DISTANCE for c in containers):
+                containers.append({"id": str(len(containers)), "lat": lat, "lng": float(record["lng"])})
+        stopped = record["speed"] < 1
+    return containers
+
+
+def position_at(records, timestamp):
+    """Interpolated (lat, lng, speed) of the records at `timestamp`."""
+    times = records["time"]
+    return tuple(float(np.interp(timestamp, times, records[field])) for field in ("lat", "lng", "speed"))
+
+
+def replay(records, reference, containers, use_filter):
+    index = LocationIndex(containers)
+    position_filter = PositionFilter()
+    fixes = [record_to_gps_data(record) for record in records]
+    next_fix = 0
+    visits = {}  # container id -> list of [hit, flicker]
+    in_visit = {}
+    triggered = {}
+    false_seconds = 0
+    timestamp = float(records["time"][0])
+    while timestamp <= records["time"][-1]:
+        while next_fix < len(fixes) and records["time"][next_fix] <= timestamp:
+            position_filter.update(fixes[next_fix], float(records["time"][next_fix]))
+            next_fix += 1
+        fix = fixes[next_fix - 1]
+        location = fix.gps_location
+        if use_filter:
+            prediction = position_filter.predict(timestamp)
+            if prediction is not None:
+                location = {"lat": prediction[0], "lng": prediction[1]}
+        distance, container = index.nearest(location)
+        check = container["id"] if container is not None and distance < MAX_DISTANCE and fix.spkm < SPEED_LIMIT \
+            else None
+
+        lat, lng, speed = position_at(reference, timestamp)
+        for c in containers:
+            visiting = speed < SPEED_LIMIT and haversine(lat, lng, c["lat"], c["lng"]) < MAX_DISTANCE
+            if visiting and not in_visit.get(c["id"]):
+                visits.setdefault(c["id"], []).append([False, 0])
+            in_visit[c["id"]] = visiting
+            if visiting:
+                visit = visits[c["id"]][-1]
+                visit[0] |= check == c["id"]
+                if (check == c["id"]) != triggered.get(c["id"], False):
+                    visit[1] += 1
+        if check is not None and not in_visit.get(check):
+            reference_distance = haversine(lat, lng, container["lat"], container["lng"])
+            if reference_distance >= MAX_DISTANCE:
+                false_seconds += TICK
+        for c in containers:
+            triggered[c["id"]] = check == c["id"]
+        timestamp += TICK
+    all_visits = [visit for container_visits in visits.values() for visit in container_visits]
+    hits = sum(visit[0] for visit in all_visits)
+    return hits, len(all_visits) - hits, sum(visit[1] for visit in all_visits), false_seconds, \
+        position_filter.rejected_count
+
+
+def report(name, records, reference, containers):
+    print(f"{name}: {len(records)} fixes, {len(containers)} containers")
+    for method, use_filter in (("raw fixes", False), ("position filter", True)):
+        hits, misses, flicker, false_seconds, rejected = replay(records, reference, containers, use_filter)
+        print(f"    {method:>15} | hit: {hits:4} | miss: {misses:4} | flicker: {flicker:5} | "
+              f"false: {false_seconds:6.1f} s" + (f" | skipped jumps: {rejected}" if use_filter else ""))
+
+
+if __name__ == "__main__":
+    record_files = sys.argv[1:] or sorted(glob.glob(LOCATION_RECORDS + "*" + SEGMENT_EXTENSION))
+    garbage_list = read_garbage_list() if record_files else []
+    for record_file in record_files:
+        records = read_segment(record_file)
+        if len(records) < REFERENCE_WINDOW:
+            continue
+        reference = smoothed(records)
+        report(record_file, records, reference, garbage_list or stop_containers(reference))
+    if not record_files:
+        records, reference = synthetic_drive()
+        report("synthetic drive", records, reference, stop_containers(reference))
@@ -0,0 +1,123 @@
+"""
+Replays recorded gps tracks through the upload filters and reports how many points would be uploaded
+and how far the uploaded track is from the recorded one.
+
+Run from the repository root, with the daily segments of LOCATION_RECORDS or the given segments (or old text files):
+    python -m benchmarks.track_simplify [_location_records/2023-01-08.trk ...]
+A synthetic drive is replayed when there are no records.
+"""
+import glob
+import math
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+from constants.folders import LOCATION_RECORDS
+from constants.numbers import GPS_UPLOAD_MIN_DISTANCE
+from utils.gps_data import GPSData, dd2ddm
+from utils.location_array import haversine
+from utils.track_simplifier import TrackSimplifier, to_xy, segment_distance
+from utils.track_store import SEGMENT_EXTENSION, read_segment, record_to_gps_data
+
+
+def read_records(file_path):
+    if file_path.endswith(SEGMENT_EXTENSION):
+        return [record_to_gps_data(record) for record in read_segment(file_path)]
+    track = []
+    with open(file_path) as f:
+        for line in f:
+            gps_string = line.split(": ", 1)[-1]
+            try:
+                gps_data = GPSData(gps_string)
+            except (ValueError, IndexError):
+                continue
+            if gps_data.is_valid():
+                track.append(gps_data)
+    return track
+
+
+def synthetic_track(seconds=1800):
+    random.seed(0)
+    lat, lng = 40.78843793216758, 29.44000664126109
+    course, speed = 90.0, 30.0
+    date = datetime(2023, 1, 8, 9, 0, 0, tzinfo=timezone.utc)
+    track = []
+    for second in range(seconds):
+        phase = second % 300
+        if phase < 20:
+            speed = max(speed - 3, 0)  # stop at a container
+        elif phase < 40:
+            speed = 0
+        elif phase < 60:
+            speed = min(speed + 3, 40)
+        if phase == 150:
+            course = (course + 90) % 360  # turn
+        course += random.uniform(-1, 1)
+        meters = speed / 3.6
+        lat += meters * math.cos(math.radians(course)) / 111195
+        lng += meters * math.sin(math.radians(course)) / (111195 * math.cos(math.radians(lat)))
+        noisy_lat = lat + random.gauss(0, 3) / 111195
+        noisy_lng = lng + random.gauss(0, 3) / 111195
+        utc = date + timedelta(seconds=second)
+        gps_string = (f"{utc.strftime('%H%M%S')}.000,{dd2ddm(noisy_lat)}N,{dd2ddm(noisy_lng)}E,1.2,100.0,3,"
+                      f"{course % 360:.1f},{max(speed + random.uniform(-1, 1), 0):.1f},{speed / 1.852:.1f},"
+                      f"{utc.strftime('%d%m%y')},08,04")
+        track.append(GPSData(gps_string))
+    return track
+
+
+def distance_filter(track, min_distance=20):
+    kept = []
+    for gps_data in track:
+        if kept and haversine(kept[-1].lat, kept[-1].lng, gps_data.lat, gps_data.lng) < min_distance:
+            continue
+        kept.append(gps_data)
+    return kept
+
+
+def simplify(track):
+    simplifier = TrackSimplifier()
+    kept = []
+    for gps_data in track:
+        kept += simplifier.push(gps_data, gps_data.local_date.timestamp())
+    return kept + simplifier.flush()
+
+
+def max_deviation(track, kept, min_distance=0):
+    """
+    Largest distance in meters of a recorded point to the uploaded track between the same times, skipping the points
+    closer than `min_distance` to the last uploaded one.
+    """
+    kept_index = {id(gps_data): i for i, gps_data in enumerate(kept)}
+    deviation = 0
+    segment = 0
+    for gps_data in track:
+        if id(gps_data) in kept_index:
+            segment = kept_index[id(gps_data)]
+            continue
+        if segment + 1 >= len(kept):
+            break
+        start, end = kept[segment], kept[segment + 1]
+        if math.hypot(*to_xy(start, gps_data)) < min_distance:
+            continue
+        distance = segment_distance(to_xy(start, gps_data), (0, 0), to_xy(start, end))
+        deviation = max(deviation, distance)
+    return deviation
+
+
+def report(name, track):
+    print(f"{name}: {len(track)} valid points")
+    for filter_name, filter_function in (("20 m filter", distance_filter), ("track simplifier", simplify)):
+        kept = filter_function(track)
+        print(f"    {filter_name:>16} | uploaded: {len(kept):6} | "
+              f"compression: {len(track) / max(len(kept), 1):6.1f}x | "
+              f"max deviation: {max_deviation(track, kept):6.1f} m | "
+              f"further than {GPS_UPLOAD_MIN_DISTANCE} m: {max_deviation(track, kept, GPS_UPLOAD_MIN_DISTANCE):6.1f} m")
+
+
+if __name__ == "__main__":
+    record_files = sys.argv[1:] or sorted(glob.glob(LOCATION_RECORDS + "*" + SEGMENT_EXTENSION))
+    for record_file in record_files:
+        report(record_file, read_records(record_file))
+    if not record_files:
+        report("synthetic drive", synthetic_track())
@@ -5,5 +5,6 @@ atiknakit_failed_locations = "_atiknakit_failed_locations.json"
 uploaded_files = "_uploaded_files.json"
 garbage_location_list_file = "_garbage_locations.json"
 FAILED_GPS_UPLOADS = "_failed_gps_uploads.json"
+UPLOAD_OUTBOX = "_upload_outbox.db"
 
 # arial_font = "fonts/arial.ttf"
@@ -9,3 +9,8 @@ OK = "OK\r\n"
 NO_FIX_DATA = ",,,,,1,,,,,,\r\n"
 FIX_DATA = "174313.000,4047.2602N,02926.4309E,6.8,157.7,3,114.0,4.7,2.6,080123,03,01\r\n"
 MANUEL_FIX_DATA = "{},{}N,{}E,6.8,157.7,3,114.0,4.7,2.6,{},03,01\r\n"
+START_STREAM = "AT$GPSNMUN=1,1,0,0,0,1,0\r\n"  # push GGA and RMC sentences every second
+STOP_STREAM = "AT$GPSNMUN=0\r\n"
+STREAM_DATA = "$GPSNMUN: "
+STREAM_MODE = "stream"
+POLL_MODE = "poll"
@@ -8,3 +8,71 @@ MB = 1024 * 1024
 atiknakit_server_port = 8181
 atiknakit_server_timeout = 60
 socket_buffer_size = 127
+JOURNAL_SYNC_COUNT = 50  # fsync the json journals every 50 records
+JOURNAL_SYNC_INTERVAL = 10  # or every 10 seconds
+JOURNAL_INDEX_SIZE = 10000  # records the dedup index of a journal remembers
+JOURNAL_COMPACT_SIZE = 1024 * 1024  # consumed bytes of a journal before it is compacted
+FAILED_LOCATIONS_CHUNK_SIZE = 500
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_RETRY_WAIT = 60  # first retry after 1 minute, doubled on every failure
+OUTBOX_MAX_RETRY_WAIT = 60 * 60  # 1 hour
+UPLOAD_CONCURRENCY = {"image_api": 4, "cdn": 1, "location_api": 1}  # parallel uploads per endpoint
+HTTP_POOL_SIZE = 8  # connections kept alive per host
+HTTP_RETRIES = 2
+HTTP_BACKOFF = 0.5  # seconds, doubled on every retry
+HTTP_KEEPALIVE_IDLE = 30  # seconds before the first tcp keepalive probe
+CONNECTIVITY_FAST_INTERVAL = 5  # seconds between connection probes after a failure
+CONNECTIVITY_SLOW_INTERVAL = 120  # seconds between connection probes while the connection is stable
+GPS_UPLOAD_QUEUE_SIZE = 600  # gps points waiting for upload, the rest is spilled to the outbox
+GPS_UPLOAD_BATCH_SIZE = 30
+GPS_UPLOAD_MAX_LATENCY = 10  # seconds a gps point can wait for its batch
+GPS_UPLOAD_MIN_DISTANCE = 20  # meters between uploaded gps points
+TRACK_TOLERANCE = 10  # meters a simplified gps track can be away from the real one
+TRACK_MAX_DELAY = 60  # seconds, at least one gps point is uploaded in every minute
+TRACK_STOP_SPEED = 3  # km/h
+TRACK_SPEED_CHANGE = 15  # km/h
+TRACK_MAX_BUFFER = 120  # gps points
+GPS_STREAM_TIMEOUT = 10  # seconds without a streamed gps fix before falling back to polling
+GPS_STREAM_RETRY = 5 * 60  # seconds of polling before streaming is tried again
+TRACK_STORE_FLUSH_INTERVAL = 10  # seconds the gps records are buffered before they are written
+TRACK_STORE_BUFFER_SIZE = 100  # gps records, written earlier when the buffer is full
+GPS_HISTORY_SIZE = 5 * 60  # fixes kept in memory, 5 minutes of streamed fixes
+GPS_HISTORY_MAX_GAP = 5  # seconds, fixes further apart are not interpolated
+GPS_FILTER_UERE = 4  # meters of position error per hdop
+GPS_FILTER_ACCELERATION = 1.5  # m/s^2, how fast the filter follows speed changes
+GPS_FILTER_SPEED_ERROR = 1  # m/s
+GPS_FILTER_GATE = 13.8  # squared mahalanobis distance, 99.9% of the fixes of a 2d normal error are inside
+GPS_FILTER_MAX_REJECTED = 3  # fixes out of the gate skipped in a row, the next one is a real move
+GPS_FILTER_MAX_GAP = 10  # seconds without a fix before the position filter starts again
+GPS_FILTER_INTERVAL = 0.2  # seconds between the predicted positions used by the recorder
+CAPTURE_COUNT = 3  # frames captured at the closest approach of a location
+CAPTURE_STEP = 10  # meters between the frames of the step capture policy
+GEOFENCE_EXIT_MARGIN = 10  # meters over maximum_garbage_distance to leave a location
+GEOFENCE_EXIT_TIME = 5  # seconds out of the exit distance to leave a location
+GEOFENCE_DWELL_TIME = 10  # seconds standing still to dwell at a location
+GEOFENCE_DWELL_SPEED = 1  # km/h, the vehicle stands still below it
+GEOFENCE_DWELL_TREND = 0.3  # m/s, the vehicle stands still while its distance changes slower
+GEOFENCE_TREND_MARGIN = 3  # meters the distance grows over its minimum when the closest approach is passed
+GEOFENCE_CAPTURE_DELAY = 3  # seconds after the closest approach it is captured at the latest
+FRAME_BUFFER_SIZE = 30  # frames published by the camera to its subscribers, ~1 second at 30 fps
+CAPTURE_WINDOW = 1.5  # seconds before and after the best time of a capture to choose the frames from
+CAPTURE_SPACING = 1  # seconds between the frames of a capture
+PHOTO_NAME_HISTORY = 100  # photo names remembered, a photo named like one of them gets a -n suffix
+FRAME_HISTORY_INTERVAL = 0.2  # seconds, the sharpest frame of every interval is kept for the captures
+# frames kept for the captures, from the latest capture decision to the start of its window with a second to spare,
+# ~28 frames and ~26MB at 640x480, pinned in as many more slots of the frame buffer
+FRAME_HISTORY_SIZE = int((GEOFENCE_CAPTURE_DELAY + CAPTURE_WINDOW + 1) / FRAME_HISTORY_INTERVAL) + 1
+SHARPNESS_WIDTH = 160  # pixels, frames are scored downscaled to this width
+DEDUP_THRESHOLD = 6  # bits of 64, photos of a location with closer hashes are duplicates
+DEDUP_MAX_LOCATIONS = 50  # locations the photo hashes are kept for
+DEDUP_MAX_HASHES = MAX_PHOTO_COUNT  # photo hashes kept per location
+ENCODER_WORKERS = 2  # threads encoding and saving the photos
+ENCODER_QUEUE_SIZE = 8  # photos waiting for the encoder, see encoder_drop_policy
+EXPOSURE_TARGET = 112  # mean brightness of the frames the exposure is kept at
+EXPOSURE_BAND = 37  # brightness difference to the target the exposure is corrected over
+EXPOSURE_SETTLE_BAND = 10  # brightness difference to the target the correction stops under
+EXPOSURE_KP = 0.3  # proportional gain of the exposure controller, on the log of the exposure
+EXPOSURE_KI = 2  # 1/s, integral gain of the exposure controller
+EXPOSURE_INTERVAL = 0.2  # seconds between the exposure changes, the camera applies a change in a few frames
+EXPOSURE_METER_STEP = 8  # pixels, the brightness is metered on every 8th pixel of every 8th row
+EXPOSURE_RETRY = 60  # seconds the exposure isn't changed after a control error
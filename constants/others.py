@@ -1,3 +1,7 @@
 file_upload_type = "garbagedevice"
 byte_seperator = b"$"
 alive_byte = byte_seperator + b"k" + byte_seperator
+capture_policy = "closest"  # "closest": frames at the closest approach, "step": a frame every CAPTURE_STEP meters
+encoder_drop_policy = "oldest"  # photo dropped when the encoder queue is full: "oldest" queued one or the "newest"
+camera_capture_mode = "direct"  # "direct": the camera device, "pipe": an ffmpeg rawvideo pipe, "loopback": a virtual camera
+# "mjpeg": the compressed frames of the camera device, photos are saved without encoding them again
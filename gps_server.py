@@ -1,40 +1,84 @@
+"""
+Fake gps modem to test GpsReader against a pty, e.g. one end of `socat -d -d pty,raw,echo=0 pty,raw,echo=0`
+with the other end set as gps_settings.port:
+    python gps_server.py --port /dev/pts/3
+It answers AT and AT$GPSACP (poll mode) and pushes GGA and RMC sentences every second after AT$GPSNMUN=1
+(stream mode) until AT$GPSNMUN=0. With --nmea-port raw NMEA is pushed to a second pty all the time, set the other end
+of that pair as gps_settings.nmea_port.
+"""
+import argparse
+import time
 from datetime import datetime, timezone
 
+from utils.device_config import Dict2Class
 from utils.serial_connection import SerialConnection
-from threading import Thread
+from threading import Thread, Lock
 from constants.gps_commands import *
 from utils.gps_data import dd2ddm
+from utils.nmea import make_rmc, make_gga
+
+
+def fake_fix(gps_location=(40.78843793216758, 29.44000664126109)):
+    lat, lng = map(dd2ddm, gps_location)
+    now = datetime.now(timezone.utc)
+    return now.strftime("%H%M%S.%f")[:10], f"{lat:09.4f}N", f"{lng:010.4f}E", now.strftime("%d%m%y")
 
 
 class Server(SerialConnection, Thread):
-    def __init__(self, port, baudrate, timeout):
+    def __init__(self, port, baudrate, timeout, nmea_port=None):
         Thread.__init__(self, daemon=True, name="Server")
-        SerialConnection.__init__(self, port, baudrate, timeout)
+        SerialConnection.__init__(self, Dict2Class({"port": port, "baudrate": baudrate, "timeout": timeout}))
+
+        self._nmea = None
+        if nmea_port:
+            self._nmea = SerialConnection(Dict2Class({"port": nmea_port, "baudrate": baudrate, "timeout": timeout}))
+        self._write_lock = Lock()
+        self.streaming = False
 
         self.running = True
+        Thread(target=self.push, daemon=True, name="ServerPush").start()
         self.start()
 
+    def reply(self, *lines):
+        with self._write_lock:
+            for line in lines:
+                self.send_command(line, wait=0)
+
+    def push(self):
+        while self.running:
+            time.sleep(1)
+            utc, lat, lng, date = fake_fix()
+            sentences = (make_gga(utc, lat, lng, satellites=3, hdop=6.8, altitude=157.7),
+                         make_rmc(utc, lat, lng, speed_knots=2.6, course=114.0, date=date))
+            if self.streaming:
+                self.reply(*[STREAM_DATA + sentence for sentence in sentences])
+            if self._nmea is not None:
+                for sentence in sentences:
+                    self._nmea.send_command(sentence, wait=0)
+
     def run(self):
         while self.running:
             data = self.read_data()
-            print(f"{datetime.now().strftime('%H:%M:%S')}: {data.encode()}")
             if not data:
-                self.close()
-            elif data.startswith(AT):
-                self.send_command(OK)
+                continue  # the reader doesn't send commands while it is streaming
+            print(f"{datetime.now().strftime('%H:%M:%S')}: {data.encode()}")
+            if data.startswith(AT):
+                self.reply(OK)
             elif data.startswith(POWER_UP):
-                self.send_command(OK)
+                self.reply(OK)
             elif data.startswith(GET_GPS_DATA):
-                gps_location = "40.78843793216758,29.44000664126109".split(",")
-                lat, lng = map(dd2ddm, gps_location)
-                local_time = datetime.utcnow().strftime("%H%M%S.%f")
-                local_date = datetime.now().strftime("%d%m%y")
-                fix_data = MANUEL_FIX_DATA.format(local_time, lat, lng, local_date)
-                self.send_command(GPS_DATA + fix_data)
-                self.send_command(LINE)
-                self.send_command(OK)
+                utc, lat, lng, date = fake_fix()
+                self.reply(GPS_DATA + MANUEL_FIX_DATA.format(utc, lat[:-1], lng[:-1], date), LINE, OK)
+            elif data.startswith(START_STREAM[:-2].split("=")[0]):
+                self.streaming = not data.startswith(STOP_STREAM.strip())
+                self.reply(OK)
 
 
 if __name__ == '__main__':
-    server = Server(port="/dev/pts/3", baudrate=115200, timeout=5)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", default="/dev/pts/3")
+    parser.add_argument("--nmea-port", default=None)
+    parser.add_argument("--baudrate", type=int, default=115200)
+    args = parser.parse_args()
+    server = Server(port=args.port, baudrate=args.baudrate, timeout=5, nmea_port=args.nmea_port)
     server.join()
@@ -9,16 +9,23 @@ from threading import Thread
 from constants.numbers import (MAX_PHOTO_COUNT, MINIMUM_PHOTO_SIZE, MAX_VIDEO_DURATION,
                                MINIMUM_VIDEO_SIZE, JPG_SAVE_QUALITY)
 # from constants.others import byte_seperator
+from constants.others import camera_capture_mode
 from constants.folders import PATH_TO_UPLOAD, RECORDED_FILES
 from constants.urls import URL_STREAM
 
+from src.file_uploader import enqueue_video, enqueue_image_file
 from utils.singleton import Singleton
+from utils.frame_buffer import FrameBuffer
+from utils.frame_quality import sharpness
+from utils.frame_rotation import FrameRotator
+from utils.mjpeg import decode, decode_preview
+from utils.v4l2_controls import V4l2Controls
+from utils.exposure_controller import ExposureController
 from utils.camera_tools import *
 
 from tools import check_file_size, decode_fourcc, draw_text
 
 import cv2
-import imutils
 
 
 class CameraManager(Thread, metaclass=Singleton):
@@ -29,21 +36,32 @@ class CameraManager(Thread, metaclass=Singleton):
 
         self.port = settings.port
         self.rotation = settings.rotation
+        self.rotator = FrameRotator(self.rotation)
         self.width = settings.width
         self.height = settings.height
         self.fourcc = cv2.VideoWriter_fourcc(*settings.fourcc)
+        self.capture_mode = getattr(settings, "capture_mode", camera_capture_mode)
+        if self.capture_mode == MJPEG_CAPTURE and self.rotation % 90 != 0:
+            logging.warning(f"A rotation of {self.rotation} degrees can't be written in the mjpeg frames, "
+                            f"the {DIRECT_CAPTURE} capture mode is used instead.")
+            self.capture_mode = DIRECT_CAPTURE
+        self.controls = V4l2Controls(self.port)
+        self.exposure_controller = ExposureController(self.controls)
 
         self.saved_frame_count = 0
         self.passed_frame_count = 0
         self.location_id = None
         self.taking_video = False
 
-        self._last_frame = None
+        self._last_frame_time = None  # None while the camera isn't read
+        self._raw_frame = None
+        self.frame_buffer = FrameBuffer()
         self._virtual_camera = None
         self._virtual_port = None
         self._running = False
 
         self.streamer = None
+        self._streamer_feeder = None
         self.camera = None
 
         self.start()
@@ -81,12 +99,39 @@ class CameraManager(Thread, metaclass=Singleton):
             if self.streamer.poll() is None:
                 # logging.warning("Streamer is already running!")
                 return
+        stream_url = URL_STREAM + "autopi-1"
+        if self.capture_mode != LOOPBACK_CAPTURE:
+            if self.camera is None or not self.camera.isOpened():
+                logging.error("Camera is not opened!")
+                return
+            width, height = self.get_frame_size()
+            self.streamer = stream_frames_to_rtsp(stream_url, width, height, self.get_camera_info()["fps"],
+                                                  mjpeg=self.capture_mode == MJPEG_CAPTURE)
+            if self.streamer is not None:
+                self._streamer_feeder = Thread(target=self.feed_streamer, daemon=True, name="StreamerFeeder",
+                                               args=(self.streamer,))
+                self._streamer_feeder.start()
+            return
         if self._virtual_port is None:
             logging.error("Virtual camera is not running!")
             return
-        stream_url = URL_STREAM + "autopi-1"
         self.streamer = stream_to_rtsp(self._virtual_port, stream_url)
 
+    def feed_streamer(self, streamer):
+        """Write every new frame to the stdin of the rtsp encoder until it stops."""
+        sequence = self.frame_buffer.sequence
+        while self._running and streamer.poll() is None:
+            frame_ref = self.wait_for_frame(sequence, timeout=1)
+            if frame_ref is None:
+                continue
+            with frame_ref:
+                sequence = frame_ref.sequence
+                try:
+                    streamer.stdin.write(frame_ref.frame if frame_ref.jpeg is None else frame_ref.jpeg)
+                except (BrokenPipeError, ValueError):
+                    break
+        logging.info("Streamer feeder stopped")
+
     def stop_streamer(self):
         if self.streamer is not None:
             logging.info("Stopping streamer...")
@@ -98,30 +143,55 @@ class CameraManager(Thread, metaclass=Singleton):
         self._running = True
         log_time = 0
         while self._running:
-            self.start_virtual_camera()
+            if self.capture_mode == LOOPBACK_CAPTURE:
+                self.start_virtual_camera()
             # self.start_streamer()
             if self.get_camera():
-                ret, frame = self.camera.read()
+                ret, frame, slot, jpeg = self.read_frame()
+                frame_time = time.time()
+                if ret and frame is None:
+                    logging.warning("Camera sent a broken frame!")
+                    continue
                 if ret:
                     if time.time() - log_time > 60:
-                        logging.info(f"Camera {self.port} is running. Mean Frame: {frame.mean():.1f}")
+                        logging.info(f"Camera {self.port} is running. Exposure: {self.exposure_controller.stats()}")
                         log_time = time.time()
-                    frame = imutils.rotate(frame, self.rotation)
-                    update_exposure(self.port, frame)
-                    # self.draw_date_time(frame)
-                    self.draw_gps_data(frame)
-                    self._last_frame = frame
+                    if jpeg is None:
+                        frame = self.rotator.rotate(frame, slot)
+                    self.exposure_controller.update(frame, frame_time)
+                    score = sharpness(frame)  # before the overlay, its text is sharp in every frame
+                    if jpeg is None:  # the overlay of an mjpeg frame is written in its metadata by the recorder
+                        if self.capture_mode != LOOPBACK_CAPTURE:
+                            self.draw_date_time(frame)  # drawn by the ffmpeg of the virtual camera otherwise
+                        self.draw_gps_data(frame)
+                    self.frame_buffer.commit(frame, frame_time, score, jpeg)
+                    self._last_frame_time = frame_time
                     # cv2.imshow("Camera", frame)
                     # if cv2.waitKey(1) & 0xFF == ord('q'):
                     #     break
                     # self.put_to_stream_queue()
                 else:
-                    self._last_frame = None
+                    self._last_frame_time = None
                     logging.warning("Camera read failed!")
                     self.camera.release()
             else:
                 time.sleep(1)
 
+    def read_frame(self):
+        """
+        Read the next frame, return (ret, frame, slot, jpeg). The frame is read into the frame buffer slot when it
+        isn't rotated. In the mjpeg mode the frame is the decoded preview of the compressed `jpeg`, None if broken.
+        """
+        if self.capture_mode == MJPEG_CAPTURE:
+            ret, jpeg = self.camera.read()
+            return ret, decode_preview(jpeg) if ret else None, None, jpeg
+        slot = self.frame_buffer.acquire()
+        if self.rotator.enabled:
+            ret, self._raw_frame = self.camera.read(self._raw_frame)
+            return ret, self._raw_frame, slot, None
+        ret, frame = self.camera.read(slot)
+        return ret, frame, slot, None
+
     # def put_to_stream_queue(self):
     #     frame = cv2.cvtColor(self.last_frame, cv2.COLOR_BGR2RGB)
     #     self._parent.streamer.put_frame(frame)
@@ -141,26 +211,31 @@ class CameraManager(Thread, metaclass=Singleton):
         self._running = False
         self.release()
         self.stop_streamer()
-        self.stop_virtual_camera()
+        if self.capture_mode == LOOPBACK_CAPTURE:
+            self.stop_virtual_camera()
 
     def get_camera(self):
         if self.camera is not None:
             if self.camera.isOpened():
                 return True
-        self._last_frame = None
-        logging.info(f"Trying to get camera {self._virtual_port}...")
+        self._last_frame_time = None
+        source = self._virtual_port if self.capture_mode == LOOPBACK_CAPTURE else self.port
+        logging.info(f"Trying to get camera {source}...")
         start_time = time.time()
-        if self._virtual_port is not None:
-            self.camera = cv2.VideoCapture(self._virtual_port)
-            # self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-            # self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if source is not None:
+            try:
+                self.camera = open_camera(source, self.width, self.height, self.capture_mode)
+            except Exception as e:
+                logging.error(f"Failed to open camera {source}: {e}", exc_info=True)
+                time.sleep(10)
+                return False
             # self.camera.set(cv2.CAP_PROP_FOURCC, self.fourcc)
             if self.camera.isOpened():
-                logging.info(f"Camera {self._virtual_port} is opened in {round(time.time() - start_time, 2)} seconds.")
+                logging.info(f"Camera {source} is opened in {round(time.time() - start_time, 2)} seconds.")
                 logging.info(f"Camera info: {self.get_camera_info()}")
                 return True
             else:
-                logging.warning(f"Camera {self._virtual_port} is not opened!")
+                logging.warning(f"Camera {source} is not opened!")
                 time.sleep(10)
                 raise
         else:
@@ -174,8 +249,34 @@ class CameraManager(Thread, metaclass=Singleton):
                 "fourcc": decode_fourcc(self.camera.get(cv2.CAP_PROP_FOURCC)),
                 "fps": round(self.camera.get(cv2.CAP_PROP_FPS), 2)}
 
+    def get_frame_size(self):
+        """(width, height) of the rotated frames."""
+        return self.rotator.output_size(int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                        int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
     def get_frame(self):
-        return self._last_frame
+        return self.get_frame_with_time()[0]
+
+    def get_frame_with_time(self):
+        """Return a copy of the last frame and the time it was read, (None, None) while the camera isn't read."""
+        if self._last_frame_time is None:
+            return None, None
+        return self.frame_buffer.latest()
+
+    def wait_for_frame(self, after_sequence=0, timeout=None):
+        """Block until a frame newer than `after_sequence` is read, return it as a pinned FrameRef or None."""
+        return self.frame_buffer.wait(after_sequence, timeout)
+
+    def get_frame_at(self, timestamp, max_age=None):
+        """Return a copy of the buffered frame read closest to `timestamp` and its time."""
+        return self.frame_buffer.nearest(timestamp, max_age)
+
+    def get_best_frames(self, start, end, count, spacing=0):
+        """
+        Return copies of the `count` sharpest buffered frames read between `start` and `end` with their times and
+        compressed frames, None unless the camera is in the mjpeg mode.
+        """
+        return self.frame_buffer.best(start, end, count, spacing)
 
     def get_rtsp_frame(self):
         frame = self.get_frame()
@@ -240,6 +341,7 @@ class CameraManager(Thread, metaclass=Singleton):
                     os.makedirs(RECORDED_FILES)
                 cv2.imwrite(RECORDED_FILES + photo_name, frame, [cv2.IMWRITE_JPEG_QUALITY, JPG_SAVE_QUALITY])
                 if check_file_size(RECORDED_FILES + photo_name, MINIMUM_PHOTO_SIZE):
+                    enqueue_image_file(PATH_TO_UPLOAD + photo_name)
                     self.saved_frame_count += 1
         else:
             if self.passed_frame_count == 0:
@@ -250,24 +352,34 @@ class CameraManager(Thread, metaclass=Singleton):
         self.taking_video = True
         video_file_path = RECORDED_FILES + video_name
         cap_info = self.get_camera_info()
-        out = cv2.VideoWriter(video_file_path, self.fourcc,
-                              cap_info["fps"], (cap_info["width"], cap_info["height"]))
+        size = self.get_frame_size()
+        out = cv2.VideoWriter(video_file_path, self.fourcc, cap_info["fps"], size)
 
         logging.info(f'Recording Video...')
         start_of_video_record = time.time()
         frame_count = 0
+        skipped_frame_count = 0
+        sequence = self.frame_buffer.sequence
 
         while self.taking_video:
-            frame = self.get_frame()
-            if frame is not None:
-                out.write(cv2.resize(frame, (cap_info["width"], cap_info["height"])))
-                frame_count = frame_count + 1
-                video_duration = time.time() - start_of_video_record
-                if frame_count >= MAX_VIDEO_DURATION * cap_info["fps"] or video_duration >= MAX_VIDEO_DURATION:
-                    logging.warning(f"Frame count is too high! {frame_count} frames "
-                                    f"{round(video_duration, 2)} seconds. "
-                                    f"Ending the record...")
-                    self.taking_video = False
+            frame_ref = self.wait_for_frame(sequence, timeout=1)
+            if frame_ref is None:
+                continue
+            with frame_ref:
+                skipped_frame_count += frame_ref.sequence - sequence - 1
+                sequence = frame_ref.sequence
+                frame = frame_ref.frame if frame_ref.jpeg is None else self.rotator.rotate(decode(frame_ref.jpeg))
+                out.write(frame if frame.shape[1::-1] == size else cv2.resize(frame, size))
+            frame_count = frame_count + 1
+            video_duration = time.time() - start_of_video_record
+            if frame_count >= MAX_VIDEO_DURATION * cap_info["fps"] or video_duration >= MAX_VIDEO_DURATION:
+                logging.warning(f"Frame count is too high! {frame_count} frames "
+                                f"{round(video_duration, 2)} seconds. "
+                                f"Ending the record...")
+                self.taking_video = False
+
+        if skipped_frame_count > 0:
+            logging.warning(f"Video writer skipped {skipped_frame_count} frames: {video_name}")
 
         out.release()
 
@@ -282,12 +394,14 @@ class CameraManager(Thread, metaclass=Singleton):
                     f"Recorded video Size: {file_size}MB in {video_record_time} seconds "
                     f"and Total {frame_count} frames: {video_name}")
                 shutil.move(video_file_path, PATH_TO_UPLOAD)
+                enqueue_video(PATH_TO_UPLOAD + video_name)
 
         else:
             logging.warning(f"OpenCV couldn't find the file: {video_file_path}")
 
     def release(self):
         self.taking_video = False
+        self.controls.close()
         if self.camera.isOpened():
             self.camera.release()
             self.camera = None
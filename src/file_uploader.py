@@ -2,6 +2,7 @@ import logging
 import os
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from pathlib import Path
 
@@ -10,20 +11,97 @@ import utils.request_handler as rh
 from constants.others import file_upload_type
 from constants.files import atiknakit_failed_uploads, uploaded_files, FAILED_GPS_UPLOADS
 from constants.folders import PATH_TO_UPLOAD
+from constants.numbers import FAILED_LOCATIONS_CHUNK_SIZE, OUTBOX_BATCH_SIZE, UPLOAD_CONCURRENCY
 from constants.urls import (URL_LOCATION_UPLOAD, URL_IMAGE_INFO_UPLOAD,
                             URL_CDN_UPLOAD, IMAGE_PROCESSING_API_CACA_GARBAGE_URL, IMAGE_PROCESSING_API_GARBAGE_URL)
 
-from tools import write_json, get_hostname, read_json, get_directory_size
+from tools import write_json, get_hostname
+from utils.json_journal import get_journal
+from utils.size_converter import SizeConverter
+from utils.upload_outbox import UploadOutbox
+
+IMAGE = "image"
+VIDEO = "video"
+LOCATION = "location"
+LOCATIONS_FILE = "locations_file"
+
+PRIORITIES = {LOCATION: 10, LOCATIONS_FILE: 10, IMAGE: 0, VIDEO: -10}
+
+# endpoint name: kinds of the outbox items uploaded to it
+ENDPOINTS = {"image_api": [IMAGE], "cdn": [VIDEO], "location_api": [LOCATION, LOCATIONS_FILE]}
+
+
+class UploadError(Exception):
+    """ Exception raised when an upload is not accepted by the server. """
+    pass
+
+
+def image_params(location_id, lat, lng, date):
+    return {
+        "location_id": location_id,
+        "lat": lat,
+        "lng": lng,
+        "date": date.strftime("%Y-%m-%d %H:%M:%S"),
+        "uploader_id": get_hostname(),
+        "upload_type": "garbagedevice",
+    }
+
+
+def enqueue_image(file_path, device_type, params):
+    """Enqueue an image, return False if it is already in the outbox."""
+    return UploadOutbox().enqueue(IMAGE, file_path=str(file_path), payload={"device_type": device_type, "params": params},
+                           priority=PRIORITIES[IMAGE])
+
+
+def enqueue_image_file(file_path):
+    """Enqueue an image with the info parsed from its file name."""
+    try:
+        image_info = ImageInfo(file_path)
+    except (ValueError, IndexError) as e:
+        logging.warning(f"Image file name couldn't parsed! File: {file_path}: {e}")
+        return
+    enqueue_image(file_path, image_info.device_type, image_info.to_dict())
+
+
+def enqueue_video(file_path):
+    UploadOutbox().enqueue(VIDEO, file_path=str(file_path), priority=PRIORITIES[VIDEO])
+
+
+def enqueue_locations(locations):
+    UploadOutbox().enqueue_many(LOCATION, locations, priority=PRIORITIES[LOCATION])
+
+
+def enqueue_folder(folder_path=PATH_TO_UPLOAD):
+    """Enqueue the files left in `folder_path` by older versions, that don't use the outbox."""
+    outbox = UploadOutbox()
+    for file_path in Path(folder_path).glob("*"):
+        if file_path.name.endswith(FAILED_GPS_UPLOADS):
+            outbox.enqueue(LOCATIONS_FILE, file_path=str(file_path), priority=PRIORITIES[LOCATIONS_FILE])
+        elif file_path.suffix == ".jpg" and not outbox.contains(str(file_path)):
+            if os.path.getsize(file_path) == 0:
+                logging.warning(f"Image File size is too small! File: {file_path}")
+                os.remove(file_path)
+                continue
+            enqueue_image_file(file_path)
+
+
+def upload_locations(locations):
+    response = rh.post(url=URL_LOCATION_UPLOAD + get_hostname(), json=locations, timeout=10)
+    if response.status_code != 200:
+        raise UploadError(f"Locations upload status code: {response.status_code}")
 
 
 def upload_failed_locations(file_path):
-    location_json = read_json(file_path)
-    response = rh.post(url=URL_LOCATION_UPLOAD + get_hostname(), json=location_json, timeout=10)
-    if response.status_code == 200:
-        logging.info(f"{file_path} uploaded")
-        os.remove(file_path)
-    else:
-        logging.warning(f"{file_path} upload warning: {response.status_code}")
+    journal = get_journal(file_path)
+    uploaded_until = 0
+    try:
+        for offset, location_json in journal.read_chunks(FAILED_LOCATIONS_CHUNK_SIZE):
+            upload_locations(location_json)
+            uploaded_until = offset
+    finally:
+        if uploaded_until > 0:
+            journal.discard_until(uploaded_until)
+            logging.info(f"{file_path} uploaded")
 
 
 def upload_video(file_path):
@@ -58,9 +136,9 @@ def upload_video(file_path):
                 write_json(file_data, PATH_TO_UPLOAD + atiknakit_failed_uploads)
 
             os.remove(file_path)
+            return
 
-        else:
-            logging.warning(f"Video file couldn't uploaded! Status Code: {response.status_code}")
+    raise UploadError(f"Video file couldn't uploaded! Status Code: {response.status_code}")
 
 
 class ImageInfo:
@@ -73,92 +151,175 @@ class ImageInfo:
         self.time = self.date_and_time.strftime("%H:%M:%S")
         self.lat, self.lng = self.file_data[3].split(",")
         self.speed = float(self.file_data[4].strip("kmh"))
-        self.garbage_id = self.file_data[5]
+        self.garbage_id = self.file_data[5].split("-")[0]  # without the suffix of a repeated name
 
     def to_dict(self):
-        return {
-            "location_id": self.garbage_id,
-            "lat": self.lat,
-            "lng": self.lng,
-            "date": self.date_and_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "uploader_id": get_hostname(),
-            "upload_type": "garbagedevice",
-        }
+        return image_params(self.garbage_id, self.lat, self.lng, self.date_and_time)
 
 
-def upload_image_to_api(file_path):
+def upload_image_to_api(file_path, device_type, params):
     file_name = os.path.basename(file_path)
-    file = {"image": (file_name, open(file_path, "rb").read())}
-    file_data = ImageInfo(file_path)
-    if file_data.device_type == "garbage":
+    with open(file_path, "rb") as image:
+        file = {"image": (file_name, image.read())}
+    if device_type == "garbage":
         response = rh.post(
             IMAGE_PROCESSING_API_GARBAGE_URL,
             files=file,
-            params=file_data.to_dict(),
+            params=params,
             timeout=10,
         )
-    elif file_data.device_type == "caca-garbage":
+    elif device_type == "caca-garbage":
         response = rh.post(
             IMAGE_PROCESSING_API_CACA_GARBAGE_URL,
             files=file,
-            params=file_data.to_dict(),
+            params=params,
             timeout=10,
         )
     else:
-        logging.warning(f"Unknown device type: {file_data.device_type}")
-        return False
+        raise UploadError(f"Unknown device type: {device_type}")
     if response.status_code == 200:
         os.remove(file_path)
-        return True
     else:
         logging.warning(f"Image file couldn't uploaded! Status Code: {response.status_code}: {response.text}")
-        time.sleep(10)
-        return False
+        raise UploadError(f"Image upload status code: {response.status_code}")
+
+
+class UploadStats:
+    """Thread safe upload counters of the current upload cycle, per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start_time = time.time()
+        self.files = {}
+        self.bytes = {}
+        self.failed = {}
+
+    def reset(self):
+        with self._lock:
+            self.start_time = time.time()
+            self.files = {}
+            self.bytes = {}
+            self.failed = {}
+
+    def add(self, endpoint, files, size):
+        with self._lock:
+            self.files[endpoint] = self.files.get(endpoint, 0) + files
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + size
+
+    def add_failed(self, endpoint, files):
+        with self._lock:
+            self.failed[endpoint] = self.failed.get(endpoint, 0) + files
+
+    def total_files(self):
+        return sum(self.files.values())
+
+    def files_per_second(self):
+        return self.total_files() / max(time.time() - self.start_time, 1e-6)
+
+    def bytes_per_second(self):
+        return sum(self.bytes.values()) / max(time.time() - self.start_time, 1e-6)
+
+    def __str__(self):
+        endpoints = ", ".join(f"{endpoint}: {self.files.get(endpoint, 0)} ok "
+                              f"{self.failed.get(endpoint, 0)} failed" for endpoint in ENDPOINTS)
+        return (f"{self.total_files()} files ({SizeConverter(sum(self.bytes.values()))}) uploaded in "
+                f"{time.time() - self.start_time:.2f} seconds | "
+                f"{self.files_per_second():.2f} files/s | "
+                f"{SizeConverter(self.bytes_per_second())}/s | {endpoints}")
 
 
 class FileUploader(threading.Thread):
-    def __init__(self, folder_path=PATH_TO_UPLOAD):
+    def __init__(self, folder_path=PATH_TO_UPLOAD, concurrency=UPLOAD_CONCURRENCY):
         threading.Thread.__init__(self, daemon=True, name="FileUploader")
         self.folder_path = folder_path
+        self.concurrency = concurrency
+        self.outbox = UploadOutbox()
+        self.stats = UploadStats()
 
+        self._offline = threading.Event()
         self._running = False
         self.start()
 
+    def upload(self, endpoint, items):
+        """Upload the claimed `items`, locations are sent together in one request."""
+        locations = [item for item in items if item.kind == LOCATION]
+        if locations:
+            self.finish(endpoint, locations, upload_locations, [item.payload for item in locations])
+        files = [item for item in items if item.kind != LOCATION]
+        for index, item in enumerate(files):
+            if not rh.check_connection():
+                logging.warning("No Internet Connection!")
+                self._offline.set()
+                self.outbox.release(files[index:])
+                return
+            if not os.path.isfile(item.file_path):
+                logging.warning(f"{item.file_path} is not a file. Removing it from the outbox.")
+                self.outbox.done([item])
+            elif item.kind == IMAGE:
+                self.finish(endpoint, [item], upload_image_to_api, item.file_path,
+                            item.payload["device_type"], item.payload["params"])
+            elif item.kind == VIDEO:
+                self.finish(endpoint, [item], upload_video, item.file_path)
+            elif item.kind == LOCATIONS_FILE:
+                self.finish(endpoint, [item], upload_failed_locations, item.file_path)
+
+    def finish(self, endpoint, items, upload_function, *args):
+        try:
+            upload_function(*args)
+        except Exception as e:
+            if not isinstance(e, UploadError):
+                logging.exception(f"Error happened while uploading {items}")
+            self.outbox.failed(items, e)
+            self.stats.add_failed(endpoint, len(items))
+            return False
+        self.outbox.done(items)
+        self.stats.add(endpoint, len(items), sum(item.size for item in items))
+        return True
+
+    def upload_backlog(self):
+        """
+        Upload everything that is due in the outbox with a worker pool.
+        Endpoints take turns to get a new task, each with its own cap of parallel uploads.
+        """
+        running = {endpoint: set() for endpoint in ENDPOINTS}
+        self._offline.clear()
+        with ThreadPoolExecutor(max_workers=sum(self.concurrency.values()),
+                                thread_name_prefix="upload_worker") as executor:
+            while self._running and not self._offline.is_set():
+                submitted = False
+                for endpoint, kinds in ENDPOINTS.items():
+                    running[endpoint] = {future for future in running[endpoint] if not future.done()}
+                    if len(running[endpoint]) >= self.concurrency.get(endpoint, 1):
+                        continue
+                    items = self.outbox.claim(OUTBOX_BATCH_SIZE if LOCATION in kinds else 1, kinds=kinds)
+                    if items:
+                        running[endpoint].add(executor.submit(self.upload, endpoint, items))
+                        submitted = True
+                futures = set().union(*running.values())
+                if not futures:
+                    break
+                if not submitted:
+                    wait(futures, timeout=1, return_when=FIRST_COMPLETED)
+
     def run(self):
         self._running = True
         logging.info(f"Starting File Uploader...")
+        # the uploader is restarted when it dies, the items it claimed would be stuck otherwise
+        self.outbox.reclaim()
+        enqueue_folder(self.folder_path)
 
         while self._running:
 
             if rh.check_connection():
 
-                file_list = sorted(list(Path(self.folder_path).glob("*")))
-                if len(file_list) > 1:
-                    logging.info(f"{len(file_list)} files to upload. "
-                                 f"Total size: {get_directory_size(self.folder_path)}")
-                uploaded_file_count = 0
-                start_time = time.time()
-                for file_path in file_list:
-                    if os.path.getsize(file_path) != 0:
-
-                        if rh.check_connection():
-
-                            if file_path.suffix == ".jpg":
-                                uploaded_file_count += 1 if upload_image_to_api(file_path) else 0
-
-                            elif file_path.name.endswith(FAILED_GPS_UPLOADS):
-                                upload_failed_locations(file_path)
-
-                        else:
-                            logging.warning("No Internet Connection!")
-                            break
-
-                    else:
-                        logging.warning(
-                            f"Image File size is too small! File: {file_path}\tSize: {os.path.getsize(file_path)}")
-                        os.remove(file_path)
-                if uploaded_file_count > 0:
-                    logging.info(f"{uploaded_file_count} files uploaded in {time.time() - start_time:.2f} seconds.")
+                item_count, total_size = self.outbox.stats()
+                if item_count > 1:
+                    logging.info(f"{item_count} files to upload. "
+                                 f"Total size: {SizeConverter(total_size)}")
+                self.stats.reset()
+                self.upload_backlog()
+                if self.stats.total_files() > 0:
+                    logging.info(f"{self.stats}")
             time.sleep(60)
 
     def stop(self):
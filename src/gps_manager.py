@@ -1,9 +1,15 @@
 import logging
 import time
-from threading import Thread
+from threading import Thread, Condition
 from utils.serial_connection import SerialConnection
+from utils.device_config import Dict2Class
 from utils.gps_data import GPSData
+from utils.gps_history import GpsHistory
+from utils.position_filter import PositionFilter
+from utils.nmea import LineFramer, NmeaAssembler
+from utils.track_store import TrackStore
 from constants.gps_commands import *
+from constants.numbers import GPS_STREAM_TIMEOUT, GPS_STREAM_RETRY
 
 
 class GPSNotPoweredUpError(Exception):
@@ -12,13 +18,38 @@ class GPSNotPoweredUpError(Exception):
 
 
 class GpsReader(SerialConnection, Thread):
+    """
+    Reads the gps fixes of the modem.
+
+    In stream mode the modem pushes GGA and RMC sentences every second, on the AT port after AT$GPSNMUN or on the
+    secondary NMEA port given as `nmea_port` in the gps settings. The chunks read are framed and parsed incrementally.
+    When the stream is silent for GPS_STREAM_TIMEOUT seconds the reader polls with AT$GPSACP until it tries
+    streaming again. In poll mode it only polls.
+    New fixes are published to the threads waiting in `wait_for_gps_data`.
+    """
+
     def __init__(self, parent, settings):
         Thread.__init__(self, daemon=True, name="GpsReader")
         SerialConnection.__init__(self, settings)
 
         self._parent = parent
+        self.mode = getattr(settings, "mode", STREAM_MODE)
+        self._nmea = None
+        if getattr(settings, "nmea_port", None):
+            self._nmea = SerialConnection(Dict2Class({"port": settings.nmea_port,
+                                                      "baudrate": settings.baudrate,
+                                                      "timeout": settings.timeout}))
 
-        self._gps_data = GPSData(GPS_DATA + NO_FIX_DATA)
+        self._gps_data = GPSData.no_fix()
+        self._sequence = 0
+        self._new_data = Condition()
+        self.history = GpsHistory()
+        self.position_filter = PositionFilter() if getattr(settings, "filter", False) else None
+        self._fix_time = 0
+        self._fix_received = 0
+        self._clock_offset = 0.0  # gps time minus system time when the last fix was read, the clock isn't synced
+        self.track_store = TrackStore()
+        self._stream_retry_time = 0
 
         self.running = True
         self.start()
@@ -34,33 +65,118 @@ class GpsReader(SerialConnection, Thread):
             # self.send_command(POWER_UP)
             # data = self.read_until(expected=OK)
             # if data.startswith(OK):
-        gps_log_time = 0
         while self.running:
-            self.send_command(GET_GPS_DATA)
-            try:
-                data = self.read_until(expected=GPS_DATA)
-                if data.startswith(GPS_DATA):
-                    self._gps_data = GPSData(data)
-                else:
-                    self._gps_data = GPSData(GPS_DATA + NO_FIX_DATA)
-                if time.time() - gps_log_time > 2:
-                    self._gps_data.save_to_file()
-                    gps_log_time = time.time()
-
-            except Exception as e:
-                logging.warning(f"GPSReader: {e}")
-                self._gps_data = GPSData(GPS_DATA + NO_FIX_DATA)
-                time.sleep(1)
+            if self.mode == STREAM_MODE and time.time() >= self._stream_retry_time:
+                self.read_stream()
+            else:
+                self.poll()
             # else:
             #     logging.error(f"GPSReader: GPS is not powered up: {data}")
             #     raise GPSNotPoweredUpError()
 
+    def poll(self):
+        self.send_command(GET_GPS_DATA)
+        try:
+            data = self.read_until(expected=GPS_DATA)
+            if data.startswith(GPS_DATA):
+                self._set_gps_data(GPSData(data))
+            else:
+                self._set_gps_data(GPSData.no_fix())
+        except Exception as e:
+            logging.warning(f"GPSReader: {e}")
+            self._set_gps_data(GPSData.no_fix())
+            time.sleep(1)
+
+    def read_stream(self):
+        """Parse the pushed sentences until the stream is silent for GPS_STREAM_TIMEOUT seconds."""
+        connection = self._nmea or self
+        if self._nmea is None:
+            self.send_command(START_STREAM, wait=0)
+        framer = LineFramer()
+        assembler = NmeaAssembler()
+        last_fix_time = time.time()
+        while self.running and time.time() - last_fix_time < GPS_STREAM_TIMEOUT:
+            chunk = connection.read_chunk()
+            if not isinstance(chunk, bytes):  # the port couldn't be opened
+                continue
+            for line in framer.feed(chunk):
+                gps_string = assembler.feed(line)
+                if gps_string is None:
+                    continue
+                last_fix_time = time.time()
+                try:
+                    self._set_gps_data(GPSData(gps_string))
+                except Exception as e:
+                    logging.warning(f"GPSReader: {e} | {gps_string}")
+                    self._set_gps_data(GPSData.no_fix())
+        if self.running:
+            logging.warning(f"GPSReader: No fix streamed in {GPS_STREAM_TIMEOUT} seconds, polling instead.")
+            if self._nmea is None:
+                self.send_command(STOP_STREAM)
+            self._stream_retry_time = time.time() + GPS_STREAM_RETRY
+
+    def _set_gps_data(self, gps_data):
+        fix_time = None
+        if gps_data.is_valid():
+            # the time of the fix is checked before it is published, a fix without one is no fix for the readers
+            try:
+                fix_time = gps_data.local_date.timestamp()
+            except ValueError as e:
+                logging.warning(f"GPSReader: {e} | {gps_data.to_string()}")
+                gps_data = GPSData.no_fix()
+        with self._new_data:
+            self._gps_data = gps_data
+            self._sequence += 1
+            if fix_time is not None:
+                self._clock_offset = fix_time - time.time()
+            if self.position_filter is not None and fix_time is not None:
+                self._fix_time = fix_time
+                self._fix_received = time.monotonic()
+                self.position_filter.update(gps_data, self._fix_time)
+            self._new_data.notify_all()
+        self.history.append(gps_data)
+        self.track_store.append(gps_data)
+
+    def wait_for_gps_data(self, sequence=0, timeout=None):
+        """
+        Wait until a fix newer than `sequence` is read, return the sequence number and the fix.
+        The current fix is returned after `timeout` seconds.
+        """
+        with self._new_data:
+            self._new_data.wait_for(lambda: self._sequence > sequence, timeout=timeout)
+            return self._sequence, self._gps_data
+
     def stop(self):
         self.running = False
+        with self._new_data:
+            self._new_data.notify_all()
+        self.track_store.stop()
         self._serial.close()
+        if self._nmea is not None:
+            self._nmea._serial.close()
 
     def get_gps_data(self):
         return self._gps_data
 
+    def get_gps_data_at(self, timestamp):
+        """
+        Return the fix interpolated at `timestamp` of the system clock, e.g. the capture time of a frame, or the latest
+        one. The timestamp is moved to the gps time with the offset of the clock measured when the last fix was read.
+        """
+        return self.history.at(timestamp + self._clock_offset) or self._gps_data
+
+    def get_location(self):
+        """
+        Return the location of the vehicle now, predicted by the position filter when it is on (gps_settings.filter),
+        otherwise the location of the latest fix.
+        """
+        with self._new_data:
+            gps_data = self._gps_data
+            if self.position_filter is not None and gps_data.is_valid():
+                prediction = self.position_filter.predict(self._fix_time + time.monotonic() - self._fix_received)
+                if prediction is not None:
+                    return {"lat": prediction[0], "lng": prediction[1]}
+        return gps_data.gps_location
+
     def get_drawable_gps_data(self):
         return self._gps_data.to_camera()
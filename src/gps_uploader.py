@@ -0,0 +1,106 @@
+import logging
+import queue
+import time
+from threading import Thread
+
+import utils.request_handler as rh
+from constants.numbers import (GPS_UPLOAD_QUEUE_SIZE, GPS_UPLOAD_BATCH_SIZE, GPS_UPLOAD_MAX_LATENCY,
+                               GPS_UPLOAD_MIN_DISTANCE)
+from constants.urls import URL_LOCATION_UPLOAD
+
+from src.file_uploader import enqueue_locations
+from utils.track_simplifier import TrackSimplifier
+
+from tools import get_hostname
+
+
+class GpsUploader(Thread):
+    """
+    Single worker that uploads the gps fixes in batches.
+
+    Fixes go through a `TrackSimplifier`, which skips the ones closer than `min_distance` meters to the last kept one
+    and the ones on a straight line.
+    A batch is sent when it has `batch_size` points or its oldest point waited `max_latency` seconds.
+    Batches are spilled to the upload outbox when there is no connection or the upload fails.
+    """
+
+    def __init__(self,
+                 batch_size=GPS_UPLOAD_BATCH_SIZE,
+                 max_latency=GPS_UPLOAD_MAX_LATENCY,
+                 min_distance=GPS_UPLOAD_MIN_DISTANCE,
+                 queue_size=GPS_UPLOAD_QUEUE_SIZE):
+        Thread.__init__(self, daemon=True, name="GpsUploader")
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.simplifier = TrackSimplifier(min_distance=min_distance)
+        self.uploaded_count = 0
+        self.spilled_count = 0
+
+        self._running = True
+        self.start()
+
+    def put(self, gps_data):
+        """Queue a valid fix for upload, return False if it was dropped by the track simplifier."""
+        kept = self.simplifier.push(gps_data, gps_data.local_date.timestamp())
+        for point in kept:
+            self._put(point.data_to_upload())
+        return len(kept) > 0
+
+    def _put(self, location):
+        try:
+            self._queue.put_nowait(location)
+        except queue.Full:
+            logging.warning("GPS upload queue is full, spilling the point to the outbox.")
+            self.spill([location])
+
+    def spill(self, locations):
+        enqueue_locations(locations)
+        self.spilled_count += len(locations)
+
+    def upload(self, locations):
+        if not rh.check_connection():
+            self.spill(locations)
+            return
+        response = rh.post(url=URL_LOCATION_UPLOAD + get_hostname(), json=locations, timeout=5)
+        if response.status_code == 200:
+            self.uploaded_count += len(locations)
+            logging.info(f"{len(locations)} GPS points uploaded to server successfully. Last: {locations[-1]}")
+        else:
+            logging.warning(f"GPS data upload to server failed with status code {response.status_code}!")
+            self.spill(locations)
+
+    def next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + self.max_latency
+        while len(batch) < self.batch_size and self._running:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.time(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        logging.info("Starting GPS Uploader...")
+        while self._running:
+            batch = [location for location in self.next_batch() if location is not None]
+            if batch:
+                self.upload(batch)
+
+    def stop(self):
+        logging.info("Stopping GPS Uploader...")
+        self._running = False
+        rest = [point.data_to_upload() for point in self.simplifier.flush()]
+        while True:
+            try:
+                rest.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        rest = [location for location in rest if location is not None]
+        if rest:
+            self.spill(rest)
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from constants.numbers import ENCODER_WORKERS, ENCODER_QUEUE_SIZE
+from constants.others import encoder_drop_policy
+
+DROP_OLDEST = "oldest"
+DROP_NEWEST = "newest"
+
+
+class PhotoEncoder:
+    """
+    Fixed pool of `workers` threads that run the photo save jobs from a queue of `queue_size` jobs.
+
+    When the queue is full, e.g. the sd card is slow, the oldest queued job is dropped for the new one (`oldest`) or
+    the new job is dropped (`newest`). The queue depth, the drops and the latencies are kept for `stats`.
+    """
+
+    def __init__(self, workers=ENCODER_WORKERS, queue_size=ENCODER_QUEUE_SIZE, drop_policy=encoder_drop_policy):
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+
+        self._jobs = deque()
+        self._condition = threading.Condition()
+        self.submitted_count = 0
+        self.dropped_count = 0
+        self.done_count = 0
+        self.failed_count = 0
+        self._latencies = deque(maxlen=100)  # seconds from submit to done
+        self._run_times = deque(maxlen=100)  # seconds the jobs ran
+        self.busy_count = 0
+
+        self._running = True
+        self._workers = [threading.Thread(target=self._work, daemon=True, name=f"PhotoEncoder-{i}")
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, function, *args):
+        """Queue `function(*args)`, return False if the queue was full and a job was dropped."""
+        with self._condition:
+            self.submitted_count += 1
+            dropped = False
+            if len(self._jobs) >= self.queue_size:
+                self.dropped_count += 1
+                dropped = True
+                if self.drop_policy == DROP_NEWEST:
+                    return False
+                self._jobs.popleft()
+            self._jobs.append((time.monotonic(), function, args))
+            self._condition.notify()
+        if dropped:
+            logging.warning(f"Photo encoder queue is full, dropped the oldest photo. {self.stats()}")
+        return not dropped
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self._running and not self._jobs:
+                    self._condition.wait()
+                if not self._jobs:
+                    return
+                submitted_at, function, args = self._jobs.popleft()
+                self.busy_count += 1
+            started_at = time.monotonic()
+            try:
+                function(*args)
+                failed = False
+            except Exception as e:
+                logging.exception(f"PhotoEncoder: {e}")
+                failed = True
+            finished_at = time.monotonic()
+            with self._condition:
+                self.busy_count -= 1
+                self.done_count += 1
+                self.failed_count += failed
+                self._latencies.append(finished_at - submitted_at)
+                self._run_times.append(finished_at - started_at)
+
+    def depth(self):
+        return len(self._jobs)
+
+    def stats(self):
+        with self._condition:
+            latencies = list(self._latencies)
+            run_times = list(self._run_times)
+            return {"queued": len(self._jobs),
+                    "busy": self.busy_count,
+                    "done": self.done_count,
+                    "failed": self.failed_count,
+                    "dropped": self.dropped_count,
+                    "latency_avg": round(sum(latencies) / len(latencies), 3) if latencies else 0,
+                    "latency_max": round(max(latencies), 3) if latencies else 0,
+                    "encode_avg": round(sum(run_times) / len(run_times), 3) if run_times else 0}
+
+    def stop(self):
+        """Finish the queued jobs and stop the workers."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout=10)
@@ -1,19 +1,24 @@
-from threading import Thread
+from threading import Thread, Lock
 import time
 import logging
 import os
+from collections import OrderedDict
+from datetime import datetime
 
 import cv2
 
-import utils.request_handler as rh
-from constants.files import FAILED_GPS_UPLOADS
-from constants.urls import URL_LOCATION_UPLOAD
+from src.file_uploader import enqueue_image, image_params
+from src.gps_uploader import GpsUploader
+from src.photo_encoder import PhotoEncoder
+from utils.garbage_list_getter import get_garbage_index
+from utils.frame_dedup import FrameDeduplicator
+from utils.geofence import Geofence, CAPTURE_POLICIES, ClosestApproachPolicy
+from utils.mjpeg import write_jpeg
 
-from utils.garbage_list_getter import read_garbage_list
+from tools import check_file_size
 
-from tools import check_locations, check_file_size, calculate_distance, write_json, get_hostname
-
-from constants.numbers import MAX_PHOTO_COUNT, JPG_SAVE_QUALITY, MINIMUM_PHOTO_SIZE
+from constants.numbers import (MAX_PHOTO_COUNT, JPG_SAVE_QUALITY, MINIMUM_PHOTO_SIZE, GPS_FILTER_INTERVAL,
+                               CAPTURE_WINDOW, CAPTURE_SPACING, PHOTO_NAME_HISTORY)
 from constants.folders import RECORDED_FILES, PATH_TO_UPLOAD
 
 
@@ -23,18 +28,26 @@ class Recorder(Thread):
         self._parent = parent
 
         self._running = True
-        self.old_gps_data = None
-        self.garbage_list = read_garbage_list()
-        self.last_picture_save = 0
+        self.gps_uploader = GpsUploader()
+        self.garbage_index = get_garbage_index()
+        self.geofence = Geofence(radius=parent.max_loc_dist,
+                                 speed_limit=parent.speed_limit,
+                                 policy=CAPTURE_POLICIES.get(parent.capture_policy, ClosestApproachPolicy)())
         self.location_log_time = 0
         self.saved_frame_count = 0
         self.passed_frame_count = 0
         self.failed_frame_count = 0
+        self.duplicate_frame_count = 0
+        self.deduplicator = FrameDeduplicator()
+        self.encoder = PhotoEncoder()
+        self._count_lock = Lock()
         self.last_location_id = None
+        self._photo_names = OrderedDict()
 
         self.start()
 
-    def save_picture(self, photo_name, location_id):
+    def _count_location(self, location_id):
+        """Log and reset the counters of the last location when the photos of a new one arrive."""
         if self.last_location_id != location_id:
             self.last_location_id = location_id
 
@@ -44,80 +57,113 @@ class Recorder(Thread):
                 logging.warning(f"Passed {self.passed_frame_count} photos. In location {self.last_location_id}")
             if self.failed_frame_count > 0:
                 logging.error(f"Failed {self.failed_frame_count} photos. In location {self.last_location_id}")
+            if self.duplicate_frame_count > 0:
+                logging.info(f"Dropped {self.duplicate_frame_count} duplicate photos. "
+                             f"In location {self.last_location_id} | {self.deduplicator.report()}")
 
             self.saved_frame_count = 0
             self.passed_frame_count = 0
             self.failed_frame_count = 0
-
-        if self.saved_frame_count <= MAX_PHOTO_COUNT:
-            frame = self._parent.camera_manager.get_frame()
-            if frame is not None:
-                os.makedirs(RECORDED_FILES, exist_ok=True)
-                cv2.imwrite(RECORDED_FILES + photo_name, frame, [cv2.IMWRITE_JPEG_QUALITY, JPG_SAVE_QUALITY])
-                if check_file_size(RECORDED_FILES + photo_name, MINIMUM_PHOTO_SIZE):
-                    self.saved_frame_count += 1
-            else:
+            self.duplicate_frame_count = 0
+
+    def save_picture(self, photo_name, location_id, gps_data, frame, jpeg=None, comment=None):
+        with self._count_lock:
+            self._count_location(location_id)
+            if self.saved_frame_count > MAX_PHOTO_COUNT:
+                if self.passed_frame_count == 0:
+                    logging.warning(f"Maximum photo count reached for this location! Location-id: {location_id}")
+                self.passed_frame_count += 1
+                return
+            if frame is None:
                 self.failed_frame_count += 1
-        else:
-            if self.passed_frame_count == 0:
-                logging.warning(f"Maximum photo count reached for this location! Location-id: {location_id}")
-            self.passed_frame_count += 1
-
-    def upload_gps_data(self, new_gps_location):
-        if self.old_gps_data is not None:
-            if calculate_distance(self.old_gps_data.gps_location, new_gps_location.gps_location) < 20:
                 return
-        self.old_gps_data = new_gps_location
-        if not rh.check_connection():
-            write_json(new_gps_location.data_to_upload(), PATH_TO_UPLOAD + FAILED_GPS_UPLOADS)
-            return
-        location_upload_url = URL_LOCATION_UPLOAD + get_hostname()
-        # logging.info(f"Uploading GPS data to server: {location_upload_url}")
-        response = rh.post(url=location_upload_url, json=new_gps_location.data_to_upload(), timeout=5)
 
-        if response.status_code == 200:
-            logging.info(f"GPS data uploaded to server successfully: {new_gps_location.data_to_upload()}")
-        else:
-            logging.warning(f"GPS data upload to server failed with status code {response.status_code}!")
-            write_json(new_gps_location.data_to_upload(), PATH_TO_UPLOAD + FAILED_GPS_UPLOADS)
+        if not self.deduplicator.keep(location_id, frame):
+            with self._count_lock:
+                self.duplicate_frame_count += 1
+            return
+        os.makedirs(RECORDED_FILES, exist_ok=True)
+        if jpeg is not None:
+            # the compressed frame of the camera is written as it is, its overlay is the comment of the jpeg
+            self.deduplicator.add_bytes(write_jpeg(RECORDED_FILES + photo_name, jpeg, comment,
+                                                   self._parent.camera_manager.rotation))
+        elif cv2.imwrite(RECORDED_FILES + photo_name, frame, [cv2.IMWRITE_JPEG_QUALITY, JPG_SAVE_QUALITY]):
+            self.deduplicator.add_bytes(os.path.getsize(RECORDED_FILES + photo_name))
+        if check_file_size(RECORDED_FILES + photo_name, MINIMUM_PHOTO_SIZE):
+            if not enqueue_image(PATH_TO_UPLOAD + photo_name, self._parent.device_type,
+                                 image_params(location_id, str(gps_data.lat), str(gps_data.lng), gps_data.local_date)):
+                logging.warning(f"Photo {photo_name} is already in the upload outbox, it was overwritten!")
+            with self._count_lock:
+                self.saved_frame_count += 1
+
+    def _unique_name(self, name):
+        """Return `name`, or `name` with a -n suffix if one of the last photos got the same name."""
+        count = self._photo_names.get(name, 0)
+        self._photo_names[name] = count + 1
+        self._photo_names.move_to_end(name)
+        while len(self._photo_names) > PHOTO_NAME_HISTORY:
+            self._photo_names.popitem(last=False)
+        return name if count == 0 else f"{name}-{count}"
 
     def run(self) -> None:
+        gps_reader = self._parent.gps_reader
+        # with the position filter the distance is checked with the predicted positions between the fixes too
+        wait_time = GPS_FILTER_INTERVAL if gps_reader.position_filter is not None else 1
+        gps_sequence = 0
         while self._running:
-            gps_data = self._parent.gps_reader.get_gps_data()
+            sequence, gps_data = gps_reader.wait_for_gps_data(gps_sequence, timeout=wait_time)
+            new_fix = sequence != gps_sequence
+            if not new_fix and gps_reader.position_filter is None:
+                continue
+            gps_sequence = sequence
             if gps_data.is_valid():
-                Thread(target=self.upload_gps_data, args=(gps_data,), name="gps_upload").start()
+                if new_fix:
+                    self.gps_uploader.put(gps_data)
 
-                min_distance, closest_location_id = check_locations(
-                    gps_data=gps_data,
-                    locations=self.garbage_list
-                )
+                self.garbage_index = get_garbage_index()
+                location = gps_reader.get_location()
+                min_distance, closest_location = self.garbage_index.nearest(location)
+                closest_location_id = closest_location["id"] if closest_location is not None else None
 
-                if time.time() - self.location_log_time > 60:
+                if time.time() - self.location_log_time > 60 and closest_location is not None:
                     logging.info(f"Closest location: {closest_location_id} | "
                                  f"Distance: {int(min_distance)} meters | "
-                                 f"Speed: {gps_data.spkm} km/h")
+                                 f"Speed: {gps_data.spkm} km/h | "
+                                 f"Photo encoder: {self.encoder.stats()}")
                     self.location_log_time = time.time()
 
-                if time.time() - self.last_picture_save >= 2:
-                    self.last_picture_save = time.time()
-                    if (min_distance < self._parent.max_loc_dist and
-                            gps_data.spkm < self._parent.speed_limit):
-                        filename = (
-                            f"{self._parent.vehicle_id}_"
-                            f"{self._parent.device_type}_"
-                            f"{gps_data.local_date_str}_"
-                            f"{gps_data.lat},{gps_data.lng}_"
-                            f"{gps_data.spkm}kmh_"
-                            f"{closest_location_id}.jpg"
-                        )
-                        Thread(
-                            target=self.save_picture,
-                            args=(filename, closest_location_id),
-                            name="save_picture"
-                        ).start()
-            # else:
-            time.sleep(1)
+                for capture in self.geofence.update(self.garbage_index, location, gps_data.spkm, time.time()):
+                    self.capture(capture, gps_data)
+
+    def capture(self, capture, gps_data):
+        frames = self._parent.camera_manager.get_best_frames(capture.timestamp - CAPTURE_WINDOW,
+                                                             capture.timestamp + CAPTURE_WINDOW,
+                                                             capture.count,
+                                                             spacing=CAPTURE_SPACING)
+        if not frames:
+            logging.warning(f"No frame buffered around the best time of {capture}.")
+            frames = [(None, None, None)]
+        for frame, frame_time, jpeg in frames:
+            # the photo is tagged with the position at the time the frame was read
+            frame_gps_data = gps_data
+            if frame is not None:
+                frame_gps_data = self._parent.gps_reader.get_gps_data_at(frame_time)
+            # the frames out of the gps history get the same fix, their names are made unique with a suffix
+            filename = self._unique_name(
+                f"{self._parent.vehicle_id}_"
+                f"{self._parent.device_type}_"
+                f"{frame_gps_data.local_date_str}_"
+                f"{frame_gps_data.lat},{frame_gps_data.lng}_"
+                f"{frame_gps_data.spkm}kmh_"
+                f"{capture.location_id}"
+            ) + ".jpg"
+            comment = None
+            if jpeg is not None:
+                comment = f"{datetime.fromtimestamp(frame_time):%Y-%m-%d %H:%M:%S} | {frame_gps_data.to_camera()}"
+            self.encoder.submit(self.save_picture, filename, capture.location_id, frame_gps_data, frame, jpeg, comment)
 
     def stop(self):
         logging.info("Stopping recorder...")
         self._running = False
+        self.encoder.stop()
+        self.gps_uploader.stop()
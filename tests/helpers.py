@@ -0,0 +1,64 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from tools import calculate_distance
+from utils.gps_data import GPSData, dd2ddm
+
+METERS_PER_DEGREE = 111195  # meters of a degree of latitude, and of longitude on the equator
+GPS_START = datetime(2024, 5, 15, 12, tzinfo=timezone.utc)  # time of the fixes of `gps_fix`
+
+
+class Fix:
+    """Stand-in of a valid GPSData with the fields the gps filters read."""
+
+    def __init__(self, lat, lng, spkm=0.0, cog=0.0, hdop=1.0):
+        self.lat = lat
+        self.lng = lng
+        self.spkm = spkm
+        self.cog = cog
+        self.hdop = hdop
+
+
+class RoadsideIndex:
+    """Garbage index of one location `offset` meters from a road along the equator."""
+
+    def __init__(self, offset):
+        self.location = {"id": 1, "lat": offset / METERS_PER_DEGREE, "lng": 0.0}
+        self.offset = offset
+
+    def within(self, position, radius):
+        distance = math.hypot(position["lng"] * METERS_PER_DEGREE, self.offset)
+        return [(distance, self.location)] if distance <= radius else []
+
+
+def on_road(x):
+    """Position `x` meters along the road of a RoadsideIndex."""
+    return {"lat": 0.0, "lng": x / METERS_PER_DEGREE}
+
+
+def gps_fix(lat, lng, second=0, spkm=0.0, cog=0.0):
+    """A real GPSData with a 3D fix at `lat`, `lng`, `second` seconds after GPS_START, to the millisecond."""
+    utc = GPS_START + timedelta(seconds=second)
+    return GPSData(f"{utc.strftime('%H%M%S.%f')[:10]},{dd2ddm(lat)}N,{dd2ddm(lng)}E,1.2,100.0,3,{cog:.1f},{spkm:.1f},"
+                   f"{spkm / 1.852:.1f},{utc.strftime('%d%m%y')},08,04")
+
+
+CENTER = (40.788, 29.44)
+
+
+def random_locations(count, spread=0.05):
+    """Garbage locations around CENTER, with the coordinates as strings like the garbage list."""
+    return [{"id": str(i),
+             "lat": str(round(CENTER[0] + random.uniform(-spread, spread), 6)),
+             "lng": str(round(CENTER[1] + random.uniform(-spread, spread), 6))}
+            for i in range(count)]
+
+
+def random_query(spread=0.06):
+    return {"lat": CENTER[0] + random.uniform(-spread, spread), "lng": CENTER[1] + random.uniform(-spread, spread)}
+
+
+def brute_force(query, locations):
+    """(meters, index) of every location, closest first, ties in list order."""
+    return sorted((calculate_distance(query, location), index) for index, location in enumerate(locations))
@@ -0,0 +1,93 @@
+import numpy as np
+
+from constants.numbers import EXPOSURE_TARGET, EXPOSURE_BAND
+from utils.exposure_controller import ExposureController, meter
+from utils.v4l2_controls import ControlRange, V4L2_EXPOSURE_MANUAL, V4L2_EXPOSURE_APERTURE_PRIORITY
+
+FPS = 30
+DELAY = 2  # frames until a set exposure is applied
+EXPOSURE_RANGE = ControlRange("Exposure (Absolute)", 3, 2047, 1, 250)
+
+
+class SimulatedCamera:
+    """
+    The exposure controls of a camera with the interface of V4l2Controls, its frames are the scene luminance times the
+    exposure, saturated at 255, and a set exposure is applied `DELAY` frames later.
+    """
+
+    device = "simulated"
+
+    def __init__(self):
+        self.mode = V4L2_EXPOSURE_APERTURE_PRIORITY
+        self.exposure = self.applied = EXPOSURE_RANGE.default
+        self.pending = []
+        self.requested = []
+
+    def get_exposure_mode(self):
+        return self.mode
+
+    def set_exposure_mode(self, mode):
+        self.mode = mode
+
+    def query_exposure(self):
+        return EXPOSURE_RANGE
+
+    def get_exposure(self):
+        return self.exposure
+
+    def set_exposure(self, exposure):
+        self.requested.append(exposure)
+        self.exposure = EXPOSURE_RANGE.clamp(int(exposure))
+        self.pending.append([DELAY, self.exposure])
+        return self.exposure
+
+    def close(self):
+        pass
+
+    def read(self, luminance):
+        for change in self.pending:
+            change[0] -= 1
+            if change[0] == 0:
+                self.applied = change[1]
+        self.pending = [change for change in self.pending if change[0] > 0]
+        return np.full((48, 64, 3), min(luminance * self.applied, 255), dtype=np.uint8)
+
+
+def run(scenes):
+    """Brightness of every frame of the scenes, given as (seconds, luminance), and the camera."""
+    camera = SimulatedCamera()
+    controller = ExposureController(camera)
+    brightness, frames = [], 0
+    for seconds, luminance in scenes:
+        scene = []
+        for _ in range(seconds * FPS):
+            frame = camera.read(luminance)
+            controller.update(frame, frames / FPS)
+            scene.append(meter(frame))
+            frames += 1
+        brightness.append(scene)
+    return brightness, camera, controller
+
+
+def test_brightness_steps_converge_without_oscillating():
+    scenes = [(10, 0.45), (10, 0.07), (10, 1.6), (10, 0.3), (10, 0.06)]
+    brightness, camera, controller = run(scenes)
+    assert camera.mode == V4L2_EXPOSURE_MANUAL
+    for scene in brightness:
+        inside = [abs(value - EXPOSURE_TARGET) <= EXPOSURE_BAND for value in scene]
+        settled = len(inside) - inside[::-1].index(False) if False in inside else 0
+        assert settled < 3 * FPS
+        # a step may overshoot the band once, then the brightness stays still
+        assert sum(1 for before, after in zip(inside, inside[1:]) if before and not after) <= 1
+        assert len(set(scene[settled + FPS:])) == 1
+    assert controller.stats()["converged"] == len(scenes) - 1
+    assert controller.set_count < 20 * len(scenes)
+
+
+def test_exposure_is_clamped_to_its_range():
+    brightness, camera, controller = run([(5, 0.001), (5, 1000)])
+    assert all(EXPOSURE_RANGE.minimum <= exposure <= EXPOSURE_RANGE.maximum for exposure in camera.requested)
+    assert EXPOSURE_RANGE.maximum in camera.requested and camera.requested[-1] == EXPOSURE_RANGE.minimum
+    # the saturated scenes don't wind the exposure up beyond its range, the next scene converges as fast
+    brightness, camera, controller = run([(5, 0.001), (10, 0.45)])
+    assert abs(brightness[1][-1] - EXPOSURE_TARGET) <= EXPOSURE_BAND
@@ -0,0 +1,76 @@
+import numpy as np
+
+from constants.numbers import CAPTURE_COUNT, CAPTURE_SPACING, CAPTURE_WINDOW
+from tests.helpers import RoadsideIndex, on_road
+from utils.frame_buffer import FrameBuffer
+from utils.geofence import Geofence
+
+FPS = 30
+
+
+def frame(value):
+    return np.full((6, 8, 3), value % 256, dtype=np.uint8)
+
+
+def test_history_keeps_the_best_frame_of_every_interval():
+    buffer = FrameBuffer(size=4, history_size=3, history_interval=1)
+    for number, score in enumerate([1, 5, 2, 3, 1, 4, 9]):
+        buffer.commit(frame(number), number / 3, score)
+    assert len(buffer) == 3
+    assert [time for _, time, _ in buffer.best(0, 3, 3)] == [1 / 3, 5 / 3, 2]
+    assert buffer.nearest(1.5)[1] == 5 / 3
+
+
+def test_history_frames_are_not_overwritten_by_the_camera():
+    buffer = FrameBuffer(size=2, history_size=3, history_interval=1)
+    buffer.commit(frame(0), 0, 0)
+    for number in range(1, 30):
+        slot = buffer.acquire()
+        slot[:] = frame(number)
+        buffer.commit(slot, number / 3, score=number % 3)
+    frames = buffer.best(0, 10, 3)
+    assert [time for _, time, _ in frames] == [23 / 3, 26 / 3, 29 / 3]
+    assert [kept[0, 0, 0] for kept, _, _ in frames] == [23, 26, 29]
+
+
+def test_new_frame_size_clears_the_history():
+    buffer = FrameBuffer(size=2, history_size=3, history_interval=1)
+    for number in range(9):
+        buffer.commit(frame(number), number, score=10)
+    small = np.zeros((2, 2, 3), dtype=np.uint8)
+    buffer.commit(small, 9.0, score=1)
+    buffer.commit(small + 1, 9.5, score=2)
+    assert len(buffer) == 1
+    assert [(kept[0, 0, 0], time) for kept, time, _ in buffer.best(0, 10, 3)] == [(1, 9.5)]
+
+
+def test_latest_is_a_copy():
+    buffer = FrameBuffer(size=2)
+    buffer.commit(frame(1), 0)
+    latest, timestamp = buffer.latest()
+    for number in range(2, 6):
+        buffer.commit(frame(number), number)
+    assert timestamp == 0 and np.all(latest == 1)
+
+
+def test_closest_approach_frames_are_buffered_when_captured():
+    buffer = FrameBuffer()
+    geofence = Geofence(radius=20, speed_limit=5)
+    index = RoadsideIndex(5)
+    speed = 2  # km/h, the slowest drive-by has the latest decision
+    captured = []
+    for number in range(int(90 * FPS)):
+        timestamp = number / FPS
+        buffer.commit(frame(number), timestamp, score=float(number % 7))
+        if number % (FPS // 5):
+            continue
+        x = -40 + speed / 3.6 * timestamp
+        for capture in geofence.update(index, on_road(x), speed, timestamp):
+            captured.append((capture, buffer.best(capture.timestamp - CAPTURE_WINDOW,
+                                                  capture.timestamp + CAPTURE_WINDOW,
+                                                  capture.count, spacing=CAPTURE_SPACING)))
+    assert len(captured) == 1
+    capture, frames = captured[0]
+    assert capture.reason == "closest approach"
+    assert len(frames) == CAPTURE_COUNT
+    assert all(abs(time - capture.timestamp) <= CAPTURE_WINDOW for _, time, _ in frames)
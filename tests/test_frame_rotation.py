@@ -0,0 +1,38 @@
+import numpy as np
+
+from utils.frame_rotation import FrameRotator
+
+
+def camera_frame(height=4, width=6):
+    return np.arange(height * width * 3, dtype=np.uint8).reshape(height, width, 3)
+
+
+def test_right_angles_rotate_counterclockwise():
+    frame = camera_frame()
+    for angle, shape in [(0, (4, 6, 3)), (90, (6, 4, 3)), (180, (4, 6, 3)), (270, (6, 4, 3)), (-90, (6, 4, 3))]:
+        rotator = FrameRotator(angle)
+        rotated = rotator.rotate(frame)
+        assert rotated.shape == rotator.output_shape(frame.shape) == shape
+        assert np.array_equal(rotated, np.rot90(frame, angle // 90))
+    assert FrameRotator(0).rotate(frame) is frame
+    assert FrameRotator(90).output_size(640, 480) == (480, 640)
+    assert FrameRotator(180).output_size(640, 480) == (640, 480)
+
+
+def test_rotation_is_written_into_out():
+    frame = camera_frame()
+    rotator = FrameRotator(90)
+    out = np.empty((6, 4, 3), dtype=np.uint8)
+    assert rotator.rotate(frame, out) is out
+    assert np.array_equal(out, np.rot90(frame))
+    wrong = np.empty((4, 6, 3), dtype=np.uint8)
+    rotated = rotator.rotate(frame, wrong)
+    assert rotated is not wrong and rotated.shape == (6, 4, 3)
+
+
+def test_other_angles_keep_the_frame_size():
+    frame = camera_frame(48, 64)
+    rotator = FrameRotator(30)
+    assert rotator.enabled
+    assert rotator.rotate(frame).shape == frame.shape == rotator.output_shape(frame.shape)
+    assert rotator.rotate(camera_frame(64, 48)).shape == (64, 48, 3)
@@ -0,0 +1,37 @@
+from tests.helpers import RoadsideIndex, on_road
+from utils.geofence import Geofence
+
+
+def drive(speed, offset, stop_for=0, step=0.2):
+    """Captures of a drive past the location at `speed` km/h, stopping `stop_for` seconds at its closest point."""
+    geofence = Geofence(radius=20, speed_limit=5)
+    index = RoadsideIndex(offset)
+    captures = []
+    x, timestamp, stopped = -40.0, 0.0, 0.0
+    while x < 40:
+        standing = x >= 0 and stopped < stop_for
+        for capture in geofence.update(index, on_road(x), 0 if standing else speed, timestamp):
+            captures.append((timestamp, capture))
+        if standing:
+            stopped += step
+        else:
+            x += speed / 3.6 * step
+        timestamp += step
+    return captures
+
+
+def test_slow_drive_by_is_captured_once_at_the_closest_approach():
+    for speed in (1.5, 2, 4):
+        captures = drive(speed, 5)
+        assert [capture.reason for _, capture in captures] == ["closest approach"]
+        decided_at, capture = captures[0]
+        assert capture.count == 3
+        assert capture.distance == 5
+        assert abs(capture.timestamp - 40 / (speed / 3.6)) < 0.5
+        assert decided_at - capture.timestamp <= 3 + 0.2
+
+
+def test_standing_vehicle_dwells():
+    captures = drive(4, 3, stop_for=30)
+    assert [capture.reason for _, capture in captures] == ["dwell"] * 3
+    assert all(capture.count == 1 for _, capture in captures)
@@ -0,0 +1,72 @@
+import pytest
+
+from tests.helpers import gps_fix
+from utils.gps_history import GpsHistory, interpolate_angle
+
+DEGREE = 1e-6  # the fixes keep their coordinates in ddmm.mmmm, ~0.2 m
+
+
+def drive(count, start=0):
+    """A fix every second going north east, speeding up and turning."""
+    return [gps_fix(40.788 + second * 1e-4, 29.44 + second * 2e-4, start + second, spkm=10 + second,
+                    cog=second * 10 % 360) for second in range(count)]
+
+
+def time_of(fix):
+    return fix.local_date.timestamp()
+
+
+def test_position_between_two_fixes_is_interpolated():
+    history = GpsHistory()
+    first, second = drive(2)
+    history.append(first)
+    history.append(second)
+    fix = history.at(time_of(first) + 0.25)
+    assert fix.is_valid()
+    assert time_of(fix) == pytest.approx(time_of(first) + 0.25)
+    assert fix.lat == pytest.approx(first.lat + 0.25 * (second.lat - first.lat), abs=DEGREE)
+    assert fix.lng == pytest.approx(first.lng + 0.25 * (second.lng - first.lng), abs=DEGREE)
+    assert (fix.spkm, fix.cog) == (pytest.approx(10.2), pytest.approx(2.5))
+    assert (fix.hdop, fix.nsat_gps) == (first.hdop, first.nsat_gps)
+
+
+def test_heading_turns_the_shorter_way():
+    assert interpolate_angle(350, 10, 0.5) == pytest.approx(0)
+    assert interpolate_angle(10, 350, 0.25) == pytest.approx(5)
+    assert interpolate_angle(90, 270, 0.5) == pytest.approx(0)
+
+
+def test_times_of_the_fixes_and_out_of_the_history():
+    history = GpsHistory()
+    assert history.at(time_of(gps_fix(40, 29))) is None
+    fixes = drive(5)
+    for fix in fixes:
+        history.append(fix)
+    assert all(history.at(time_of(fix)) is fix for fix in fixes)
+    assert history.at(time_of(fixes[0]) - 10) is fixes[0]
+    assert history.at(time_of(fixes[-1]) + 10) is fixes[-1]
+
+
+def test_fixes_too_far_apart_are_not_interpolated():
+    history = GpsHistory(max_gap=5)
+    before, after = gps_fix(40.788, 29.44, 0), gps_fix(40.8, 29.45, 10)
+    history.append(before)
+    history.append(after)
+    assert history.at(time_of(before) + 4) is before
+    assert history.at(time_of(before) + 6) is after
+
+
+def test_ring_wraps_around():
+    history = GpsHistory(size=5)
+    fixes = drive(12)
+    for fix in fixes:
+        history.append(fix)
+    assert len(history) == 5
+    assert list(history.records()["time"]) == [time_of(fix) for fix in fixes[7:]]
+    # the 7 oldest fixes are overwritten, the oldest kept is returned for the times before it
+    assert history.at(time_of(fixes[3])) is fixes[7]
+    # fixes 9 and 10 are in the last and the first slot of the ring
+    fix = history.at(time_of(fixes[9]) + 0.5)
+    assert fix.lat == pytest.approx((fixes[9].lat + fixes[10].lat) / 2, abs=DEGREE)
+    assert fix.spkm == pytest.approx(19.5)
+    assert history.at(time_of(fixes[11])) is fixes[11]
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from constants.numbers import GPS_UPLOAD_MIN_DISTANCE, TRACK_MAX_DELAY
+from src.gps_uploader import GpsUploader
+from tests.helpers import METERS_PER_DEGREE, gps_fix
+
+
+@pytest.fixture
+def uploader(monkeypatch):
+    uploader = GpsUploader(batch_size=1000, max_latency=1000)
+    queued, spilled = [], []
+    monkeypatch.setattr(uploader, "_put", queued.append)
+    monkeypatch.setattr(uploader, "spill", spilled.extend)
+    yield uploader, queued, spilled
+    uploader.stop()
+
+
+def test_fixes_within_min_distance_are_not_uploaded(uploader):
+    uploader, queued, spilled = uploader
+    random.seed(0)
+    radius = GPS_UPLOAD_MIN_DISTANCE / 2 / METERS_PER_DEGREE
+    assert uploader.put(gps_fix(40.788, 29.44, 0, spkm=20))
+    # a slow vehicle jittering around the first fix, its speed changes would be kept further away
+    for second in range(1, TRACK_MAX_DELAY):
+        fix = gps_fix(40.788 + random.uniform(-radius, radius), 29.44 + random.uniform(-radius, radius), second,
+                      spkm=random.choice((5, 20, 40)))
+        assert not uploader.put(fix)
+    assert len(queued) == 1
+    uploader.stop()
+    assert spilled == []
+
+
+def test_fixes_beyond_min_distance_are_uploaded(uploader):
+    uploader, queued, spilled = uploader
+    step = 2 * GPS_UPLOAD_MIN_DISTANCE / METERS_PER_DEGREE
+    uploader.put(gps_fix(40.788, 29.44, 0, spkm=30))
+    # north and then east, the corner is uploaded
+    for second in range(1, 5):
+        uploader.put(gps_fix(40.788 + second * step, 29.44, second, spkm=30))
+    for second in range(5, 9):
+        uploader.put(gps_fix(40.788 + 4 * step, 29.44 + (second - 4) * step, second, spkm=30))
+    uploader.stop()
+    uploaded = [(float(point["lat"]), float(point["lng"])) for point in queued + spilled]
+    expected = [(40.788, 29.44), (40.788 + 4 * step, 29.44), (40.788 + 4 * step, 29.44 + 4 * step)]
+    assert len(uploaded) == len(expected)
+    for point, (lat, lng) in zip(uploaded, expected):
+        assert point == (pytest.approx(lat, abs=1e-5), pytest.approx(lng, abs=1e-5))
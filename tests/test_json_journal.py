@@ -0,0 +1,79 @@
+import json
+
+from tools import read_json
+from utils.json_journal import JsonJournal
+
+
+def records(count, start=0):
+    return [{"file": f"photo_{number}.jpg", "size": number} for number in range(start, start + count)]
+
+
+def write_lines(path, lines):
+    path.write_bytes(b"".join(line.encode() for line in lines))
+
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    path = tmp_path / "uploaded.json"
+    write_lines(path, [json.dumps(record) + "\n" for record in records(2)] + ['{"file": "photo_2.j'])
+    journal = JsonJournal(str(path))
+    assert list(journal) == records(2)
+    assert journal.append(records(1, 2)[0])
+    assert list(JsonJournal(str(path))) == records(3)
+
+
+def test_corrupted_lines_are_moved_aside(tmp_path):
+    path = tmp_path / "uploaded.json"
+    write_lines(path, [json.dumps(records(1)[0]) + "\n", "{not json\n", json.dumps(records(1, 1)[0]) + "\n"])
+    assert list(JsonJournal(str(path))) == records(2)
+    assert (tmp_path / "uploaded.json.corrupted").read_text() == "{not json\n"
+
+
+def test_duplicates_are_dropped_across_a_restart(tmp_path):
+    path = str(tmp_path / "uploaded.json")
+    journal = JsonJournal(path)
+    assert all(journal.append(record) for record in records(3))
+    assert not journal.append(records(1)[0])
+    journal.sync()
+    restarted = JsonJournal(path)
+    assert not restarted.append(records(1, 2)[0])
+    assert restarted.append(records(1, 3)[0])
+    assert list(restarted) == records(4)
+
+
+def test_compaction_keeps_the_records_not_consumed(tmp_path):
+    path = str(tmp_path / "failed.json")
+    journal = JsonJournal(path, compact_size=100)
+    for record in records(50):
+        journal.append(record)
+    offset, chunk = next(journal.read_chunks(chunk_size=30))
+    assert chunk == records(30)
+    journal.discard_until(offset)
+    assert list(journal) == records(20, 30)
+    assert not (tmp_path / "failed.json.offset").exists()
+    # a consumed record can be appended again, the records not consumed are still deduplicated
+    assert journal.append(records(1)[0])
+    assert not journal.append(records(1, 40)[0])
+    assert list(JsonJournal(path)) == records(20, 30) + records(1)
+
+
+def test_consumed_offset_survives_a_restart(tmp_path):
+    path = str(tmp_path / "failed.json")
+    journal = JsonJournal(path)
+    for record in records(10):
+        journal.append(record)
+    offset, _ = next(journal.read_chunks(chunk_size=4))
+    journal.discard_until(offset)
+    assert list(JsonJournal(path)) == records(6, 4)
+    assert read_json(path) == records(6, 4)
+
+
+def test_read_json_does_not_change_the_file(tmp_path):
+    empty, scalar, array = tmp_path / "empty.json", tmp_path / "scalar.json", tmp_path / "array.json"
+    empty.write_text("[]")
+    scalar.write_text("42")
+    array.write_text(json.dumps(records(3)))
+    assert read_json(str(empty)) == []
+    assert read_json(str(scalar)) == []
+    assert read_json(str(array)) == records(3)
+    assert read_json(str(tmp_path / "missing.json")) == []
+    assert (empty.read_text(), scalar.read_text(), array.read_text()) == ("[]", "42", json.dumps(records(3)))
@@ -0,0 +1,38 @@
+import random
+
+from tests.helpers import brute_force, random_locations, random_query
+from tools import calculate_distance
+from utils.location_array import LocationArray, haversine
+
+
+def test_closest_and_top_k_match_a_brute_force_scan():
+    random.seed(0)
+    locations = random_locations(500)
+    locations += [dict(location, id=location["id"] + "-copy") for location in locations[:50]]
+    array = LocationArray(locations)
+    for _ in range(100):
+        query = random_query()
+        expected = brute_force(query, locations)
+        assert array.closest(query) == expected[0]
+        assert array.top_k(query, 10) == expected[:10]
+        assert list(array.distances(query)) == [calculate_distance(query, location) for location in locations]
+
+
+def test_top_k_of_more_than_the_locations():
+    random.seed(1)
+    locations = random_locations(5)
+    query = random_query()
+    assert LocationArray(locations).top_k(query, 10) == brute_force(query, locations)
+
+
+def test_empty_array():
+    array = LocationArray([])
+    assert array.closest(random_query()) == (float("inf"), None)
+    assert array.top_k(random_query(), 3) == []
+
+
+def test_haversine_is_calculate_distance():
+    random.seed(2)
+    for first, second in zip(random_locations(100), random_locations(100)):
+        assert haversine(float(first["lat"]), float(first["lng"]), float(second["lat"]), float(second["lng"])) == \
+            calculate_distance(first, second)
@@ -0,0 +1,55 @@
+import random
+
+from tests.helpers import brute_force, random_locations, random_query
+from utils.location_index import LocationIndex
+
+
+def with_duplicates(locations, count):
+    """The locations and copies of the first `count` of them, the copies come last in the list."""
+    return locations + [dict(location, id=location["id"] + "-copy") for location in locations[:count]]
+
+
+def test_nearest_and_within_match_a_brute_force_scan():
+    random.seed(0)
+    locations = with_duplicates(random_locations(1000), 100)
+    for leaf_size in (1, 4, 32):
+        index = LocationIndex(locations, leaf_size=leaf_size)
+        queries = [random_query() for _ in range(100)]
+        # queries on the locations and their copies, the location first in the list wins the tie
+        queries += [{"lat": float(location["lat"]), "lng": float(location["lng"])} for location in locations[:20]]
+        for query in queries:
+            expected = brute_force(query, locations)
+            distance, location = index.nearest(query)
+            assert (distance, location) == (expected[0][0], locations[expected[0][1]])
+            for radius in (0, 50, 300, 1000):
+                assert index.within(query, radius) == [(meters, locations[i]) for meters, i in expected
+                                                       if meters <= radius]
+
+
+def test_within_keeps_the_locations_on_the_border():
+    random.seed(1)
+    locations = random_locations(200)
+    index = LocationIndex(locations, leaf_size=4)
+    for _ in range(50):
+        query = random_query()
+        expected = brute_force(query, locations)
+        for meters, i in expected[:5]:
+            assert locations[i] in [location for _, location in index.within(query, meters)]
+
+
+def test_empty_index():
+    index = LocationIndex([])
+    assert len(index) == 0
+    assert index.nearest(random_query()) == (float("inf"), None)
+    assert index.within(random_query(), 1000) == []
+
+
+def test_index_of_one_location_repeated():
+    random.seed(2)
+    location = random_locations(1)[0]
+    locations = [dict(location, id=str(i)) for i in range(40)]
+    index = LocationIndex(locations, leaf_size=4)
+    query = random_query()
+    distance, location = index.nearest(query)
+    assert location is locations[0]
+    assert [found for _, found in index.within(query, distance)] == locations
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils.mjpeg import APP0, APP1, COM, DHT, ORIENTATIONS, _segments, write_jpeg
+
+
+def camera_frame():
+    frame = cv2.GaussianBlur(np.random.default_rng(0).integers(0, 255, (48, 64, 3), dtype=np.uint8), (5, 5), 0)
+    return cv2.imencode(".jpg", frame)[1]
+
+
+def test_exif_follows_the_jfif_segment(tmp_path):
+    jpeg = camera_frame()
+    path = str(tmp_path / "photo.jpg")
+    size = write_jpeg(path, jpeg, "2023-01-08 10:00:00 | NO FIX", rotation=90)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert size == len(data)
+    markers = [marker for marker, _, _ in _segments(data)]
+    assert markers[:3] == [APP0, APP1, COM]
+    assert DHT in markers
+    start, end = [(start, end) for marker, start, end in _segments(data) if marker == APP1][0]
+    assert data[start + 4:start + 10] == b"Exif\x00\x00"
+    assert int.from_bytes(data[start + 28:start + 30], "big") == ORIENTATIONS[90]
+    assert np.array_equal(cv2.imread(path, cv2.IMREAD_IGNORE_ORIENTATION | cv2.IMREAD_COLOR),
+                          cv2.imdecode(jpeg, cv2.IMREAD_COLOR))
+
+
+def test_upright_frame_has_no_exif(tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    write_jpeg(path, camera_frame(), rotation=0)
+    with open(path, "rb") as f:
+        assert APP1 not in [marker for marker, _, _ in _segments(f.read())]
+
+
+def test_rotation_that_is_not_a_right_angle_is_rejected(tmp_path):
+    path = tmp_path / "photo.jpg"
+    with pytest.raises(ValueError):
+        write_jpeg(str(path), camera_frame(), rotation=15)
+    assert not path.exists()
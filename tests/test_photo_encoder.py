@@ -0,0 +1,57 @@
+import threading
+import time
+
+from src.photo_encoder import PhotoEncoder, DROP_NEWEST, DROP_OLDEST
+
+
+def blocked_encoder(queue_size, drop_policy):
+    """An encoder of one worker busy with a job until the returned event is set, and the list of the jobs run."""
+    done = []
+    release = threading.Event()
+    encoder = PhotoEncoder(workers=1, queue_size=queue_size, drop_policy=drop_policy)
+    encoder.submit(lambda: (release.wait(5), done.append("busy")))
+    while encoder.stats()["busy"] == 0:
+        time.sleep(0.001)
+    return encoder, release, done
+
+
+def test_every_job_is_run_before_stop_returns():
+    done = []
+    encoder = PhotoEncoder(workers=3, queue_size=100)
+    for number in range(50):
+        assert encoder.submit(done.append, number)
+    encoder.stop()
+    assert sorted(done) == list(range(50))
+    stats = encoder.stats()
+    assert (stats["done"], stats["dropped"], stats["queued"], stats["busy"]) == (50, 0, 0, 0)
+
+
+def test_full_queue_drops_the_oldest_job():
+    encoder, release, done = blocked_encoder(3, DROP_OLDEST)
+    assert all(encoder.submit(done.append, number) for number in range(3))
+    assert not encoder.submit(done.append, 3)
+    assert encoder.depth() == 3
+    release.set()
+    encoder.stop()
+    assert done == ["busy", 1, 2, 3]
+    assert encoder.dropped_count == 1
+
+
+def test_full_queue_drops_the_newest_job():
+    encoder, release, done = blocked_encoder(3, DROP_NEWEST)
+    assert all(encoder.submit(done.append, number) for number in range(3))
+    assert not encoder.submit(done.append, 3)
+    release.set()
+    encoder.stop()
+    assert done == ["busy", 0, 1, 2]
+    assert encoder.dropped_count == 1
+
+
+def test_failed_job_does_not_stop_the_worker():
+    done = []
+    encoder = PhotoEncoder(workers=1, queue_size=10)
+    encoder.submit(lambda: 1 / 0)
+    encoder.submit(done.append, "saved")
+    encoder.stop()
+    assert done == ["saved"]
+    assert (encoder.failed_count, encoder.done_count) == (1, 2)
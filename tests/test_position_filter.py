@@ -0,0 +1,33 @@
+from constants.numbers import GPS_FILTER_MAX_REJECTED
+from tests.helpers import METERS_PER_DEGREE, Fix
+from utils.position_filter import PositionFilter
+
+
+def north(meters):
+    """Fix of a standing vehicle `meters` north of the start."""
+    return Fix(40.0 + meters / METERS_PER_DEGREE, 29.0)
+
+
+def test_jumps_are_skipped_up_to_max_rejected_in_a_row():
+    position_filter = PositionFilter()
+    for second in range(10):
+        position_filter.update(north(0), second)
+    for second in range(10, 10 + GPS_FILTER_MAX_REJECTED):
+        lat, _ = position_filter.update(north(200), second)
+        assert abs(lat - 40.0) * METERS_PER_DEGREE < 1
+    assert position_filter.rejected_count == GPS_FILTER_MAX_REJECTED
+
+    lat, _ = position_filter.update(north(200), 10 + GPS_FILTER_MAX_REJECTED)
+    assert position_filter.rejected_count == GPS_FILTER_MAX_REJECTED
+    assert (lat - 40.0) * METERS_PER_DEGREE > 10
+
+
+def test_a_fix_in_the_gate_resets_the_rejections():
+    position_filter = PositionFilter()
+    for second in range(10):
+        position_filter.update(north(0), second)
+    position_filter.update(north(200), 10)
+    position_filter.update(north(0), 11)
+    for second in range(12, 12 + GPS_FILTER_MAX_REJECTED):
+        position_filter.update(north(200), second)
+    assert position_filter.rejected_count == 1 + GPS_FILTER_MAX_REJECTED
@@ -0,0 +1,67 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from constants.numbers import HTTP_RETRIES
+import utils.request_handler as rh
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubMonitor:
+    def __init__(self):
+        self.reports = []
+
+    def report_success(self):
+        self.reports.append(True)
+
+    def report_failure(self):
+        self.reports.append(False)
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def closed_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    rh.configure(retries=0)
+    yield f"http://127.0.0.1:{port}/"
+    rh.set_monitor(None)
+    rh.configure(retries=HTTP_RETRIES)
+
+
+def test_requests_do_not_start_the_monitor(closed_url):
+    assert rh.post(closed_url, timeout=1).status_code == -2
+    assert rh.get(closed_url, timeout=1).status_code == -2
+    assert rh._monitor is None
+
+
+def test_requests_are_reported_to_the_monitor_set(closed_url):
+    monitor = StubMonitor()
+    rh.set_monitor(monitor)
+    rh.get(closed_url, timeout=1)
+    assert monitor.reports == [False]
+
+
+def test_monitor_probes_the_url_given(closed_url):
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        assert rh.get_monitor(probe_url=f"http://127.0.0.1:{server.server_port}/").is_online(timeout=5)
+        rh.set_monitor(None)
+        assert not rh.get_monitor(probe_url=closed_url).is_online(timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,79 @@
+import math
+import random
+
+from constants.numbers import GPS_UPLOAD_MIN_DISTANCE, TRACK_TOLERANCE, TRACK_MAX_DELAY
+from tests.helpers import METERS_PER_DEGREE, Fix
+from utils.track_simplifier import TrackSimplifier, to_xy, segment_distance
+
+
+def noisy_drive(seconds=1800, noise=3):
+    """A drive stopping at a container every 5 minutes and turning between them, with gps noise."""
+    random.seed(0)
+    lat, lng = 40.788, 29.44
+    course, speed = 90.0, 30.0
+    track = []
+    for second in range(seconds):
+        phase = second % 300
+        if phase < 20:
+            speed = max(speed - 3, 0)
+        elif phase < 40:
+            speed = 0
+        elif phase < 60:
+            speed = min(speed + 3, 40)
+        if phase == 150:
+            course = (course + 90) % 360
+        course += random.uniform(-1, 1)
+        lat += speed / 3.6 * math.cos(math.radians(course)) / METERS_PER_DEGREE
+        lng += speed / 3.6 * math.sin(math.radians(course)) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        track.append(Fix(lat + random.gauss(0, noise) / METERS_PER_DEGREE,
+                         lng + random.gauss(0, noise) / METERS_PER_DEGREE,
+                         max(speed + random.uniform(-1, 1), 0)))
+    return track
+
+
+def max_deviation(track, kept):
+    """
+    Largest distance in meters of a dropped point to the kept segment around it, the points closer than
+    GPS_UPLOAD_MIN_DISTANCE to the start of the segment are skipped by design.
+    """
+    kept_index = {id(fix): i for i, fix in enumerate(kept)}
+    deviation = 0
+    segment = 0
+    for fix in track:
+        if id(fix) in kept_index:
+            segment = kept_index[id(fix)]
+            continue
+        start, end = kept[segment], kept[segment + 1]
+        if math.hypot(*to_xy(start, fix)) < GPS_UPLOAD_MIN_DISTANCE:
+            continue
+        deviation = max(deviation, segment_distance(to_xy(start, fix), (0, 0), to_xy(start, end)))
+    return deviation
+
+
+def simplify(track):
+    simplifier = TrackSimplifier()
+    kept = []
+    for second, fix in enumerate(track):
+        kept += simplifier.push(fix, second)
+    return kept + simplifier.flush()
+
+
+def test_kept_track_is_within_the_tolerance():
+    for noise in (0, 3):
+        track = noisy_drive(noise=noise)
+        kept = simplify(track)
+        assert kept[0] is track[0] and kept[-1] is track[-1]
+        assert len(kept) < len(track) / 5
+        assert max_deviation(track, kept) <= TRACK_TOLERANCE
+
+
+def test_standing_vehicle_is_not_kept_for_its_jitter():
+    random.seed(0)
+    track = [Fix(40.788 + random.gauss(0, 6) / METERS_PER_DEGREE, 29.44 + random.gauss(0, 6) / METERS_PER_DEGREE)
+             for _ in range(300)]
+    kept = simplify(track)
+    assert len(kept) < 15
+    # closer points are only kept for the delay, with the corner before them
+    close = [fix for previous, fix in zip(kept, kept[1:])
+             if math.hypot(*to_xy(previous, fix)) < GPS_UPLOAD_MIN_DISTANCE and fix is not track[-1]]
+    assert len(close) <= 2 * len(track) // TRACK_MAX_DELAY
@@ -0,0 +1,93 @@
+import os
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from tests.helpers import GPS_START, gps_fix
+from utils.track_store import RECORD, RECORD_MARKER, TrackStore, read_segment, record_to_gps_data, segment_path
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TrackStore(folder=str(tmp_path), flush_interval=3600)
+    yield store
+    store.stop()
+
+
+def drive(seconds, start=0):
+    return [gps_fix(40.788 + second * 1e-4, 29.44 - second * 1e-4, start + second, spkm=second % 50,
+                    cog=second * 7 % 360) for second in range(seconds)]
+
+
+def test_records_round_trip(store):
+    fixes = drive(20)
+    for fix in fixes:
+        store.append(fix)
+    records = store.query()
+    assert len(records) == len(fixes)
+    assert np.all(records["marker"] == RECORD_MARKER)
+    for record, fix in zip(records, fixes):
+        assert record["time"] == fix.local_date.timestamp()
+        assert (record["lat"], record["lng"], record["fix"]) == (fix.lat, fix.lng, fix.fix)
+        assert record["speed"] == np.float32(fix.spkm) and record["cog"] == np.float32(fix.cog)
+        replayed = record_to_gps_data(record)
+        assert (replayed.local_date, replayed.lat, replayed.lng, replayed.spkm) == \
+               (fix.local_date, fix.lat, fix.lng, fix.spkm)
+
+
+def test_query_of_a_time_and_a_box(store):
+    fixes = drive(20)
+    for fix in fixes:
+        store.append(fix)
+    start, end = fixes[5].local_date.timestamp(), fixes[14].local_date.timestamp()
+    assert list(store.query(start, end)["time"]) == [fix.local_date.timestamp() for fix in fixes[5:15]]
+    box = (fixes[10].lat, fixes[18].lng, fixes[18].lat, fixes[10].lng)
+    assert list(store.query(bbox=box)["lat"]) == [fix.lat for fix in fixes[10:19]]
+
+
+def test_blocks_without_the_marker_are_skipped(store):
+    fixes = drive(6)
+    for fix in fixes[:3]:
+        store.append(fix)
+    store.flush()
+    path = segment_path(store.folder, fixes[0].local_date)
+    with open(path, "ab") as f:
+        f.write(bytes(2 * RECORD.size))  # the zero filled blocks a crash leaves
+    for fix in fixes[3:]:
+        store.append(fix)
+    assert os.path.getsize(path) == 5 * RECORD.size
+    assert list(store.query()["time"]) == [fix.local_date.timestamp() for fix in fixes]
+
+
+def test_torn_record_is_skipped_and_cut_off(tmp_path, store):
+    fixes = drive(6)
+    for fix in fixes[:3]:
+        store.append(fix)
+    store.stop()
+    path = segment_path(store.folder, fixes[0].local_date)
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(0, 0, 0, 0, 0, 0, 3, RECORD_MARKER)[:RECORD.size // 2])
+    assert list(read_segment(path)["time"]) == [fix.local_date.timestamp() for fix in fixes[:3]]
+    # the next run cuts off the torn record before its first append
+    restarted = TrackStore(folder=str(tmp_path), flush_interval=3600)
+    for fix in fixes[3:]:
+        restarted.append(fix)
+    restarted.stop()
+    assert os.path.getsize(path) == 6 * RECORD.size
+    assert list(read_segment(path)["time"]) == [fix.local_date.timestamp() for fix in fixes]
+
+
+def test_records_roll_over_to_the_segment_of_the_next_day(store):
+    local_start = GPS_START.astimezone()
+    midnight = (local_start + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    fixes = drive(10, start=int((midnight - local_start).total_seconds()) - 5)
+    for fix in fixes:
+        store.append(fix)
+    store.flush()
+    paths = [segment_path(store.folder, fix.local_date) for fix in (fixes[0], fixes[-1])]
+    assert [len(read_segment(path)) for path in paths] == [5, 5]
+    start, end = fixes[0].local_date.timestamp(), fixes[-1].local_date.timestamp()
+    assert store.segments(start, end) == paths
+    assert store.segments(end, end) == paths[1:]
+    assert list(store.query(start, end)["time"]) == [fix.local_date.timestamp() for fix in fixes]
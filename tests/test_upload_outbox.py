@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from constants.numbers import OUTBOX_RETRY_WAIT
+from utils.singleton import Singleton
+from utils.upload_outbox import UploadOutbox
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    Singleton._instances.pop(UploadOutbox, None)
+    outbox = UploadOutbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.close()
+    Singleton._instances.pop(UploadOutbox, None)
+
+
+def payloads(items):
+    return [item.payload for item in items]
+
+
+def test_claim_takes_the_highest_priority_and_oldest_items_once(outbox):
+    outbox.enqueue_many("location", [{"n": 1}, {"n": 2}], priority=1)
+    outbox.enqueue("image", payload={"n": 3}, priority=3)
+    outbox.enqueue("image", payload={"n": 4}, priority=3)
+    assert payloads(outbox.claim(3)) == [{"n": 3}, {"n": 4}, {"n": 1}]
+    assert payloads(outbox.claim(3)) == [{"n": 2}]
+    assert outbox.claim(3) == []
+
+
+def test_claim_of_some_kinds(outbox):
+    outbox.enqueue("image", payload={"n": 1}, priority=3)
+    outbox.enqueue_many("location", [{"n": 2}])
+    assert payloads(outbox.claim(5, kinds=["location"])) == [{"n": 2}]
+    assert payloads(outbox.claim(5, kinds=["image", "video"])) == [{"n": 1}]
+
+
+def test_done_items_are_removed(outbox):
+    outbox.enqueue_many("location", [{"n": 1}, {"n": 2}])
+    outbox.done(outbox.claim(1))
+    assert outbox.stats()[0] == 1
+    outbox.release(outbox.claim(5))
+    assert payloads(outbox.claim(5)) == [{"n": 2}]
+
+
+def test_failed_items_are_retried_with_a_backoff(outbox, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    outbox.enqueue("video", payload={"n": 1})
+    for retries, wait in enumerate([OUTBOX_RETRY_WAIT, 2 * OUTBOX_RETRY_WAIT, 4 * OUTBOX_RETRY_WAIT]):
+        items = outbox.claim(1)
+        assert [item.retries for item in items] == [retries]
+        outbox.failed(items, "timeout")
+        monkeypatch.setattr(time, "time", lambda: now + wait - 1)
+        assert outbox.claim(1) == []
+        now += wait
+        monkeypatch.setattr(time, "time", lambda: now)
+    assert [(item.retries, item.last_error) for item in outbox.claim(1)] == [(3, "timeout")]
+
+
+def test_items_of_a_dead_consumer_are_reclaimed(outbox, tmp_path):
+    outbox.enqueue_many("location", [{"n": 1}, {"n": 2}])
+    outbox.enqueue("image", payload={"n": 3})
+    outbox.done(outbox.claim(1))
+    claimed = outbox.claim(5)
+    assert outbox.claim(5) == []
+    # a restarted consumer gets the same outbox, the items aren't reset by opening it
+    assert outbox.reclaim() == len(claimed)
+    assert payloads(outbox.claim(5)) == payloads(claimed)
+    outbox.close()
+    Singleton._instances.pop(UploadOutbox, None)
+    assert payloads(UploadOutbox(str(tmp_path / "outbox.db")).claim(5)) == payloads(claimed)
+
+
+def test_enqueue_of_a_file_twice(outbox, tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"jpeg")
+    assert outbox.enqueue("image", file_path=str(photo))
+    assert not outbox.enqueue("image", file_path=str(photo))
+    assert outbox.contains(str(photo))
+    assert outbox.stats() == (1, 4)
+
+
+def test_singleton_is_created_once_by_racing_threads():
+    class Slow(metaclass=Singleton):
+        created = 0
+
+        def __init__(self):
+            time.sleep(0.01)
+            Slow.created += 1
+
+    start = threading.Barrier(8)
+    instances = []
+
+    def create():
+        start.wait()
+        instances.append(Slow())
+
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    Singleton._instances.pop(Slow)
+    assert Slow.created == 1 and all(instance is instances[0] for instance in instances)
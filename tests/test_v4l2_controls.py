@@ -0,0 +1,76 @@
+import errno
+
+import pytest
+
+from utils.v4l2_controls import (CONTROL, QUERY_CONTROL, VIDIOC_G_CTRL, VIDIOC_S_CTRL, VIDIOC_QUERYCTRL,
+                                 V4L2_CID_EXPOSURE_ABSOLUTE, V4L2_CID_EXPOSURE_AUTO, V4L2_EXPOSURE_MANUAL,
+                                 V4L2_EXPOSURE_APERTURE_PRIORITY, V4l2Controls)
+
+
+class FakeDevice:
+    """The control ioctls of a camera with an exposure from 3 to 2047, a missing control fails like the driver."""
+
+    ranges = {V4L2_CID_EXPOSURE_ABSOLUTE: (b"Exposure (Absolute)", 3, 2047, 1, 250),
+              V4L2_CID_EXPOSURE_AUTO: (b"Auto Exposure", 0, 3, 1, 3)}
+
+    def __init__(self):
+        self.values = {V4L2_CID_EXPOSURE_ABSOLUTE: 250, V4L2_CID_EXPOSURE_AUTO: V4L2_EXPOSURE_APERTURE_PRIORITY}
+        self.requests = []
+
+    def ioctl(self, request, buffer):
+        self.requests.append(request)
+        if request == VIDIOC_QUERYCTRL:
+            control_id = QUERY_CONTROL.unpack(buffer)[0]
+            if control_id not in self.ranges:
+                raise OSError(errno.EINVAL, "Invalid argument")
+            buffer[:] = QUERY_CONTROL.pack(control_id, 1, *self.ranges[control_id], 0, 0, 0)
+            return 0
+        control_id, value = CONTROL.unpack(buffer)
+        if control_id not in self.values:
+            raise OSError(errno.EINVAL, "Invalid argument")
+        if request == VIDIOC_S_CTRL:
+            self.values[control_id] = value
+        buffer[:] = CONTROL.pack(control_id, self.values[control_id])
+        return 0
+
+
+@pytest.fixture
+def device(monkeypatch):
+    device = FakeDevice()
+    monkeypatch.setattr(V4l2Controls, "_ioctl", lambda controls, request, buffer: device.ioctl(request, buffer))
+    return device
+
+
+def test_struct_sizes_and_ioctl_numbers_match_videodev2():
+    assert CONTROL.size == 8  # struct v4l2_control
+    assert QUERY_CONTROL.size == 68  # struct v4l2_queryctrl
+    assert VIDIOC_G_CTRL == 0xc008561b
+    assert VIDIOC_S_CTRL == 0xc008561c
+    assert VIDIOC_QUERYCTRL == 0xc0445624
+
+
+def test_exposure_range_is_read_once(device):
+    controls = V4l2Controls("/dev/video0")
+    exposure_range = controls.query_exposure()
+    assert (exposure_range.name, exposure_range.minimum, exposure_range.maximum, exposure_range.default) == \
+           ("Exposure (Absolute)", 3, 2047, 250)
+    controls.query_exposure()
+    assert device.requests == [VIDIOC_QUERYCTRL]
+
+
+def test_values_are_cached_and_clamped(device):
+    controls = V4l2Controls("/dev/video0")
+    assert controls.get_exposure_mode() == V4L2_EXPOSURE_APERTURE_PRIORITY
+    assert controls.set_exposure_mode(V4L2_EXPOSURE_MANUAL) == V4L2_EXPOSURE_MANUAL
+    assert controls.set_exposure(5000) == 2047 and device.values[V4L2_CID_EXPOSURE_ABSOLUTE] == 2047
+    assert controls.set_exposure(1) == 3
+    requests = len(device.requests)
+    assert controls.set_exposure(3) == 3 and controls.get_exposure() == 3
+    assert len(device.requests) == requests
+    assert controls.get(V4L2_CID_EXPOSURE_ABSOLUTE, cached=False) == 3
+    assert device.requests[-1] == VIDIOC_G_CTRL
+
+
+def test_missing_control_raises(device):
+    with pytest.raises(OSError):
+        V4l2Controls("/dev/video0").get(0x00980900)  # brightness, not on the device
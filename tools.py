@@ -12,37 +12,23 @@ import cv2
 from constants.folders import PATH_TO_UPLOAD
 from constants.files import device_config_file
 
+from utils.json_journal import get_journal, read_records, NotAJournalError
 from utils.size_converter import SizeConverter
 
 
 def read_json(json_file):
+    """Return the records of a JSON-lines or JSON array file, [] if there are none. The file isn't changed."""
     try:
-        if not os.path.isfile(json_file):
-            return []
-        if os.path.getsize(json_file) == 0:
-            return []
-        else:
-            return json.load(open(json_file, "r"))
-    except json.decoder.JSONDecodeError as json_error:
-        logging.error(f"JSONDecodeError happened at {json_file}: {json_error.pos}. "
-                      f"Trying to backup the file...", exc_info=True)
-        backup_file = json_file.replace(".json", "_backup.json")
-        shutil.move(json_file, backup_file)
-        logging.info(f"Backup file created: {backup_file}")
+        return read_records(json_file)
+    except NotAJournalError:
+        logging.exception(f"Error happened while reading '{json_file}' file.")
         return []
 
 
 def write_json(json_data, json_file):
     try:
-        json_file_path = os.path.split(json_file)[0]
-        os.makedirs(json_file_path, exist_ok=True)
-        data = read_json(json_file)
-        if json_data not in data:
-            data.append(json_data)
-        else:
+        if not get_journal(json_file).append(json_data):
             logging.warning(f"JSON data already exists in {json_file} file: {json_data}")
-            return
-        json.dump(data, open(json_file, "w"))
     except:
         logging.exception(f"Error happened while writing to '{json_file}' file.")
 
@@ -76,7 +62,10 @@ def calculate_distance(location1, location2) -> float:
     phi2 = lat2 * math.pi / 180
     delta_phi = (lat2 - lat1) * math.pi / 180
     delta_lambda = (lon2 - lon1) * math.pi / 180
-    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    # squares are multiplications (not `** 2`) so utils.location_array.haversine returns the same bits
+    sin_phi = math.sin(delta_phi / 2)
+    sin_lambda = math.sin(delta_lambda / 2)
+    a = sin_phi * sin_phi + math.cos(phi1) * math.cos(phi2) * (sin_lambda * sin_lambda)
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return radius * c
 
@@ -2,7 +2,16 @@ import json
 import logging
 import subprocess as sp
 import time
-import os
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+DIRECT_CAPTURE = "direct"
+PIPE_CAPTURE = "pipe"
+LOOPBACK_CAPTURE = "loopback"
+MJPEG_CAPTURE = "mjpeg"
+CAPTURE_MODES = (DIRECT_CAPTURE, PIPE_CAPTURE, LOOPBACK_CAPTURE, MJPEG_CAPTURE)
 
 
 def create_virtual_cameras(count=1):
@@ -68,6 +77,80 @@ def stream_to_rtsp(virtual_camera, rtsp_url):
         return False
 
 
+def stream_frames_to_rtsp(rtsp_url, width, height, fps, mjpeg=False):
+    """Start an ffmpeg encoding the bgr24 frames, or the jpeg frames if `mjpeg`, written to its stdin to `rtsp_url`."""
+    logging.info(f"Streaming frames to {rtsp_url} with {width}x{height} @ {fps}fps")
+    try:
+        source = "-f mjpeg" if mjpeg else f"-f rawvideo -pix_fmt bgr24 -s {width}x{height}"
+        command = (f"ffmpeg {source} -r {fps} -i pipe: "
+                   f"-c:v libx264 -crf 30 -preset ultrafast -tune zerolatency -pix_fmt yuv420p "
+                   f"-f rtsp -rtsp_transport tcp {rtsp_url} "
+                   f"-loglevel warning")
+        return sp.Popen(command.split(), stdin=sp.PIPE)
+    except Exception as e:
+        logging.error(f"Failed to stream to rtsp: {e}", exc_info=True)
+        time.sleep(10)
+        return
+
+
+class PipeCapture:
+    """
+    Reads the camera through an ffmpeg decoding it to a bgr24 rawvideo pipe, with the interface of cv2.VideoCapture.
+    `read(image)` reads the frame straight into `image` when it has the frame shape.
+    """
+
+    def __init__(self, camera, width, height):
+        self.width, self.height, fps = get_probe(camera, width, height)
+        self.fps = float(Fraction(fps))
+        self.shape = (self.height, self.width, 3)
+        logging.info(f"Reading {camera} through a pipe with {self.width}x{self.height} @ {fps}fps")
+        command = (f"ffmpeg -f v4l2 -s {self.width}x{self.height} -i {camera} "
+                   f"-f rawvideo -pix_fmt bgr24 pipe: "
+                   f"-loglevel warning")
+        self._process = sp.Popen(command.split(), stdout=sp.PIPE)
+
+    def isOpened(self):
+        return self._process is not None and self._process.poll() is None
+
+    def read(self, image=None):
+        if not self.isOpened():
+            return False, None
+        if image is None or image.shape != self.shape or image.dtype != np.uint8:
+            image = np.empty(self.shape, dtype=np.uint8)
+        size = self._process.stdout.readinto(memoryview(image).cast("B"))
+        return size == image.nbytes, image
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.width,
+                cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+                cv2.CAP_PROP_FPS: self.fps}.get(prop, 0)
+
+    def release(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+
+def open_camera(camera, width, height, mode):
+    """
+    Open `camera` for reading in the capture `mode`, the virtual camera for the loopback mode.
+    In the mjpeg mode `read` gives the compressed frames of the camera, as one row of bytes.
+    """
+    if mode == PIPE_CAPTURE:
+        return PipeCapture(camera, width, height)
+    if mode in (DIRECT_CAPTURE, MJPEG_CAPTURE):
+        capture = cv2.VideoCapture(camera, cv2.CAP_V4L2)
+        if mode == MJPEG_CAPTURE:
+            capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if mode == MJPEG_CAPTURE:
+            capture.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        return capture
+    return cv2.VideoCapture(camera)
+
+
 def get_probe(path, width, height):
     logging.info(f'Getting probe for {path} with {width}x{height}')
     command = (f"ffprobe -v quiet -print_format json "
@@ -82,39 +165,6 @@ def get_probe(path, width, height):
     return width, height, fps
 
 
-def set_manual_exposure_mode(video):
-    os.system(f"v4l2-ctl -d {video} -c exposure_auto=1")
-
-
-def set_auto_exposure_mode(video):
-    os.system(f"v4l2-ctl -d {video} -c exposure_auto=3")
-
-
-def get_exposure_mode(video):
-    return int(os.popen(f"v4l2-ctl -d {video} -C exposure_auto").read().split(":")[1])
-
-
-def set_exposure(video, exposure):
-    os.system(f"v4l2-ctl -d {video} -c exposure_absolute={exposure}")
-
-
-def get_exposure_value(video):
-    return int(os.popen(f"v4l2-ctl -d {video} -C exposure_absolute").read().split(":")[1])
-
-
-def update_exposure(video_device, frame, min_value=75, max_value=150):
-    mean = frame.mean()
-    if min_value < mean < max_value:
-        return
-    exposure = get_exposure_value(video_device)
-    if not get_exposure_mode(video_device) == 1:
-        set_manual_exposure_mode(video_device)
-    if mean < min_value:
-        set_exposure(video_device, exposure + 1)
-    elif mean > max_value:
-        set_exposure(video_device, exposure - 1)
-
-
 # def get_frames_from_virtual_camera(virtual_camera):
 #     print("Starting virtual camera stream...")
 #     return sp.Popen(f"ffmpeg -f v4l2 -i /dev/{virtual_camera} "
@@ -123,21 +173,6 @@ def update_exposure(video_device, frame, min_value=75, max_value=150):
 #                     shell=True, stdout=sp.PIPE)
 
 
-# def read_frame(process, width, height):
-#     frame_size = width * height * 3
-#     in_bytes = process.stdout.read(frame_size)
-#     if len(in_bytes) == 0:
-#         frame = None
-#     else:
-#         assert len(in_bytes) == frame_size
-#         frame = (
-#             np
-#             .frombuffer(in_bytes, np.uint8)
-#             .reshape([height, width, 3])
-#         )
-#     return frame
-
-
 # try:
 #     virtual_cameras = create_virtual_cameras(1)
 #     print(f"Virtual cameras: {len(virtual_cameras)}\n{virtual_cameras}")
@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+from constants.numbers import CONNECTIVITY_FAST_INTERVAL, CONNECTIVITY_SLOW_INTERVAL
+
+
+class ConnectivityMonitor(threading.Thread):
+    """
+    Probes the internet connection in the background and keeps the last known state.
+
+    Probes are sent every `fast_interval` seconds after a failure, the interval doubles up to `slow_interval`
+    while the connection is stable. Successful requests of the other threads count as probes.
+    """
+
+    def __init__(self, probe, fast_interval=CONNECTIVITY_FAST_INTERVAL, slow_interval=CONNECTIVITY_SLOW_INTERVAL):
+        threading.Thread.__init__(self, daemon=True, name="ConnectivityMonitor")
+        self._probe = probe
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.interval = fast_interval
+
+        self._online = threading.Event()
+        self._checked = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._probe_now = True
+        self.checked_at = 0
+        self.changed_at = time.time()
+
+        self._running = True
+        self.start()
+
+    def _update(self, online):
+        with self._lock:
+            self.checked_at = time.time()
+            if online != self._online.is_set():
+                self.changed_at = self.checked_at
+                logging.info(f"Connection is {'up' if online else 'down'}.")
+            if online:
+                self._online.set()
+            else:
+                self._online.clear()
+            self._checked.set()
+
+    def run(self):
+        while self._running:
+            self._wakeup.clear()
+            if self._probe_now or time.time() - self.checked_at >= self.interval:
+                self._probe_now = False
+                was_online = self._online.is_set()
+                online = self._probe()
+                self._update(online)
+                if online and was_online:
+                    self.interval = min(self.interval * 2, self.slow_interval)
+                else:
+                    self.interval = self.fast_interval
+            self._wakeup.wait(max(self.checked_at + self.interval - time.time(), 0.1))
+
+    def is_online(self, timeout=None):
+        """Return the cached state, waits up to `timeout` seconds for the first probe."""
+        self._checked.wait(timeout)
+        return self._online.is_set()
+
+    def state(self):
+        """Return (online, time of the last check)."""
+        with self._lock:
+            return self._online.is_set(), self.checked_at
+
+    def wait_online(self, timeout=None):
+        """Block until the connection is up, return False if it is still down after `timeout` seconds."""
+        return self._online.wait(timeout)
+
+    def report_success(self):
+        """A request reached its server, which proves the connection is up."""
+        self._update(True)
+
+    def report_failure(self):
+        """A request couldn't reach its server, probe right away."""
+        self.interval = self.fast_interval
+        self._probe_now = True
+        self._wakeup.set()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
@@ -1,4 +1,5 @@
 from tools import get_device_config, get_hostname
+from constants.others import capture_policy
 
 
 class Dict2Class(object):
@@ -16,6 +17,7 @@ class DeviceConfig:
         self.device_type = config["device_type"]
         self.max_loc_dist = config["maximum_garbage_distance"]
         self.speed_limit = config["speed_limit"]
+        self.capture_policy = config.get("capture_policy", capture_policy)
         self.gps_settings = Dict2Class(config["gps_settings"])
         self.camera_settings = Dict2Class(config["camera_settings"])
         self.stream_settings = Dict2Class(config["stream_settings"])
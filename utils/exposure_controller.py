@@ -0,0 +1,100 @@
+import logging
+import math
+from collections import deque
+
+from constants.numbers import (EXPOSURE_TARGET, EXPOSURE_BAND, EXPOSURE_SETTLE_BAND, EXPOSURE_KP, EXPOSURE_KI,
+                               EXPOSURE_INTERVAL, EXPOSURE_METER_STEP, EXPOSURE_RETRY)
+from utils.v4l2_controls import V4L2_EXPOSURE_MANUAL
+
+
+def meter(frame, step=EXPOSURE_METER_STEP):
+    """Mean brightness of the frame, from every `step`th pixel of every `step`th row."""
+    return float(frame[::step, ::step].mean())
+
+
+class ExposureController:
+    """
+    PI controller of the manual exposure of the camera, keeping the metered brightness of the frames at `target`.
+
+    The controller works on the logarithm of the exposure, so its steps are proportional to the exposure. It starts
+    correcting when the brightness is further than `band` from the target and stops once it is closer than
+    `settle_band`, and sets the exposure at most every `interval` seconds. The time from leaving the band to settling
+    again is kept as the convergence time. After a control error the camera isn't touched for `retry` seconds.
+    """
+
+    def __init__(self, controls, target=EXPOSURE_TARGET, band=EXPOSURE_BAND, settle_band=EXPOSURE_SETTLE_BAND,
+                 kp=EXPOSURE_KP, ki=EXPOSURE_KI, interval=EXPOSURE_INTERVAL, retry=EXPOSURE_RETRY):
+        self.controls = controls
+        self.target = target
+        self.band = band
+        self.settle_band = settle_band
+        self.kp = kp
+        self.ki = ki
+        self.interval = interval
+        self.retry = retry
+
+        self.brightness = None
+        self.correcting = False
+        self._log_exposure = None
+        self._last_error = 0.0
+        self._last_update = -math.inf
+        self._disturbed_at = None
+
+        self.set_count = 0
+        self.error_count = 0
+        self.convergence_times = deque(maxlen=100)
+
+    def _error(self, brightness):
+        return math.log(self.target / max(brightness, 1))
+
+    def update(self, frame, timestamp):
+        """Meter the frame read at `timestamp` and step the exposure when it is due."""
+        if timestamp - self._last_update < self.interval:
+            return
+        self.brightness = brightness = meter(frame)
+        difference = abs(brightness - self.target)
+        if not self.correcting:
+            if difference <= self.band:
+                return
+            self.correcting = True
+            self._disturbed_at = timestamp
+            self._last_error = 0.0
+        elif difference < self.settle_band:
+            self.correcting = False
+            self.convergence_times.append(timestamp - self._disturbed_at)
+            return
+
+        error = self._error(brightness)
+        dt = min(timestamp - self._last_update, 2 * self.interval)
+        step = self.kp * (error - self._last_error) + self.ki * error * dt
+        self._last_error = error
+        self._last_update = timestamp
+        try:
+            if self._log_exposure is None:
+                if self.controls.get_exposure_mode() != V4L2_EXPOSURE_MANUAL:
+                    self.controls.set_exposure_mode(V4L2_EXPOSURE_MANUAL)
+                self._log_exposure = math.log(max(self.controls.get_exposure(), 1))
+            exposure_range = self.controls.query_exposure()
+            self._log_exposure = min(max(self._log_exposure + step, math.log(max(exposure_range.minimum, 1))),
+                                     math.log(exposure_range.maximum))
+            exposure = round(math.exp(self._log_exposure))
+            if exposure != self.controls.get_exposure():
+                self.controls.set_exposure(exposure)
+                self.set_count += 1
+        except OSError as e:
+            self.error_count += 1
+            self._log_exposure = None
+            self._last_update = timestamp + self.retry
+            logging.error(f"Failed to update exposure of {self.controls.device}: {e}")
+            self.controls.close()
+
+    def stats(self):
+        times = self.convergence_times
+        return {"brightness": round(self.brightness, 1) if self.brightness is not None else None,
+                "exposure": round(math.exp(self._log_exposure)) if self._log_exposure is not None else None,
+                "correcting": self.correcting,
+                "sets": self.set_count,
+                "errors": self.error_count,
+                "converged": len(times),
+                "convergence_avg": round(sum(times) / len(times), 2) if times else 0,
+                "convergence_max": round(max(times), 2) if times else 0}
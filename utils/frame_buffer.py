@@ -0,0 +1,226 @@
+import logging
+import threading
+
+import numpy as np
+
+from constants.numbers import FRAME_BUFFER_SIZE, FRAME_HISTORY_SIZE, FRAME_HISTORY_INTERVAL
+
+
+class FrameRef:
+    """
+    A published frame pinned in its slot, the camera doesn't read into the slot until it is released.
+    `frame` is a read-only view of the slot, copy it to keep it after `release`. `jpeg` is the compressed frame of an
+    mjpeg camera, `frame` is then its decoded preview.
+    """
+
+    def __init__(self, buffer, index, generation, frame, sequence, timestamp, jpeg=None):
+        self._buffer = buffer
+        self._index = index
+        self._generation = generation
+        self.frame = frame
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.jpeg = jpeg
+
+    def release(self):
+        if self._buffer is not None:
+            self._buffer._unpin(self._index, self._generation)
+            self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class FrameBuffer:
+    """
+    Ring buffer of the last `size` frames with their capture times and quality scores, in one preallocated array, and
+    a history of the frame with the best score of every `history_interval` seconds for the last `history_size`
+    intervals.
+
+    The camera reads into the slot given by `acquire` and publishes it with `commit`, so capturing doesn't copy the
+    frames. Every published frame gets the next sequence number, `wait` blocks until a newer frame is published and
+    pins its slot, so subscribers read it without a copy. Pinned slots and the slot being read are skipped by the
+    camera. The history pins the slot of the best frame of every interval, the ring has `history_size` more slots for
+    them, so the history covers the latency of the capture decisions without copying or keeping every frame.
+    Frames taken out by `latest`, `nearest` and `best` are copied. The compressed frames of an mjpeg camera are kept
+    with their previews, they are never written to and aren't copied.
+    """
+
+    def __init__(self, size=FRAME_BUFFER_SIZE, history_size=FRAME_HISTORY_SIZE,
+                 history_interval=FRAME_HISTORY_INTERVAL):
+        self.size = size
+        self.history_size = history_size
+        self.history_interval = history_interval
+        self._slots = size + history_size
+        self._frames = None
+        self._generation = 0
+        self._times = np.full(self._slots, np.nan)
+        self._sequences = np.zeros(self._slots, dtype=np.int64)
+        self._refs = np.zeros(self._slots, dtype=np.int32)
+        self._jpegs = [None] * self._slots
+        self._history_slots = np.full(history_size, -1)  # pinned ring slot of every history frame
+        self._history_times = np.full(history_size, np.nan)
+        self._history_scores = np.full(history_size, np.nan)
+        self._history_jpegs = [None] * history_size
+        self._history_interval = None  # number of the interval of the newest history frame
+        self._history_latest = None
+        self._next = 0
+        self._writing = None
+        self._latest = None
+        self.sequence = 0  # sequence number of the last published frame, 0 before the first one
+        self.unbuffered_count = 0
+        self._lock = threading.Lock()
+        self._published = threading.Condition(self._lock)
+
+    def __len__(self):
+        """Number of frames kept for the captures."""
+        return int(np.count_nonzero(~np.isnan(self._history_times)))
+
+    def _free_slot(self):
+        for offset in range(self._slots):
+            index = (self._next + offset) % self._slots
+            if self._refs[index] == 0:
+                return index
+        return None
+
+    def acquire(self):
+        """Return the slot to read the next frame into, None until the frame size is known or if all are pinned."""
+        if self._frames is None:
+            return None
+        with self._lock:
+            index = self._writing = self._free_slot()
+            if index is None:
+                return None
+            self._times[index] = np.nan
+            self._sequences[index] = 0
+            self._jpegs[index] = None
+            if index == self._latest:
+                self._latest = None
+            return self._frames[index]
+
+    def commit(self, frame, timestamp, score=np.nan, jpeg=None):
+        """
+        Publish the next frame with its quality `score`, higher is better, and its compressed `jpeg`, return its slot.
+        `frame` is copied only if it wasn't read into the acquired slot.
+        """
+        with self._published:
+            if self._frames is None or self._frames.shape[1:] != frame.shape or self._frames.dtype != frame.dtype:
+                self._frames = np.empty((self._slots,) + frame.shape, dtype=frame.dtype)
+                self._generation += 1
+                self._times[:] = np.nan
+                self._sequences[:] = 0
+                self._refs[:] = 0
+                self._jpegs = [None] * self._slots
+                self._writing = None
+                self._latest = None
+                self._history_slots[:] = -1
+                self._history_times[:] = np.nan
+                self._history_scores[:] = np.nan
+                self._history_jpegs = [None] * self.history_size
+                self._history_interval = None
+                self._history_latest = None
+            index = self._writing if self._writing is not None else self._free_slot()
+            self._writing = None
+            if index is None:
+                self.unbuffered_count += 1
+                if self.unbuffered_count == 1:
+                    logging.warning(f"All {self._slots} frames are pinned, frames are not buffered!")
+                return frame
+            slot = self._frames[index]
+            if not np.shares_memory(slot, frame):
+                np.copyto(slot, frame)
+            self.sequence += 1
+            self._times[index] = timestamp
+            self._jpegs[index] = jpeg
+            self._sequences[index] = self.sequence
+            self._latest = index
+            self._next = (index + 1) % self._slots
+            self._keep(index, timestamp, score, jpeg)
+            self._published.notify_all()
+            return slot
+
+    def _keep(self, slot, timestamp, score, jpeg):
+        """Pin the slot in the history if its frame is the first or the best frame of its interval."""
+        interval = int(timestamp // self.history_interval)
+        if interval != self._history_interval:
+            index = 0 if self._history_latest is None else (self._history_latest + 1) % self.history_size
+            self._history_interval = interval
+            self._history_latest = index
+        else:
+            index = self._history_latest
+            if not score > self._history_scores[index]:
+                return
+        if self._history_slots[index] >= 0:
+            self._refs[self._history_slots[index]] -= 1
+        self._refs[slot] += 1
+        self._history_slots[index] = slot
+        self._history_times[index] = timestamp
+        self._history_scores[index] = score
+        self._history_jpegs[index] = jpeg
+
+    def latest(self):
+        """Return a copy of the newest published frame and its time, (None, None) if there is none."""
+        with self._lock:
+            if self._latest is None:
+                return None, None
+            return self._frames[self._latest].copy(), float(self._times[self._latest])
+
+    def wait(self, after_sequence=0, timeout=None):
+        """
+        Block until a frame newer than `after_sequence` is published and return the newest one as a pinned FrameRef,
+        None on timeout. Release the reference as soon as the frame is used.
+        """
+        with self._published:
+            if not self._published.wait_for(lambda: self._latest is not None and self.sequence > after_sequence,
+                                            timeout):
+                return None
+            index = self._latest
+            self._refs[index] += 1
+            frame = self._frames[index].view()
+            frame.flags.writeable = False
+            return FrameRef(self, index, self._generation, frame, int(self._sequences[index]),
+                            float(self._times[index]), self._jpegs[index])
+
+    def _unpin(self, index, generation):
+        with self._lock:
+            if generation == self._generation and self._refs[index] > 0:
+                self._refs[index] -= 1
+
+    def nearest(self, timestamp, max_age=None):
+        """
+        Return a copy of the history frame read closest to `timestamp` and its time, (None, None) if there is none.
+        """
+        with self._lock:
+            differences = np.abs(self._history_times - timestamp)
+            if np.all(np.isnan(differences)):
+                return None, None
+            index = int(np.nanargmin(differences))
+            if max_age is not None and differences[index] > max_age:
+                return None, None
+            return self._frames[self._history_slots[index]].copy(), float(self._history_times[index])
+
+    def best(self, start, end, count, spacing=0):
+        """
+        Return copies of the `count` best history frames read between `start` and `end` with their times and compressed
+        frames, oldest first.
+        Frames with higher scores are better, frames without a score are ranked by their closeness to the middle of
+        the window. The frames returned are at least `spacing` seconds apart.
+        """
+        with self._lock:
+            times = self._history_times.copy()
+            indexes = np.flatnonzero((times >= start) & (times <= end))
+            middle = (start + end) / 2
+            ranking = sorted(indexes, key=lambda index: (np.nan_to_num(self._history_scores[index], nan=-np.inf),
+                                                         -abs(times[index] - middle)), reverse=True)
+            chosen = []
+            for index in ranking:
+                if all(abs(times[index] - times[other]) >= spacing for other in chosen):
+                    chosen.append(index)
+                    if len(chosen) == count:
+                        break
+            chosen.sort(key=lambda index: times[index])
+            return [(self._frames[self._history_slots[index]].copy(), float(times[index]), self._history_jpegs[index])
+                    for index in chosen]
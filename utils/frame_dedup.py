@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from constants.numbers import DEDUP_THRESHOLD, DEDUP_MAX_LOCATIONS, DEDUP_MAX_HASHES
+from utils.frame_quality import downscale
+
+
+def dhash(frame, size=8):
+    """64 bit difference hash of a frame, close frames have hashes with a small hamming distance."""
+    small = downscale(frame, 4 * (size + 1))
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(small, (size + 1, size), interpolation=cv2.INTER_AREA)
+    value = 0
+    for bit in (small[:, 1:] > small[:, :-1]).flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(first, second):
+    return bin(first ^ second).count("1")
+
+
+class FrameDeduplicator:
+    """
+    Drops the frames of a location within `threshold` bits of a frame already kept for it.
+
+    The hashes of the last `max_locations` locations are kept, at most `max_hashes` per location.
+    The bytes of the dropped frames are estimated with the average size of the kept ones, they are never encoded.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, max_locations=DEDUP_MAX_LOCATIONS, max_hashes=DEDUP_MAX_HASHES):
+        self.threshold = threshold
+        self.max_locations = max_locations
+        self.max_hashes = max_hashes
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+        self.kept_count = 0
+        self.kept_bytes = 0
+        self.suppressed_count = 0
+
+    def keep(self, location_id, frame):
+        """Return True and remember the frame if it isn't a duplicate of a kept frame of `location_id`."""
+        frame_hash = dhash(frame)
+        with self._lock:
+            hashes = self._hashes.setdefault(location_id, [])
+            self._hashes.move_to_end(location_id)
+            if any(hamming(frame_hash, kept) <= self.threshold for kept in hashes):
+                self.suppressed_count += 1
+                return False
+            hashes.append(frame_hash)
+            del hashes[:-self.max_hashes]
+            while len(self._hashes) > self.max_locations:
+                self._hashes.popitem(last=False)
+            self.kept_count += 1
+            return True
+
+    def add_bytes(self, size):
+        """Count the encoded size of a kept frame."""
+        with self._lock:
+            self.kept_bytes += size
+
+    def suppressed_bytes(self):
+        return self.suppressed_count * self.kept_bytes / max(self.kept_count, 1)
+
+    def report(self):
+        return (f"Kept {self.kept_count} photos ({self.kept_bytes / 1024 / 1024:.1f}MB), "
+                f"dropped {self.suppressed_count} duplicates (~{self.suppressed_bytes() / 1024 / 1024:.1f}MB)")
@@ -0,0 +1,48 @@
+import cv2
+
+ROTATE_CODES = {90: cv2.ROTATE_90_COUNTERCLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_CLOCKWISE}
+
+
+class FrameRotator:
+    """
+    Rotates frames `angle` degrees counterclockwise like imutils.rotate, writing into `out` when it has the output
+    shape. Nothing is done for 0 degrees and right angles are transposes and flips with cv2.rotate, so 90 and 270
+    degrees swap the width and height instead of cropping. Other angles keep the frame size and use warpAffine with
+    the matrix of the frame size cached.
+    """
+
+    def __init__(self, angle):
+        self.angle = angle % 360
+        self._code = ROTATE_CODES.get(self.angle)
+        self._matrix = None
+        self._matrix_size = None
+
+    @property
+    def enabled(self):
+        return self.angle != 0
+
+    def output_shape(self, shape):
+        if self.angle in (90, 270):
+            return (shape[1], shape[0]) + tuple(shape[2:])
+        return tuple(shape)
+
+    def output_size(self, width, height):
+        """(width, height) of the rotated frames of a width x height camera."""
+        height, width = self.output_shape((height, width))
+        return width, height
+
+    def _get_matrix(self, width, height):
+        if self._matrix_size != (width, height):
+            self._matrix = cv2.getRotationMatrix2D((width // 2, height // 2), self.angle, 1.0)
+            self._matrix_size = (width, height)
+        return self._matrix
+
+    def rotate(self, frame, out=None):
+        if not self.enabled:
+            return frame
+        if out is not None and (out.shape != self.output_shape(frame.shape) or out.dtype != frame.dtype):
+            out = None
+        if self._code is not None:
+            return cv2.rotate(frame, self._code, dst=out)
+        height, width = frame.shape[:2]
+        return cv2.warpAffine(frame, self._get_matrix(width, height), (width, height), dst=out)
@@ -6,6 +6,9 @@ import utils.request_handler as rh
 from constants.files import garbage_location_list_file
 from constants.urls import URL_GARBAGE_LOCATIONS
 from tools import get_vehicle_id, get_hostname
+from utils.location_index import LocationIndex
+
+_garbage_index = None
 
 
 def update_garbage_list(url=URL_GARBAGE_LOCATIONS, vehicle_id=get_hostname(), timeout=5):
@@ -29,6 +32,7 @@ def update_garbage_list(url=URL_GARBAGE_LOCATIONS, vehicle_id=get_hostname(), ti
             return False
 
         json.dump(garbage_location_list, open(garbage_location_list_file, 'w'))
+        build_garbage_index(garbage_location_list)
 
         logging.info(f"Garbage Locations list updated. Total Garbage Container: {len(garbage_location_list)}")
 
@@ -47,5 +51,20 @@ def read_garbage_list():
     return json.load(open(garbage_location_list_file, 'r'))
 
 
+def build_garbage_index(garbage_location_list=None):
+    global _garbage_index
+    if garbage_location_list is None:
+        garbage_location_list = read_garbage_list()
+    _garbage_index = LocationIndex(garbage_location_list)
+    logging.info(f"Garbage location index built with {len(_garbage_index)} locations.")
+    return _garbage_index
+
+
+def get_garbage_index():
+    if _garbage_index is None:
+        return build_garbage_index()
+    return _garbage_index
+
+
 if __name__ == "__main__":
     update_garbage_list()
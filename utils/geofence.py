@@ -0,0 +1,206 @@
+import logging
+
+from constants.numbers import (CAPTURE_COUNT, CAPTURE_STEP, GEOFENCE_EXIT_MARGIN, GEOFENCE_EXIT_TIME,
+                               GEOFENCE_DWELL_TIME, GEOFENCE_DWELL_SPEED, GEOFENCE_DWELL_TREND,
+                               GEOFENCE_TREND_MARGIN, GEOFENCE_CAPTURE_DELAY)
+from utils.location_array import haversine
+
+ENTERED = "entered"
+DWELLING = "dwelling"
+
+
+class Capture:
+    """A capture decided by the geofence, `timestamp` is the best time for the frames."""
+
+    def __init__(self, location, timestamp, distance, count, reason):
+        self.location = location
+        self.location_id = location["id"]
+        self.timestamp = timestamp
+        self.distance = distance
+        self.count = count
+        self.reason = reason
+
+    def __repr__(self):
+        return (f"Capture(location_id={self.location_id}, distance={self.distance:.1f}, count={self.count}, "
+                f"reason={self.reason})")
+
+
+class Visit:
+    """State of the vehicle around one location, from entering its radius until leaving it."""
+
+    def __init__(self, location, distance, timestamp):
+        self.location = location
+        self.state = ENTERED
+        self.entered_at = timestamp
+        self.updated_at = timestamp
+        self.distance = distance
+        self.trend = 0.0  # smoothed change of the distance in m/s, negative while approaching
+        self.slow_since = None
+        self.still_since = None
+        self.outside_since = None
+        self.min_distance = float("inf")  # closest distance below the speed limit
+        self.min_time = None
+        self.captured = 0
+        self.last_capture_time = None
+        self.last_capture_position = None
+
+    def update(self, distance, timestamp, slow, radius):
+        self.outside_since = None
+        elapsed = timestamp - self.updated_at
+        if elapsed > 0:
+            self.trend = 0.5 * self.trend + 0.5 * (distance - self.distance) / elapsed
+        self.distance = distance
+        self.updated_at = timestamp
+        if slow:
+            if self.slow_since is None:
+                self.slow_since = timestamp
+            if distance < min(self.min_distance, radius):
+                self.min_distance = distance
+                self.min_time = timestamp
+        else:
+            self.slow_since = None
+
+    def update_still(self, still, timestamp):
+        if still:
+            if self.still_since is None:
+                self.still_since = timestamp
+        else:
+            self.still_since = None
+            self.state = ENTERED
+
+    def captured_at(self, timestamp, position):
+        self.captured += 1
+        self.last_capture_time = timestamp
+        self.last_capture_position = position
+
+
+class ClosestApproachPolicy:
+    """
+    Captures `count` frames around the closest approach while the distance is still changing: once it grew
+    `trend_margin` meters over its minimum, grew for `max_delay` seconds after it or the vehicle left the exit distance,
+    so the frames of the minimum are still buffered by the camera. A vehicle dwelling at the location is captured every
+    `dwell_interval` seconds up to `count` times instead. Nothing is captured when the visit ends, its minimum is older
+    than the frames of the camera by then.
+    """
+
+    def __init__(self, count=CAPTURE_COUNT, trend_margin=GEOFENCE_TREND_MARGIN, dwell_interval=GEOFENCE_DWELL_TIME,
+                 max_delay=GEOFENCE_CAPTURE_DELAY):
+        self.count = count
+        self.trend_margin = trend_margin
+        self.dwell_interval = dwell_interval
+        self.max_delay = max_delay
+
+    def decide(self, visit, timestamp, position):
+        if visit.min_time is None or visit.captured >= self.count:
+            return None
+        if visit.state == DWELLING:
+            if visit.last_capture_time is None or timestamp - visit.last_capture_time >= self.dwell_interval:
+                return Capture(visit.location, timestamp, visit.distance, 1, "dwell")
+            return None
+        if visit.captured > 0:
+            return None
+        if visit.outside_since is not None:
+            return Capture(visit.location, visit.min_time, visit.min_distance, self.count, "left")
+        if visit.trend > 0 and (visit.distance - visit.min_distance >= self.trend_margin or
+                                timestamp - visit.min_time >= self.max_delay):
+            return Capture(visit.location, visit.min_time, visit.min_distance, self.count, "closest approach")
+        return None
+
+    def on_exit(self, visit):
+        return None
+
+
+class DistanceStepPolicy:
+    """Captures a frame when the vehicle enters the radius below the speed limit, then one every `step` meters."""
+
+    def __init__(self, step=CAPTURE_STEP):
+        self.step = step
+
+    def decide(self, visit, timestamp, position):
+        if visit.slow_since is None or visit.outside_since is not None:
+            return None
+        if (visit.last_capture_position is None or
+                haversine(visit.last_capture_position["lat"], visit.last_capture_position["lng"],
+                          position["lat"], position["lng"]) >= self.step):
+            return Capture(visit.location, timestamp, visit.distance, 1, "step")
+        return None
+
+    def on_exit(self, visit):
+        return None
+
+
+CAPTURE_POLICIES = {"closest": ClosestApproachPolicy, "step": DistanceStepPolicy}
+
+
+class Geofence:
+    """
+    Enter, dwell and exit state machine for every location around the vehicle.
+
+    A location is entered closer than `radius` meters and left after `exit_time` seconds further than
+    `radius + exit_margin` meters, so a noisy position on the border or a jump doesn't end the visit.
+    The vehicle dwells at the location after standing still for `dwell_time` seconds, below `dwell_speed` km/h with
+    its distance changing slower than `dwell_trend` m/s, so a drive-by below `speed_limit` doesn't dwell.
+    The capture policy decides when to capture during a visit.
+    """
+
+    def __init__(self, radius, speed_limit, policy=None, exit_margin=GEOFENCE_EXIT_MARGIN,
+                 exit_time=GEOFENCE_EXIT_TIME, dwell_time=GEOFENCE_DWELL_TIME, dwell_speed=GEOFENCE_DWELL_SPEED,
+                 dwell_trend=GEOFENCE_DWELL_TREND):
+        self.radius = radius
+        self.speed_limit = speed_limit
+        self.policy = policy or ClosestApproachPolicy()
+        self.exit_margin = exit_margin
+        self.exit_time = exit_time
+        self.dwell_time = dwell_time
+        self.dwell_speed = dwell_speed
+        self.dwell_trend = dwell_trend
+        self.visits = {}
+        self.visit_count = 0
+        self.capture_count = 0
+
+    def update(self, index, position, speed, timestamp):
+        """Feed the position of the vehicle at `timestamp` and its speed in km/h, return the captures to take."""
+        slow = speed < self.speed_limit
+        captures = []
+        nearby = {location["id"]: (distance, location)
+                  for distance, location in index.within(position, self.radius + self.exit_margin)}
+
+        for location_id, visit in list(self.visits.items()):
+            if location_id in nearby:
+                continue
+            if visit.outside_since is None:
+                visit.outside_since = timestamp
+                captures += self._decide(visit, timestamp, position)
+            elif timestamp - visit.outside_since >= self.exit_time:
+                captures += self._exit(location_id)
+
+        for location_id, (distance, location) in nearby.items():
+            visit = self.visits.get(location_id)
+            if visit is None:
+                if distance >= self.radius:
+                    continue
+                visit = self.visits[location_id] = Visit(location, distance, timestamp)
+                self.visit_count += 1
+            visit.update(distance, timestamp, slow, self.radius)
+            visit.update_still(speed < self.dwell_speed and abs(visit.trend) < self.dwell_trend, timestamp)
+            if visit.still_since is not None and timestamp - visit.still_since >= self.dwell_time:
+                visit.state = DWELLING
+            captures += self._decide(visit, timestamp, position)
+        self.capture_count += len(captures)
+        return captures
+
+    def _decide(self, visit, timestamp, position):
+        capture = self.policy.decide(visit, timestamp, position)
+        if capture is None:
+            return []
+        visit.captured_at(timestamp, position)
+        return [capture]
+
+    def _exit(self, location_id):
+        visit = self.visits.pop(location_id)
+        capture = self.policy.on_exit(visit)
+        if capture is not None:
+            visit.captured_at(visit.updated_at, None)
+        logging.info(f"Left location {location_id} | Closest: {visit.min_distance:.1f} meters | "
+                     f"Captures: {visit.captured} | Stayed: {visit.updated_at - visit.entered_at:.0f} seconds")
+        return [capture] if capture is not None else []
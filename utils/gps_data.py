@@ -1,6 +1,5 @@
-import os.path
 from datetime import datetime, timezone
-from constants.folders import LOCATION_RECORDS
+from constants.gps_commands import GPS_DATA, NO_FIX_DATA
 
 
 def dd2dms(dd):
@@ -32,50 +31,61 @@ def dms2dd(dms):
     return round(degrees + minutes + seconds, 6)
 
 
+def _is_time(utc):
+    """True if `utc` is an hhmmss.f time, with 1 to 6 digits of fraction as "%H%M%S.%f" parses."""
+    seconds, dot, fraction = utc.partition(".")
+    return (len(seconds) == 6 and seconds.isdigit() and dot == "." and 1 <= len(fraction) <= 6 and fraction.isdigit()
+            and int(seconds[:2]) < 24 and int(seconds[2:4]) < 60 and int(seconds[4:]) < 60)
+
+
 class GPSData:
+    """
+    A $GPSACP fix. The numeric fields are parsed when it is created, the dates, strings and the location dict are
+    parsed on first use and cached. Fixes are not changed after they are created.
+    """
+    __slots__ = ("gps_string", "UTC", "lat", "lat_dir", "lng", "lng_dir", "hdop", "altitude", "fix", "fix2d",
+                 "fix3d", "cog", "spkm", "spkn", "date", "nsat_gps", "nsat_glonass",
+                 "_utc_date", "_local_date", "_local_date_str", "_gps_location")
+
+    _no_fix = None
+
     def __init__(self, gps_string):
         self.gps_string = gps_string.strip("\r\n").strip("$GPSACP: ")
-        self.gps_data = self.gps_string.split(",")
-        self.UTC = self.gps_data[0]  # UTC time
-        self.lat = self.gps_data[1]  # latitude in ddmm.mmmm format
+        (self.UTC,  # UTC time
+         self.lat,  # latitude in ddmm.mmmm format
+         self.lng,  # longitude in dddmm.mmmm format
+         self.hdop,  # Horizontal Dilution of Precision
+         self.altitude,  # xxxx.x altitude in meters
+         self.fix,  # 0 or 1 = Invalid, 2 = 2D, 3 = 3D
+         self.cog,  # ddd.mm course over ground in degrees (ddd = 000 to 360) (mm = 00 to 59)
+         self.spkm,  # speed in km/h
+         self.spkn,  # speed in knots
+         self.date,  # ddmmmyy Date of fix
+         self.nsat_gps,  # Total number of GPS satellites in use (0-12)
+         self.nsat_glonass,  # Total number of GLONASS satellites in use (0-12)
+         ) = self.gps_string.split(",")[:12]
         self.lat_dir = ""  # N or S
-        self.lng = self.gps_data[2]  # longitude in dddmm.mmmm format
         self.lng_dir = ""  # W or E
-        self.hdop = self.gps_data[3]  # Horizontal Dilution of Precision
-        self.altitude = self.gps_data[4]  # xxxx.x altitude in meters
-        self.fix = self.gps_data[5]  # 0 or 1 = Invalid, 2 = 2D, 3 = 3D
-        self.cog = self.gps_data[6]  # ddd.mm course over ground in degrees (ddd = 000 to 360) (mm = 00 to 59)
-        self.spkm = self.gps_data[7]  # speed in km/h
-        self.spkn = self.gps_data[8]  # speed in knots
-        self.date = self.gps_data[9]  # ddmmmyy Date of fix
-        self.nsat_gps = self.gps_data[10]  # Total number of GPS satellites in use (0-12)
-        self.nsat_glonass = self.gps_data[11]  # Total number of GLONASS satellites in use (0-12)
-
-        if self.fix == "2":
-            self.fix2d = True
-            self.fix3d = False
-        elif self.fix == "3":
-            self.fix2d = True
-            self.fix3d = True
-        else:
-            self.fix2d = False
-            self.fix3d = False
-
-        if self.fix2d or self.fix3d:
+        self.fix2d = self.fix in ("2", "3")
+        self.fix3d = self.fix == "3"
+        self._utc_date = None
+        self._local_date = None
+        self._local_date_str = None
+        self._gps_location = None
+
+        if self.fix2d:
+            if len(self.date) != 6 or not self.date.isdigit():
+                raise ValueError(f"Invalid date in gps data: {self.date}")
+            if not _is_time(self.UTC):
+                raise ValueError(f"Invalid time in gps data: {self.UTC}")
             self.fix = int(self.fix)
 
-            self.UTC_date = datetime.strptime(self.date + self.UTC, "%d%m%y%H%M%S.%f")
-            self.local_date = self.UTC_date.replace(tzinfo=timezone.utc).astimezone(tz=None)
-            self.local_date_str = self.local_date.strftime("%y%m%d-%H%M%S")
-
             self.lat_dir = self.lat[-1]
             self.lat = ddm2dd(self.lat[:-1])
 
             self.lng_dir = self.lng[-1]
             self.lng = ddm2dd(self.lng[:-1])
 
-            self.gps_location = {"lat": self.lat, "lng": self.lng}
-
             self.altitude = float(self.altitude)
             self.hdop = float(self.hdop)
             self.cog = float(self.cog)
@@ -84,7 +94,40 @@ class GPSData:
             self.nsat_gps = int(self.nsat_gps)
             self.nsat_glonass = int(self.nsat_glonass)
 
-        # self.save_to_file()
+    @classmethod
+    def no_fix(cls):
+        """The shared placeholder used when there is no fix."""
+        if cls._no_fix is None:
+            cls._no_fix = cls(GPS_DATA + NO_FIX_DATA)
+        return cls._no_fix
+
+    @property
+    def gps_data(self):
+        return self.gps_string.split(",")
+
+    @property
+    def UTC_date(self):
+        if self._utc_date is None and self.fix2d:
+            self._utc_date = datetime.strptime(self.date + self.UTC, "%d%m%y%H%M%S.%f")
+        return self._utc_date
+
+    @property
+    def local_date(self):
+        if self._local_date is None and self.fix2d:
+            self._local_date = self.UTC_date.replace(tzinfo=timezone.utc).astimezone(tz=None)
+        return self._local_date
+
+    @property
+    def local_date_str(self):
+        if self._local_date_str is None and self.fix2d:
+            self._local_date_str = self.local_date.strftime("%y%m%d-%H%M%S")
+        return self._local_date_str
+
+    @property
+    def gps_location(self):
+        if self._gps_location is None and self.fix2d:
+            self._gps_location = {"lat": self.lat, "lng": self.lng}
+        return self._gps_location
 
     def to_dict(self):
         return {"UTC": self.UTC, "latitude": self.lat, "longitude": self.lng, "hdop": self.hdop,
@@ -111,10 +154,3 @@ class GPSData:
                 "lat": str(self.lat),
                 "lng": str(self.lng),
                 "speed": str(self.spkm)}
-
-    def save_to_file(self):
-        if not os.path.isdir(LOCATION_RECORDS):
-            os.mkdir(LOCATION_RECORDS)
-        filename = LOCATION_RECORDS + datetime.now().strftime("%Y-%m-%d") + ".txt"
-        with open(filename, "a") as f:
-            f.write(f"{datetime.now().strftime('%H:%M:%S')}: {self.gps_string}\n")
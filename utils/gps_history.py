@@ -0,0 +1,86 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from constants.gps_commands import GPS_DATA
+from constants.numbers import GPS_HISTORY_SIZE, GPS_HISTORY_MAX_GAP
+from utils.gps_data import GPSData, dd2ddm
+
+HISTORY_DTYPE = np.dtype([("time", "<f8"), ("lat", "<f8"), ("lng", "<f8"), ("speed", "<f4"), ("cog", "<f4")])
+
+
+def interpolate_angle(start, end, fraction):
+    """Interpolate a heading in degrees along the shorter turn."""
+    return (start + fraction * ((end - start + 180) % 360 - 180)) % 360
+
+
+class GpsHistory:
+    """
+    Ring buffer of the last `size` valid fixes, keyed by the time of the fix.
+
+    `at(timestamp)` interpolates the position, speed and heading between the fixes around `timestamp`.
+    Timestamps out of the buffer get the oldest or the newest fix, and fixes more than `max_gap` seconds apart
+    are not interpolated, the closer one is returned.
+    """
+
+    def __init__(self, size=GPS_HISTORY_SIZE, max_gap=GPS_HISTORY_MAX_GAP):
+        self.size = size
+        self.max_gap = max_gap
+        self._records = np.zeros(size, dtype=HISTORY_DTYPE)
+        self._fixes = [None] * size
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, gps_data):
+        if not gps_data.is_valid():
+            return
+        with self._lock:
+            self._records[self._next] = (gps_data.local_date.timestamp(), gps_data.lat, gps_data.lng,
+                                         gps_data.spkm, gps_data.cog)
+            self._fixes[self._next] = gps_data
+            self._next = (self._next + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
+    def records(self):
+        """Copy of the buffered records, oldest first."""
+        with self._lock:
+            order = (np.arange(self._count) + self._next - self._count) % self.size
+            return self._records[order]
+
+    def at(self, timestamp):
+        """Return the fix at `timestamp` as a GPSData, None if there is no fix yet."""
+        with self._lock:
+            if self._count == 0:
+                return None
+            order = (np.arange(self._count) + self._next - self._count) % self.size
+            times = self._records["time"][order]
+            position = int(np.searchsorted(times, timestamp))
+            if position == 0:
+                return self._fixes[order[0]]
+            if position == self._count:
+                return self._fixes[order[-1]]
+            before, after = order[position - 1], order[position]
+            start, end = self._records[before], self._records[after]
+            before_fix, after_fix = self._fixes[before], self._fixes[after]
+        if end["time"] == timestamp:
+            return after_fix
+        if end["time"] - start["time"] > self.max_gap:
+            return before_fix if timestamp - start["time"] <= end["time"] - timestamp else after_fix
+        fraction = (timestamp - start["time"]) / (end["time"] - start["time"])
+        lat = float(start["lat"] + fraction * (end["lat"] - start["lat"]))
+        lng = float(start["lng"] + fraction * (end["lng"] - start["lng"]))
+        speed = float(start["speed"] + fraction * (end["speed"] - start["speed"]))
+        cog = interpolate_angle(float(start["cog"]), float(end["cog"]), fraction)
+
+        utc = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        fields = before_fix.gps_data  # hdop, altitude, fix and satellites are taken from the earlier fix
+        fields[0] = utc.strftime("%H%M%S.%f")[:10]
+        fields[1] = f"{dd2ddm(abs(lat))}{'N' if lat >= 0 else 'S'}"
+        fields[2] = f"{dd2ddm(abs(lng))}{'E' if lng >= 0 else 'W'}"
+        fields[6:10] = f"{cog:.1f}", f"{speed:.1f}", f"{speed / 1.852:.1f}", utc.strftime("%d%m%y")
+        return GPSData(GPS_DATA + ",".join(fields))
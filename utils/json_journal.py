@@ -0,0 +1,332 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from constants.numbers import JOURNAL_SYNC_COUNT, JOURNAL_SYNC_INTERVAL, JOURNAL_INDEX_SIZE, JOURNAL_COMPACT_SIZE
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+class NotAJournalError(ValueError):
+    """ Exception raised when a file is neither a JSON array nor JSON-lines, it is left untouched. """
+    pass
+
+
+def get_journal(json_file):
+    """
+    Return the shared journal of `json_file`, journals are shared because many threads append to them.
+    Raises NotAJournalError if the file holds something else.
+    """
+    json_file = os.path.abspath(json_file)
+    with _journals_lock:
+        if json_file not in _journals:
+            _journals[json_file] = JsonJournal(json_file)
+        return _journals[json_file]
+
+
+def read_records(json_file):
+    """
+    Return the records of `json_file` not consumed yet without changing the file, [] if it doesn't exist.
+    Old JSON array files are read as they are. Raises NotAJournalError if the file holds something else.
+    """
+    json_file = os.path.abspath(json_file)
+    with _journals_lock:
+        journal = _journals.get(json_file)
+    if journal is not None:
+        return list(journal)
+    if not os.path.isfile(json_file):
+        return []
+    with open(json_file, "rb") as f:
+        head = f.read(64).lstrip()
+        f.seek(0)
+        if head.startswith(b"["):
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise NotAJournalError(f"{json_file} is a corrupted JSON array: {e}")
+            if not isinstance(data, list):
+                raise NotAJournalError(f"{json_file} is neither a JSON array nor JSON-lines")
+            return data
+        if head and not _is_record_line(f.readline()):
+            raise NotAJournalError(f"{json_file} is neither a JSON array nor JSON-lines")
+        f.seek(_read_offset(json_file, json_file + ".offset"))
+        return list(_load_lines(f))
+
+
+def _read_offset(json_file, offset_file):
+    """Consumed offset of the journal, 0 if the offset file was written for another version of the file."""
+    try:
+        with open(offset_file, "r") as f:
+            offset = json.load(f)
+        if offset["inode"] == os.stat(json_file).st_ino:
+            return min(offset["offset"], os.path.getsize(json_file))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return 0
+
+
+def _dump(record):
+    return json.dumps(record, sort_keys=True, separators=(",", ":"))
+
+
+def _digest(line):
+    return hashlib.blake2b(line.encode(), digest_size=8).digest()
+
+
+def _load_lines(lines):
+    for line in lines:
+        if not line.endswith(b"\n"):
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def _is_record_line(line):
+    """True if the line is a whole JSON object or array, the records of a JSON-lines file."""
+    try:
+        return isinstance(json.loads(line), (dict, list))
+    except ValueError:
+        return False
+
+
+class JsonJournal:
+    """
+    Append-only JSON-lines file with an in-memory dedup index.
+
+    Appends are flushed immediately and fsynced every `sync_count` records or `sync_interval` seconds.
+    A torn last line left by a power loss is cut off when the journal is opened, corrupted lines are moved to a
+    `.corrupted` file instead of being dropped. Old JSON array files are converted to JSON-lines the first time they
+    are opened, other files raise NotAJournalError and aren't touched.
+
+    Records handled by a consumer are marked with `discard_until`, the consumed offset is kept in an `.offset` file
+    and the journal is compacted once the consumed records are over `compact_size` bytes and half of the file.
+    The dedup index holds the hashes of the last `index_size` records.
+    """
+
+    def __init__(self, json_file, sync_count=JOURNAL_SYNC_COUNT, sync_interval=JOURNAL_SYNC_INTERVAL,
+                 index_size=JOURNAL_INDEX_SIZE, compact_size=JOURNAL_COMPACT_SIZE):
+        self.json_file = json_file
+        self.offset_file = json_file + ".offset"
+        self.sync_count = sync_count
+        self.sync_interval = sync_interval
+        self.index_size = index_size
+        self.compact_size = compact_size
+
+        self._lock = threading.RLock()
+        self._file = None
+        self._index = OrderedDict()
+        self._consumed = 0
+        self._pending = 0
+        self._last_sync = time.time()
+
+        with self._lock:
+            self._recover()
+
+    def __iter__(self):
+        for _, records in self.read_chunks():
+            yield from records
+
+    def _index_add(self, line):
+        self._index[_digest(line)] = None
+        if len(self._index) > self.index_size:
+            self._index.popitem(last=False)
+
+    def _recover(self):
+        self._close()
+        self._index = OrderedDict()
+        self._consumed = 0
+        if not os.path.isfile(self.json_file):
+            self._remove_offset()
+            return
+        with open(self.json_file, "rb") as f:
+            head = f.read(64).lstrip()
+            f.seek(0)
+            first_line = f.readline()
+        if head.startswith(b"["):
+            self._convert_json_array()
+            return
+        if head and not _is_record_line(first_line):
+            raise NotAJournalError(f"{self.json_file} is neither a JSON array nor JSON-lines")
+
+        self._consumed = _read_offset(self.json_file, self.offset_file)
+        good_size = 0
+        corrupted = []
+        with open(self.json_file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    logging.warning(f"Torn record at the end of {self.json_file} is dropped: {line[:100]}")
+                    break
+                try:
+                    record = json.loads(line)
+                    if good_size >= self._consumed:
+                        self._index_add(_dump(record))
+                except ValueError:
+                    logging.warning(f"Corrupted record in {self.json_file} is skipped: {line[:100]}")
+                    corrupted.append(line)
+                good_size += len(line)
+
+        if good_size != os.path.getsize(self.json_file):
+            with open(self.json_file, "r+b") as f:
+                f.truncate(good_size)
+        if corrupted:
+            with open(self.json_file + ".corrupted", "ab") as f:
+                f.writelines(corrupted)
+            self.compact()
+
+    def _write_offset(self, offset):
+        temp_file = self.offset_file + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"offset": offset, "inode": os.stat(self.json_file).st_ino}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.offset_file)
+
+    def _remove_offset(self):
+        if os.path.isfile(self.offset_file):
+            os.remove(self.offset_file)
+
+    def _convert_json_array(self):
+        try:
+            data = json.load(open(self.json_file, "r"))
+        except json.decoder.JSONDecodeError as json_error:
+            logging.error(f"JSONDecodeError happened at {self.json_file}: {json_error.pos}. "
+                          f"Trying to backup the file...", exc_info=True)
+            backup_file = self.json_file.replace(".json", "_backup.json")
+            shutil.move(self.json_file, backup_file)
+            logging.info(f"Backup file created: {backup_file}")
+            return
+        if not isinstance(data, list):
+            raise NotAJournalError(f"{self.json_file} is neither a JSON array nor JSON-lines")
+        logging.info(f"Converting {self.json_file} to JSON-lines with {len(data)} records.")
+        self._rewrite(data)
+
+    def _rewrite(self, records):
+        """Replace the journal with `records`, remove it if there are none."""
+        self._close()
+        self._index = OrderedDict()
+        self._consumed = 0
+        temp_file = self.json_file + ".tmp"
+        written = set()
+        with open(temp_file, "w") as f:
+            for record in records:
+                line = _dump(record)
+                digest = _digest(line)
+                if digest not in written:
+                    written.add(digest)
+                    self._index_add(line)
+                    f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if written:
+            os.replace(temp_file, self.json_file)
+        else:
+            os.remove(temp_file)
+            if os.path.isfile(self.json_file):
+                os.remove(self.json_file)
+        self._remove_offset()
+
+    def _open(self):
+        if self._file is not None:
+            if os.fstat(self._file.fileno()).st_nlink > 0:
+                return
+            # the file was removed behind our back, start over with an empty journal
+            self._close()
+            self._index = OrderedDict()
+            self._consumed = 0
+        os.makedirs(os.path.dirname(self.json_file), exist_ok=True)
+        self._file = open(self.json_file, "a")
+
+    def _close(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def append(self, record):
+        """Append `record` and return True, return False if the same record is in the recent records."""
+        line = _dump(record)
+        with self._lock:
+            self._open()
+            if _digest(line) in self._index:
+                return False
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._index_add(line)
+            self._pending += 1
+            if self._pending >= self.sync_count or time.time() - self._last_sync > self.sync_interval:
+                self._sync()
+            return True
+
+    def sync(self):
+        with self._lock:
+            if self._file is not None and self._pending:
+                self._sync()
+
+    def read_chunks(self, chunk_size=500):
+        """
+        Yield (end offset, records) of the records not consumed yet in chunks, the offset can be given to
+        `discard_until` once they are handled.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            consumed = self._consumed
+        if not os.path.isfile(self.json_file):
+            return
+        with open(self.json_file, "rb") as f:
+            f.seek(consumed)
+            records = []
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+                if len(records) >= chunk_size:
+                    yield f.tell(), records
+                    records = []
+            if records:
+                yield f.tell() - len(line), records
+
+    def discard_until(self, offset):
+        """Mark the records before `offset` as consumed, compact the journal when enough of it is consumed."""
+        with self._lock:
+            if not os.path.isfile(self.json_file) or offset <= self._consumed:
+                return
+            with open(self.json_file, "rb") as f:
+                f.seek(self._consumed)
+                for record in _load_lines(f.read(offset - self._consumed).splitlines(keepends=True)):
+                    self._index.pop(_digest(_dump(record)), None)
+            self._consumed = offset
+            size = os.path.getsize(self.json_file)
+            if offset >= size or (offset >= self.compact_size and offset * 2 >= size):
+                self.compact()
+            else:
+                self._write_offset(offset)
+
+    def compact(self):
+        """Rewrite the journal without the consumed, duplicated or corrupted records."""
+        with self._lock:
+            self._close()
+            records = []
+            if os.path.isfile(self.json_file):
+                with open(self.json_file, "rb") as f:
+                    f.seek(self._consumed)
+                    records = list(_load_lines(f))
+            self._rewrite(records)
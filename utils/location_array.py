@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6371e3
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """
+    Vectorized `tools.calculate_distance`, arguments are degrees as floats or numpy arrays.
+    The operations are done in the same order as the scalar version so both return the same meters.
+    """
+    phi1 = np.multiply(lat1, np.pi) / 180
+    phi2 = np.multiply(lat2, np.pi) / 180
+    return to_meters(_haversine_a(lat1, lng1, np.cos(phi1), lat2, lng2, np.cos(phi2)))
+
+
+def _haversine_a(lat1, lng1, cos_phi1, lat2, lng2, cos_phi2):
+    delta_phi = np.subtract(lat2, lat1) * np.pi / 180
+    delta_lambda = np.subtract(lng2, lng1) * np.pi / 180
+    sin_phi = np.sin(delta_phi / 2)
+    sin_lambda = np.sin(delta_lambda / 2)
+    return sin_phi * sin_phi + cos_phi1 * cos_phi2 * (sin_lambda * sin_lambda)
+
+
+def to_meters(a):
+    # SIMD builds of numpy.arctan2 can be one ulp away from math.atan2, scalars go through math to stay identical
+    if np.ndim(a) == 0:
+        a = float(a)
+        return EARTH_RADIUS * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
+    return EARTH_RADIUS * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+
+
+class LocationArray:
+    """
+    Garbage locations kept as contiguous float64 arrays to compute the distances to a gps fix in one numpy pass.
+    Distance grows with the haversine `a` term, so searches rank on `a` and only convert the results to meters.
+    """
+
+    def __init__(self, locations):
+        self.ids = [loc["id"] for loc in locations]
+        self.lat = np.ascontiguousarray([float(loc["lat"]) for loc in locations], dtype=np.float64)
+        self.lng = np.ascontiguousarray([float(loc["lng"]) for loc in locations], dtype=np.float64)
+        # degrees are kept next to the precomputed cosines, deltas in degrees keep the results identical
+        self.cos_phi = np.cos(self.lat * np.pi / 180)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def haversine_a(self, location, start=0, end=None):
+        """Haversine `a` terms from `location` to the locations from `start` to `end`, they rank like the distances."""
+        lat, lng = float(location["lat"]), float(location["lng"])
+        cos_phi = math.cos(lat * math.pi / 180)
+        return _haversine_a(lat, lng, cos_phi, self.lat[start:end], self.lng[start:end], self.cos_phi[start:end])
+
+    def distances(self, location):
+        """Return the distances in meters from `location` to every location in the array."""
+        return to_meters(self.haversine_a(location))
+
+    def closest(self, location):
+        """Return (distance in meters, index) of the closest location or (inf, None) if the array is empty."""
+        if len(self) == 0:
+            return float("inf"), None
+        a = self.haversine_a(location)
+        index = int(np.argmin(a))
+        return to_meters(a[index]), index
+
+    def top_k(self, location, k):
+        """Return [(distance in meters, index), ...] of the `k` closest locations, closest first, ties in order."""
+        a = self.haversine_a(location)
+        k = min(k, len(a))
+        if k == 0:
+            return []
+        # every location tied with the k-th is a candidate, so the ties are broken by index and not by the partition
+        indexes = np.flatnonzero(a <= np.partition(a, k - 1)[k - 1]) if k < len(a) else np.arange(k)
+        indexes = indexes[np.lexsort((indexes, a[indexes]))][:k]
+        return [(to_meters(a[index]), int(index)) for index in indexes]
@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+
+from utils.location_array import LocationArray, to_meters
+
+
+def to_unit_vector(lat, lng):
+    phi = float(lat) * math.pi / 180
+    lambda_ = float(lng) * math.pi / 180
+    cos_phi = math.cos(phi)
+    return cos_phi * math.cos(lambda_), cos_phi * math.sin(lambda_), math.sin(phi)
+
+
+def chord_length(distance, radius=6371e3):
+    """Straight line distance through the unit sphere for a great circle `distance` in meters."""
+    return 2 * math.sin(min(distance / radius, math.pi) / 2)
+
+
+class LocationIndex:
+    """
+    KD-tree over garbage locations, built once per garbage list.
+
+    The tree splits the locations as unit vectors on the sphere, so the euclidean (chord) distance between two vectors
+    keeps the same order as the haversine distance between the locations. The locations of a leaf are contiguous in a
+    LocationArray kept in tree order, a leaf is searched with one numpy pass over its slice.
+    Returned distances are the haversine distances of `calculate_distance`, same as `check_locations`, and ties go to
+    the location first in the list.
+    """
+
+    def __init__(self, locations, leaf_size=32):
+        self.locations = locations
+        self.leaf_size = leaf_size
+        self._points = [to_unit_vector(loc["lat"], loc["lng"]) for loc in locations]
+        order = []
+        self._tree = self._build(list(range(len(self._points))), 0, order) if self._points else None
+        self._order = np.array(order, dtype=np.int64)  # position in the array to position in the list
+        self._array = LocationArray([locations[i] for i in order])
+
+    def __len__(self):
+        return len(self.locations)
+
+    def _build(self, indexes, depth, order):
+        if len(indexes) <= self.leaf_size:
+            start = len(order)
+            order.extend(sorted(indexes))
+            return start, len(order)
+        axis = depth % 3
+        indexes.sort(key=lambda i: self._points[i][axis])
+        middle = len(indexes) // 2
+        split = self._points[indexes[middle]][axis]
+        return (axis, split,
+                self._build(indexes[:middle], depth + 1, order),
+                self._build(indexes[middle:], depth + 1, order))
+
+    def _nearest(self, node, query, location, best):
+        if len(node) == 2:
+            start, end = node
+            a = self._array.haversine_a(location, start, end)
+            minimum = a.min()
+            index = int(self._order[start + np.flatnonzero(a == minimum)].min())
+            if (minimum, index) < (best[0], best[1]):
+                best[0], best[1] = minimum, index
+            return
+        axis, split, left, right = node
+        diff = query[axis] - split
+        near, far = (left, right) if diff < 0 else (right, left)
+        self._nearest(near, query, location, best)
+        # the squared chord is 4 a, padded so float rounding never skips a tie on the other side
+        if diff * diff <= 4 * best[0] * (1 + 1e-9) + 1e-15:
+            self._nearest(far, query, location, best)
+
+    def _within(self, node, query, location, limit, found):
+        if len(node) == 2:
+            start, end = node
+            a = self._array.haversine_a(location, start, end)
+            inside = np.flatnonzero(a <= limit)
+            if len(inside):
+                found.append((a[inside], self._order[start + inside]))
+            return
+        axis, split, left, right = node
+        diff = query[axis] - split
+        chord_limit = 4 * limit
+        if diff <= 0 or diff * diff <= chord_limit:
+            self._within(left, query, location, limit, found)
+        if diff >= 0 or diff * diff <= chord_limit:
+            self._within(right, query, location, limit, found)
+
+    def nearest(self, location):
+        """Return (distance in meters, closest location) or (inf, None) if the index is empty."""
+        if self._tree is None:
+            return float("inf"), None
+        best = [float("inf"), -1]
+        self._nearest(self._tree, to_unit_vector(location["lat"], location["lng"]), location, best)
+        return to_meters(best[0]), self.locations[best[1]]
+
+    def within(self, location, radius):
+        """Return [(distance in meters, location), ...] closer than `radius` meters, closest first."""
+        if self._tree is None:
+            return []
+        found = []
+        # small padding so float rounding never drops a location on the border, the meters are checked after
+        limit = (chord_length(radius) / 2) ** 2 * (1 + 1e-9)
+        self._within(self._tree, to_unit_vector(location["lat"], location["lng"]), location, limit, found)
+        if not found:
+            return []
+        a = np.concatenate([a for a, _ in found])
+        indexes = np.concatenate([indexes for _, indexes in found])
+        distances = np.array([to_meters(value) for value in a])  # few locations, the scalar meters of check_locations
+        return [(float(distances[i]), self.locations[indexes[i]])
+                for i in np.lexsort((indexes, distances)) if distances[i] <= radius]
@@ -0,0 +1,89 @@
+import struct
+
+import cv2
+import numpy as np
+
+SOI = b"\xff\xd8"
+DHT = 0xC4
+SOS = 0xDA
+APP0 = 0xE0
+APP1 = 0xE1
+COM = 0xFE
+ORIENTATIONS = {0: 1, 90: 8, 180: 3, 270: 6}  # degrees counterclockwise to the exif orientation showing them upright
+
+
+def decode(jpeg):
+    return cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+
+
+def decode_preview(jpeg):
+    """Decode the frame at a quarter of its size, the decoder skips most of the work. None for a broken frame."""
+    return cv2.imdecode(jpeg, cv2.IMREAD_REDUCED_COLOR_4)
+
+
+def _segment(marker, payload):
+    return struct.pack(">BBH", 0xFF, marker, len(payload) + 2) + payload
+
+
+def _segments(data):
+    """(marker, start, end) of the header segments of a jpeg, until the start of the scan."""
+    position = 2
+    while position + 4 <= len(data) and data[position] == 0xFF:
+        marker = data[position + 1]
+        end = position + 2 + struct.unpack_from(">H", data, position + 2)[0]
+        yield marker, position, end
+        if marker == SOS:
+            return
+        position = end
+
+
+def _standard_huffman_tables():
+    """DHT segments of the standard tables of the jpeg specification, libjpeg writes them without optimized coding."""
+    encoded = cv2.imencode(".jpg", np.zeros((8, 8, 3), np.uint8), [cv2.IMWRITE_JPEG_OPTIMIZE, 0])[1].tobytes()
+    return b"".join(encoded[start:end] for marker, start, end in _segments(encoded) if marker == DHT)
+
+
+STANDARD_HUFFMAN_TABLES = _standard_huffman_tables()
+
+
+def has_huffman_tables(data):
+    return any(marker == DHT for marker, _, _ in _segments(data))
+
+
+def exif_orientation(orientation):
+    """APP1 segment with an exif holding only the orientation tag."""
+    tiff = b"MM\x00\x2a" + struct.pack(">I", 8)
+    tiff += struct.pack(">H", 1) + struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack(">I", 0)
+    return _segment(APP1, b"Exif\x00\x00" + tiff)
+
+
+def write_jpeg(path, jpeg, comment=None, rotation=0):
+    """
+    Write the compressed frame of an mjpeg camera as a jpeg file without decoding it, return the bytes written.
+
+    The `comment` is written in a COM segment and the `rotation` as the exif orientation after the JFIF segment of the
+    frame, a rotation that isn't a right angle raises ValueError. The standard huffman tables are added when the frame
+    leaves them out, as mjpeg cameras do.
+    """
+    orientation = ORIENTATIONS.get(rotation % 360)
+    if orientation is None:
+        raise ValueError(f"A rotation of {rotation} degrees can't be written as an exif orientation")
+    data = memoryview(np.ascontiguousarray(jpeg)).cast("B")
+    if data[:2] != SOI:
+        raise ValueError("Not a jpeg frame")
+    start = 2
+    for marker, _, end in _segments(data):
+        if marker != APP0:
+            break
+        start = end
+    header = bytes(data[:start])
+    if orientation != 1:
+        header += exif_orientation(orientation)
+    if comment:
+        header += _segment(COM, comment.encode()[:65000])
+    if not has_huffman_tables(data):
+        header += STANDARD_HUFFMAN_TABLES
+    with open(path, "wb") as file:
+        file.write(header)
+        file.write(data[start:])
+    return len(header) + len(data) - start
@@ -0,0 +1,100 @@
+from constants.gps_commands import GPS_DATA
+
+KNOTS_TO_KMH = 1.852
+
+
+def checksum(body):
+    value = 0
+    for char in body:
+        value ^= ord(char)
+    return f"{value:02X}"
+
+
+def with_checksum(body):
+    return f"${body}*{checksum(body)}\r\n"
+
+
+def normalize_time(utc):
+    """Return an NMEA hhmmss[.s...] time as hhmmss.sss, the format of $GPSACP, unchanged if it isn't a time."""
+    seconds, _, fraction = utc.partition(".")
+    if len(seconds) != 6 or not seconds.isdigit() or (fraction and not fraction.isdigit()):
+        return utc
+    return f"{seconds}.{fraction[:3]:0<3}"
+
+
+def is_valid(sentence):
+    if not sentence.startswith("$") or "*" not in sentence:
+        return False
+    body, _, received = sentence[1:].partition("*")
+    return received[:2].upper() == checksum(body)
+
+
+def make_rmc(utc, lat, lng, speed_knots, course, date):
+    """RMC sentence, `lat` and `lng` are in the ddmm.mmmmN / dddmm.mmmmE format of $GPSACP."""
+    return with_checksum(f"GPRMC,{utc},A,{lat[:-1]},{lat[-1]},{lng[:-1]},{lng[-1]},"
+                         f"{speed_knots},{course},{date},,,A")
+
+
+def make_gga(utc, lat, lng, satellites, hdop, altitude):
+    return with_checksum(f"GPGGA,{utc},{lat[:-1]},{lat[-1]},{lng[:-1]},{lng[-1]},1,{satellites:02d},"
+                         f"{hdop},{altitude},M,,M,,")
+
+
+class LineFramer:
+    """Splits the chunks read from a serial port to lines, a partial line is kept for the next chunk."""
+
+    def __init__(self, max_line=512):
+        self.max_line = max_line
+        self._buffer = b""
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        if len(self._buffer) > self.max_line:
+            self._buffer = b""
+        return [line.decode("ascii", errors="ignore").strip() for line in lines if line.strip()]
+
+
+class NmeaAssembler:
+    """
+    Builds $GPSACP strings from the RMC and GGA sentences of the same fix, so `GPSData` can parse both modes.
+    $GPSACP lines are passed through as they are.
+    """
+
+    def __init__(self):
+        self._rmc = None
+        self._gga = None
+
+    def feed(self, line):
+        """Return a $GPSACP string when `line` completes a fix, otherwise None."""
+        if line.startswith(GPS_DATA.strip()):
+            return line
+        sentence = line[line.rfind("$"):]  # drops the prefix of unsolicited messages, e.g. $GPSNMUN:
+        if not is_valid(sentence):
+            return None
+        fields = sentence[1:sentence.index("*")].split(",")
+        sentence_type = fields[0][2:]
+        if sentence_type == "RMC":
+            self._rmc = fields
+        elif sentence_type == "GGA":
+            self._gga = fields
+        else:
+            return None
+        if self._rmc is None or self._gga is None or self._rmc[1] != self._gga[1]:
+            return None
+        gps_string = self._to_gpsacp(self._rmc, self._gga)
+        self._rmc = self._gga = None
+        return gps_string
+
+    @staticmethod
+    def _to_gpsacp(rmc, gga):
+        utc, status, lat, lat_dir, lng, lng_dir, speed_knots, course, date = rmc[1:10]
+        utc = normalize_time(utc)
+        quality, satellites, hdop, altitude = gga[6], gga[7], gga[8], gga[9]
+        if status != "A" or quality in ("", "0"):
+            return GPS_DATA + f"{utc},,,,,1,,,,{date},,"
+        satellites = int(satellites or 0)
+        fix = 3 if satellites >= 4 and altitude else 2
+        speed_knots = float(speed_knots or 0)
+        return GPS_DATA + (f"{utc},{lat}{lat_dir},{lng}{lng_dir},{hdop},{altitude or 0},{fix},{course or 0},"
+                           f"{round(speed_knots * KNOTS_TO_KMH, 1)},{speed_knots},{date},{satellites:02d},00")
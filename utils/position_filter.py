@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+
+from constants.numbers import (GPS_FILTER_UERE, GPS_FILTER_ACCELERATION, GPS_FILTER_SPEED_ERROR, GPS_FILTER_GATE,
+                               GPS_FILTER_MAX_GAP, GPS_FILTER_MAX_REJECTED, TRACK_STOP_SPEED)
+
+EARTH_RADIUS = 6371e3
+
+
+class PositionFilter:
+    """
+    Constant velocity Kalman filter of the gps fixes, in local meters around the first fix.
+
+    A fix is weighted by its hdop, its speed and course are used as a velocity measurement. Positions further than
+    the `gate` (squared Mahalanobis distance) from the prediction are skipped as multipath jumps, at most
+    `max_rejected` in a row, the next one is taken as a real move. The filter starts again after `max_gap` seconds
+    without a fix.
+    `predict(timestamp)` gives the position at any time between and after the fixes.
+    """
+
+    def __init__(self,
+                 uere=GPS_FILTER_UERE,
+                 acceleration=GPS_FILTER_ACCELERATION,
+                 speed_error=GPS_FILTER_SPEED_ERROR,
+                 gate=GPS_FILTER_GATE,
+                 max_gap=GPS_FILTER_MAX_GAP,
+                 max_rejected=GPS_FILTER_MAX_REJECTED):
+        self.uere = uere
+        self.acceleration = acceleration
+        self.speed_error = speed_error
+        self.gate = gate
+        self.max_gap = max_gap
+        self.max_rejected = max_rejected
+
+        self._origin = None
+        self._state = np.zeros(4)  # x, y in meters to the east and north, and their speeds in m/s
+        self._covariance = np.eye(4)
+        self._time = 0
+        self._rejected = 0
+        self.rejected_count = 0
+
+    def _to_xy(self, lat, lng):
+        x = math.radians(lng - self._origin[1]) * EARTH_RADIUS * math.cos(math.radians(self._origin[0]))
+        y = math.radians(lat - self._origin[0]) * EARTH_RADIUS
+        return x, y
+
+    def _to_lat_lng(self, x, y):
+        lat = self._origin[0] + math.degrees(y / EARTH_RADIUS)
+        lng = self._origin[1] + math.degrees(x / (EARTH_RADIUS * math.cos(math.radians(self._origin[0]))))
+        return lat, lng
+
+    def _measurement(self, gps_data):
+        x, y = self._to_xy(gps_data.lat, gps_data.lng)
+        speed = gps_data.spkm / 3.6
+        if gps_data.spkm < TRACK_STOP_SPEED:
+            speed = 0  # the course is noise while standing
+        course = math.radians(gps_data.cog)
+        position_variance = (max(gps_data.hdop, 0.5) * self.uere) ** 2
+        return (np.array([x, y, speed * math.sin(course), speed * math.cos(course)]),
+                np.diag([position_variance, position_variance, self.speed_error ** 2, self.speed_error ** 2]))
+
+    def _propagate(self, dt):
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+        q = self.acceleration ** 2
+        noise = q * np.array([[dt ** 3 / 3, 0, dt ** 2 / 2, 0],
+                              [0, dt ** 3 / 3, 0, dt ** 2 / 2],
+                              [dt ** 2 / 2, 0, dt, 0],
+                              [0, dt ** 2 / 2, 0, dt]])
+        return transition @ self._state, transition @ self._covariance @ transition.T + noise
+
+    def is_ready(self, timestamp):
+        return self._origin is not None and timestamp - self._time <= self.max_gap
+
+    def reset(self, gps_data, timestamp):
+        self._origin = (gps_data.lat, gps_data.lng)
+        self._state, self._covariance = self._measurement(gps_data)
+        self._time = timestamp
+        self._rejected = 0
+
+    def update(self, gps_data, timestamp):
+        """Feed a valid fix taken at `timestamp` seconds, return the filtered (lat, lng)."""
+        if not self.is_ready(timestamp) or timestamp < self._time:
+            self.reset(gps_data, timestamp)
+            return gps_data.lat, gps_data.lng
+        state, covariance = self._propagate(timestamp - self._time)
+        measurement, noise = self._measurement(gps_data)
+        rows = [0, 1, 2, 3]
+        innovation = measurement - state
+        position_residual = innovation[:2] @ np.linalg.solve(covariance[:2, :2] + noise[:2, :2], innovation[:2])
+        if position_residual > self.gate and self._rejected < self.max_rejected:
+            rows = [2, 3]  # keep the speed, skip the jump
+            self._rejected += 1
+            self.rejected_count += 1
+        else:
+            self._rejected = 0
+        observation = np.eye(4)[rows]
+        residual_covariance = observation @ covariance @ observation.T + noise[np.ix_(rows, rows)]
+        gain = covariance @ observation.T @ np.linalg.inv(residual_covariance)
+        self._state = state + gain @ innovation[rows]
+        self._covariance = (np.eye(4) - gain @ observation) @ covariance
+        self._time = timestamp
+        return self._to_lat_lng(self._state[0], self._state[1])
+
+    def predict(self, timestamp):
+        """Return the (lat, lng, speed in km/h, course) at `timestamp`, None without a recent fix."""
+        if not self.is_ready(timestamp):
+            return None
+        dt = max(timestamp - self._time, 0)
+        x, y, vx, vy = self._state
+        lat, lng = self._to_lat_lng(x + vx * dt, y + vy * dt)
+        return lat, lng, math.hypot(vx, vy) * 3.6, math.degrees(math.atan2(vx, vy)) % 360
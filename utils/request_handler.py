@@ -1,10 +1,87 @@
 import logging
+import socket
+import threading
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from constants.numbers import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF, HTTP_KEEPALIVE_IDLE
+from constants.urls import URL_CONNECTION
+from utils.connectivity import ConnectivityMonitor
+
+_settings = {"pool_size": HTTP_POOL_SIZE, "retries": HTTP_RETRIES,
+             "backoff": HTTP_BACKOFF, "keepalive_idle": HTTP_KEEPALIVE_IDLE}
+_sessions = {}
+_sessions_lock = threading.Lock()
+_monitor = None
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that turns on tcp keepalive, so idle pooled connections over the cellular link are kept open."""
+
+    def __init__(self, keepalive_idle=HTTP_KEEPALIVE_IDLE, **kwargs):
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            socket_options += [(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle),
+                               (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(self.keepalive_idle // 3, 1)),
+                               (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)]
+        kwargs["socket_options"] = socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def configure(**settings):
+    """Change pool_size, retries, backoff or keepalive_idle, the sessions are created again with the new settings."""
+    with _sessions_lock:
+        _settings.update(settings)
+    close_sessions()
+
+
+def _create_session():
+    retry = Retry(total=_settings["retries"],
+                  read=0,  # a request that reached the server is never sent twice
+                  backoff_factor=_settings["backoff"],
+                  status_forcelist=(502, 503, 504),
+                  raise_on_status=False)
+    adapter = KeepAliveAdapter(keepalive_idle=_settings["keepalive_idle"],
+                               pool_connections=1,
+                               pool_maxsize=_settings["pool_size"],
+                               max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
+def get_session(url):
+    """Return the long-lived session of the host of `url`, sessions are shared by all threads."""
+    parts = urlsplit(url)
+    host = (parts.scheme, parts.netloc)
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _create_session()
+    return session
 
-def check_connection(url="https://cdn.atiknakit.com", timeout=5):
+
+def close_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def probe_connection(url=URL_CONNECTION, timeout=5):
     try:
-        requests.head(url, timeout=timeout)
+        get_session(url).head(url, timeout=timeout)
         return True
     except requests.exceptions.ConnectionError:
         pass
@@ -13,19 +90,57 @@ def check_connection(url="https://cdn.atiknakit.com", timeout=5):
     return False
 
 
+def get_monitor(probe_url=URL_CONNECTION):
+    """Return the connectivity monitor, unless one was set it is started probing `probe_url` on the first call."""
+    global _monitor
+    if _monitor is None:
+        with _sessions_lock:
+            if _monitor is None:
+                _monitor = ConnectivityMonitor(probe=lambda: probe_connection(probe_url))
+    return _monitor
+
+
+def set_monitor(monitor):
+    """Use `monitor` for the connection state instead of the default one, which is stopped if it was started."""
+    global _monitor
+    with _sessions_lock:
+        previous, _monitor = _monitor, monitor
+    if previous is not None and previous is not monitor:
+        previous.stop()
+
+
+def _report(success):
+    """Tell the result of a request to the connectivity monitor, if it is running, requests don't start it."""
+    monitor = _monitor
+    if monitor is None:
+        return
+    if success:
+        monitor.report_success()
+    else:
+        monitor.report_failure()
+
+
+def check_connection(timeout=10):
+    """Return the connection state kept by the connectivity monitor, waits for the first probe if needed."""
+    return get_monitor().is_online(timeout=timeout)
+
+
 def post(url, **kwargs):
     response = requests.Response()
     response.status_code = -1
     try:
-        response = requests.post(url=url, **kwargs)
+        response = get_session(url).post(url=url, **kwargs)
+        _report(True)
     except requests.exceptions.ConnectionError:
         # logging.warning("Connection Error while sending request to {}".format(url))
         response.reason = "Connection Error while sending request to {}".format(url)
         response.status_code = -2
+        _report(False)
     except requests.Timeout:
         # logging.warning("Timeout while posting to {}".format(url))
         response.reason = "Timeout while posting to {}".format(url)
         response.status_code = -3
+        _report(False)
     except:
         logging.exception("Error in post request to {}".format(url))
     return response
@@ -35,15 +150,18 @@ def get(url, **kwargs):
     response = requests.Response()
     response.status_code = -1
     try:
-        response = requests.get(url=url, **kwargs)
+        response = get_session(url).get(url=url, **kwargs)
+        _report(True)
     except requests.exceptions.ConnectionError:
         # logging.warning("Connection error while getting from {}".format(url))
         response.reason = "Connection error while getting from {}".format(url)
         response.status_code = -2
+        _report(False)
     except requests.Timeout:
         # logging.warning("Timeout while getting from {}".format(url))
         response.reason = "Timeout while getting from {}".format(url)
         response.status_code = -3
+        _report(False)
     except requests.exceptions.ChunkedEncodingError:
         # logging.warning("Chunked Encoding Error while getting from {}".format(url))
         response.reason = "Chunked Encoding Error while getting from {}".format(url)
@@ -40,14 +40,19 @@ class SerialConnection:
         self._serial.port = self.port
 
     @Decorators.ensure_open
-    def send_command(self, command):
+    def send_command(self, command, wait=0.5):
         self._serial.write(command.encode())
-        time.sleep(0.5)
+        time.sleep(wait)
 
     @Decorators.ensure_open
     def read_data(self):
         return self._serial.readline().decode("utf-8", errors="ignore")
 
+    @Decorators.ensure_open
+    def read_chunk(self, size=4096):
+        """Read what is waiting in the input buffer, waits up to `timeout` seconds for the first byte."""
+        return self._serial.read(min(max(self._serial.in_waiting, 1), size))
+
     @Decorators.ensure_open
     def read_until(self, expected="$GPSACP"):
         while True:
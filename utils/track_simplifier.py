@@ -0,0 +1,114 @@
+import math
+
+from constants.numbers import (GPS_UPLOAD_MIN_DISTANCE, TRACK_TOLERANCE, TRACK_MAX_DELAY, TRACK_STOP_SPEED,
+                               TRACK_SPEED_CHANGE, TRACK_MAX_BUFFER)
+
+EARTH_RADIUS = 6371e3
+
+
+def to_xy(origin, gps_data):
+    """Local equirectangular projection of `gps_data` around `origin` in meters."""
+    x = math.radians(gps_data.lng - origin.lng) * EARTH_RADIUS * math.cos(math.radians(origin.lat))
+    y = math.radians(gps_data.lat - origin.lat) * EARTH_RADIUS
+    return x, y
+
+
+def segment_distance(point, start, end):
+    """Distance in meters of `point` to the segment from `start` to `end`, all in local meters."""
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = max(0, min(1, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length2))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+
+class TrackSimplifier:
+    """
+    Streaming track simplification with a sliding window Douglas-Peucker test.
+
+    Points since the last kept point are buffered. A point is kept when:
+        - the buffered points leave the `tolerance` corridor of the segment to the newest point (turns),
+        - the vehicle stops or starts moving again,
+        - the speed changed more than `speed_change` km/h since the last kept point,
+        - the last kept point is older than `max_delay` seconds.
+    Points closer than `min_distance` meters to the last kept point are skipped before the corridor test, they are only
+    kept for stops, starts and delays. The kept track is never further than `tolerance` from the other points.
+    """
+
+    def __init__(self,
+                 tolerance=TRACK_TOLERANCE,
+                 max_delay=TRACK_MAX_DELAY,
+                 min_distance=GPS_UPLOAD_MIN_DISTANCE,
+                 stop_speed=TRACK_STOP_SPEED,
+                 speed_change=TRACK_SPEED_CHANGE,
+                 max_buffer=TRACK_MAX_BUFFER):
+        self.tolerance = tolerance
+        self.max_delay = max_delay
+        self.min_distance = min_distance
+        self.stop_speed = stop_speed
+        self.speed_change = speed_change
+        self.max_buffer = max_buffer
+
+        self._anchor = None
+        self._anchor_time = 0
+        self._buffer = []
+        self.input_count = 0
+        self.output_count = 0
+
+    def _keep(self, gps_data, timestamp):
+        self._anchor = gps_data
+        self._anchor_time = timestamp
+        self._buffer = []
+        self.output_count += 1
+        return [gps_data]
+
+    def _keep_with_corner(self, gps_data, timestamp):
+        # the buffered points are dropped, keep the last one too if the segment can't describe them
+        if self._buffer and self._leaves_corridor(gps_data):
+            return self._keep(*self._buffer[-1]) + self._keep(gps_data, timestamp)
+        return self._keep(gps_data, timestamp)
+
+    def _is_stopped(self, gps_data):
+        return gps_data.spkm < self.stop_speed
+
+    def _leaves_corridor(self, gps_data):
+        end = to_xy(self._anchor, gps_data)
+        return any(segment_distance(to_xy(self._anchor, point), (0, 0), end) > self.tolerance
+                   for point, _ in self._buffer)
+
+    def push(self, gps_data, timestamp):
+        """Feed a valid fix taken at `timestamp` seconds, return the fixes to keep (zero, one or two)."""
+        self.input_count += 1
+        if self._anchor is None:
+            return self._keep(gps_data, timestamp)
+
+        if self._is_stopped(gps_data) != self._is_stopped(self._anchor):
+            return self._keep_with_corner(gps_data, timestamp)
+        if timestamp - self._anchor_time >= self.max_delay:
+            return self._keep_with_corner(gps_data, timestamp)
+
+        distance = math.hypot(*to_xy(self._anchor, gps_data))
+        if distance < self.min_distance:
+            return []
+        if abs(gps_data.spkm - self._anchor.spkm) >= self.speed_change:
+            return self._keep_with_corner(gps_data, timestamp)
+
+        if self._buffer and (self._leaves_corridor(gps_data) or len(self._buffer) >= self.max_buffer):
+            # the previous point is the last one the straight segment could describe
+            previous, previous_time = self._buffer[-1]
+            kept = self._keep(previous, previous_time)
+            if math.hypot(*to_xy(self._anchor, gps_data)) >= self.min_distance:
+                self._buffer.append((gps_data, timestamp))
+            return kept
+        self._buffer.append((gps_data, timestamp))
+        return []
+
+    def flush(self):
+        """Return the last buffered fix, e.g. when the track ends."""
+        if not self._buffer:
+            return []
+        return self._keep(*self._buffer[-1])
+
+    def compression_ratio(self):
+        return self.input_count / max(self.output_count, 1)
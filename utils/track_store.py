@@ -0,0 +1,174 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from constants.folders import LOCATION_RECORDS
+from constants.gps_commands import GPS_DATA
+from constants.numbers import TRACK_STORE_FLUSH_INTERVAL, TRACK_STORE_BUFFER_SIZE
+from utils.gps_data import GPSData, dd2ddm
+
+SEGMENT_EXTENSION = ".trk"
+RECORD_MARKER = 0xA5  # zero filled blocks left by a crash don't have the marker
+RECORD = struct.Struct("<dddfffBB")  # time, lat, lng, speed, cog, hdop, fix, marker
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("lat", "<f8"), ("lng", "<f8"), ("speed", "<f4"), ("cog", "<f4"),
+                         ("hdop", "<f4"), ("fix", "u1"), ("marker", "u1")])
+
+
+def segment_path(folder, day):
+    return os.path.join(folder, day.strftime("%Y-%m-%d") + SEGMENT_EXTENSION)
+
+
+def read_segment(file_path):
+    """Return the complete records of a segment, a torn record at the end of the file is skipped."""
+    try:
+        size = os.path.getsize(file_path)
+    except FileNotFoundError:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    count = size // RECORD.size
+    if size % RECORD.size:
+        logging.warning(f"TrackStore: Skipping the torn record at the end of {file_path}")
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), count * RECORD.size, access=mmap.ACCESS_READ) as m:
+        view = np.frombuffer(m, dtype=RECORD_DTYPE, count=count)
+        records = view[view["marker"] == RECORD_MARKER]  # a copy, the mmap can be closed
+        del view
+    return records
+
+
+def record_to_gps_data(record):
+    """Rebuild a GPSData from a stored record, e.g. to replay a track."""
+    utc = datetime.fromtimestamp(float(record["time"]), tz=timezone.utc)
+    lat, lng = float(record["lat"]), float(record["lng"])
+    speed = float(record["speed"])
+    return GPSData(GPS_DATA + f"{utc.strftime('%H%M%S.%f')[:10]},"
+                              f"{dd2ddm(abs(lat))}{'N' if lat >= 0 else 'S'},"
+                              f"{dd2ddm(abs(lng))}{'E' if lng >= 0 else 'W'},"
+                              f"{float(record['hdop']):.1f},0.0,{int(record['fix'])},{float(record['cog']):.1f},"
+                              f"{speed:.1f},{speed / 1.852:.1f},{utc.strftime('%d%m%y')},00,00")
+
+
+class TrackStore(threading.Thread):
+    """
+    Stores the valid gps fixes in daily segments of fixed width binary records.
+
+    Records are buffered and appended every `flush_interval` seconds or when `buffer_size` records are waiting.
+    A crash can only lose the buffered records and tear the last record of a segment, which is skipped when the
+    segment is read and cut off before the next append.
+    """
+
+    def __init__(self, folder=LOCATION_RECORDS, flush_interval=TRACK_STORE_FLUSH_INTERVAL,
+                 buffer_size=TRACK_STORE_BUFFER_SIZE):
+        threading.Thread.__init__(self, daemon=True, name="TrackStore")
+        self.folder = folder
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+
+        self._buffers = {}
+        self._buffered_count = 0
+        self._checked_segments = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_now = threading.Event()
+
+        self._running = True
+        self.start()
+
+    def append(self, gps_data):
+        if not gps_data.is_valid():
+            return
+        record = RECORD.pack(gps_data.local_date.timestamp(), gps_data.lat, gps_data.lng, gps_data.spkm,
+                             gps_data.cog, gps_data.hdop, gps_data.fix, RECORD_MARKER)
+        path = segment_path(self.folder, gps_data.local_date)
+        with self._lock:
+            self._buffers.setdefault(path, bytearray()).extend(record)
+            self._buffered_count += 1
+            if self._buffered_count >= self.buffer_size:
+                self._flush_now.set()
+
+    def _repair(self, path):
+        """Cut off a torn record at the end of a segment, so the new records are aligned."""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        if size % RECORD.size:
+            logging.warning(f"TrackStore: Cutting off the torn record at the end of {path}")
+            os.truncate(path, size - size % RECORD.size)
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, {}
+                self._buffered_count = 0
+            if not buffers:
+                return
+            os.makedirs(self.folder, exist_ok=True)
+            for path, data in buffers.items():
+                if path not in self._checked_segments:
+                    self._repair(path)
+                    self._checked_segments.add(path)
+                try:
+                    with open(path, "ab") as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                except OSError as e:
+                    logging.error(f"TrackStore: {e}")
+
+    def run(self):
+        while self._running:
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            self.flush()
+
+    def stop(self):
+        self._running = False
+        self._flush_now.set()
+        self.flush()
+
+    def segments(self, start=None, end=None):
+        """Paths of the existing segments of the local days between the `start` and `end` timestamps."""
+        if start is None or end is None:
+            if not os.path.isdir(self.folder):
+                return []
+            return sorted(os.path.join(self.folder, name) for name in os.listdir(self.folder)
+                          if name.endswith(SEGMENT_EXTENSION))
+        day = datetime.fromtimestamp(start).date()
+        last_day = datetime.fromtimestamp(end).date()
+        paths = []
+        while day <= last_day:
+            path = segment_path(self.folder, day)
+            if os.path.isfile(path):
+                paths.append(path)
+            day += timedelta(days=1)
+        return paths
+
+    def query(self, start=None, end=None, bbox=None):
+        """
+        Return the records between the `start` and `end` timestamps, inside the (min_lat, min_lng, max_lat, max_lng)
+        `bbox` if given, as a structured numpy array with the fields of RECORD_DTYPE.
+        Buffered records are written first, so they are included.
+        """
+        self.flush()
+        results = []
+        for path in self.segments(start, end):
+            records = read_segment(path)
+            mask = np.ones(len(records), dtype=bool)
+            if start is not None:
+                mask &= records["time"] >= start
+            if end is not None:
+                mask &= records["time"] <= end
+            if bbox is not None:
+                min_lat, min_lng, max_lat, max_lng = bbox
+                mask &= ((records["lat"] >= min_lat) & (records["lat"] <= max_lat) &
+                         (records["lng"] >= min_lng) & (records["lng"] <= max_lng))
+            results.append(records[mask])
+        if not results:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.concatenate(results)
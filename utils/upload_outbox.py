@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from constants.files import UPLOAD_OUTBOX
+from constants.numbers import OUTBOX_RETRY_WAIT, OUTBOX_MAX_RETRY_WAIT
+
+from utils.singleton import Singleton
+
+PENDING = "pending"
+UPLOADING = "uploading"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    file_path TEXT UNIQUE,
+    payload TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    priority INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    retries INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_queue ON outbox (state, priority DESC, created_at);
+"""
+
+
+class OutboxItem:
+    def __init__(self, row):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.file_path = row["file_path"]
+        self.payload = json.loads(row["payload"]) if row["payload"] else None
+        self.size = row["size"]
+        self.priority = row["priority"]
+        self.created_at = row["created_at"]
+        self.retries = row["retries"]
+        self.last_error = row["last_error"]
+
+    def __repr__(self):
+        return f"OutboxItem({self.id}, {self.kind}, {self.file_path or self.payload})"
+
+
+class UploadOutbox(metaclass=Singleton):
+    """
+    Durable queue of everything waiting to be uploaded, kept in a WAL mode SQLite database.
+
+    Producers enqueue a file or a json payload, the uploader claims batches ordered by priority and age.
+    Failed items are retried with an exponential backoff, the wait and the last error are kept per item.
+    Items stay claimed until they are done, failed or released, a consumer puts back the items of a dead one with
+    `reclaim` when it starts.
+    """
+
+    def __init__(self, db_file=UPLOAD_OUTBOX):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.reclaim()
+
+    def enqueue(self, kind, file_path=None, payload=None, priority=0, size=None):
+        if file_path is not None:
+            file_path = os.path.abspath(file_path)
+        if size is None:
+            size = os.path.getsize(file_path) if file_path is not None else 0
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO outbox (kind, file_path, payload, size, priority, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, file_path, json.dumps(payload) if payload is not None else None, size, priority, time.time())
+            )
+        return cursor.rowcount == 1
+
+    def enqueue_many(self, kind, payloads, priority=0):
+        """Enqueue json payloads in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT INTO outbox (kind, payload, priority, created_at) VALUES (?, ?, ?, ?)",
+                    [(kind, json.dumps(payload), priority, now) for payload in payloads]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def contains(self, file_path):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM outbox WHERE file_path = ?",
+                                    (os.path.abspath(file_path),)).fetchone() is not None
+
+    def claim(self, limit, kinds=None):
+        """Mark up to `limit` items that are due as uploading and return them, highest priority and oldest first."""
+        query = "SELECT * FROM outbox WHERE state = ? AND next_attempt <= ?"
+        params = [PENDING, time.time()]
+        if kinds is not None:
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        query += " ORDER BY priority DESC, created_at LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(query, params).fetchall()
+                self._db.executemany("UPDATE outbox SET state = ? WHERE id = ?",
+                                     [(UPLOADING, row["id"]) for row in rows])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [OutboxItem(row) for row in rows]
+
+    def reclaim(self):
+        """Put the items claimed by a consumer that died back to the queue, return their count."""
+        with self._lock:
+            cursor = self._db.execute("UPDATE outbox SET state = ? WHERE state = ?", (PENDING, UPLOADING))
+        if cursor.rowcount > 0:
+            logging.warning(f"{cursor.rowcount} items left uploading are put back to the upload outbox.")
+        return cursor.rowcount
+
+    def release(self, items):
+        """Put claimed items back to the queue without counting a retry."""
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET state = ? WHERE id = ?", [(PENDING, item.id) for item in items])
+
+    def done(self, items):
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", [(item.id,) for item in items])
+
+    def failed(self, items, error):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE outbox SET state = ?, retries = retries + 1, last_error = ?, next_attempt = ? WHERE id = ?",
+                [(PENDING, str(error), now + min(OUTBOX_RETRY_WAIT * 2 ** item.retries, OUTBOX_MAX_RETRY_WAIT),
+                  item.id) for item in items]
+            )
+
+    def stats(self):
+        """Return (item count, total size in bytes) of the queue."""
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outbox").fetchone()
+        return count, size
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        logging.info("Upload outbox closed.")
@@ -0,0 +1,122 @@
+import fcntl
+import os
+import struct
+
+V4L2_CID_CAMERA_CLASS_BASE = 0x009a0900
+V4L2_CID_EXPOSURE_AUTO = V4L2_CID_CAMERA_CLASS_BASE + 1
+V4L2_CID_EXPOSURE_ABSOLUTE = V4L2_CID_CAMERA_CLASS_BASE + 2
+
+V4L2_EXPOSURE_AUTO = 0
+V4L2_EXPOSURE_MANUAL = 1
+V4L2_EXPOSURE_SHUTTER_PRIORITY = 2
+V4L2_EXPOSURE_APERTURE_PRIORITY = 3
+
+CONTROL = struct.Struct("Ii")  # struct v4l2_control: id, value
+QUERY_CONTROL = struct.Struct("II32siiiiI2I")  # struct v4l2_queryctrl: id, type, name, min, max, step, default, flags
+
+
+def _iowr(number, size):
+    """_IOWR('V', number, size) of linux/videodev2.h"""
+    return (3 << 30) | (size << 16) | (ord("V") << 8) | number
+
+
+VIDIOC_G_CTRL = _iowr(27, CONTROL.size)
+VIDIOC_S_CTRL = _iowr(28, CONTROL.size)
+VIDIOC_QUERYCTRL = _iowr(36, QUERY_CONTROL.size)
+
+
+class ControlRange:
+    def __init__(self, name, minimum, maximum, step, default):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.default = default
+
+    def clamp(self, value):
+        return min(max(value, self.minimum), self.maximum)
+
+
+class V4l2Controls:
+    """
+    Reads and sets the controls of a video device with ioctls on its file descriptor, without v4l2-ctl processes.
+
+    The values read or set are cached, `get` reads the device only for a control not read yet and `set` skips the
+    ioctl when the control already has the value. Values are clamped to the range the driver reports.
+    Raises OSError when the device doesn't support a control.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self._fd = None
+        self._values = {}
+        self._ranges = {}
+        self.ioctl_count = 0
+
+    def open(self):
+        if self._fd is None:
+            self._fd = os.open(self.device, os.O_RDWR | os.O_NONBLOCK)
+            self._values.clear()
+        return self
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._values.clear()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _ioctl(self, request, buffer):
+        self.open()
+        self.ioctl_count += 1
+        return fcntl.ioctl(self._fd, request, buffer)
+
+    def query(self, control_id):
+        """Return the ControlRange of the control."""
+        control_range = self._ranges.get(control_id)
+        if control_range is None:
+            buffer = bytearray(QUERY_CONTROL.pack(control_id, 0, b"", 0, 0, 0, 0, 0, 0, 0))
+            self._ioctl(VIDIOC_QUERYCTRL, buffer)
+            _, _, name, minimum, maximum, step, default, _, _, _ = QUERY_CONTROL.unpack(buffer)
+            control_range = ControlRange(name.rstrip(b"\0").decode(errors="replace"), minimum, maximum, step, default)
+            self._ranges[control_id] = control_range
+        return control_range
+
+    def get(self, control_id, cached=True):
+        if cached and control_id in self._values:
+            return self._values[control_id]
+        buffer = bytearray(CONTROL.pack(control_id, 0))
+        self._ioctl(VIDIOC_G_CTRL, buffer)
+        value = CONTROL.unpack(buffer)[1]
+        self._values[control_id] = value
+        return value
+
+    def set(self, control_id, value):
+        """Set the control to `value` clamped to its range, return the value set."""
+        value = self.query(control_id).clamp(int(value))
+        if self._values.get(control_id) == value:
+            return value
+        buffer = bytearray(CONTROL.pack(control_id, value))
+        self._ioctl(VIDIOC_S_CTRL, buffer)
+        self._values[control_id] = CONTROL.unpack(buffer)[1]
+        return self._values[control_id]
+
+    def get_exposure_mode(self):
+        return self.get(V4L2_CID_EXPOSURE_AUTO)
+
+    def set_exposure_mode(self, mode):
+        return self.set(V4L2_CID_EXPOSURE_AUTO, mode)
+
+    def query_exposure(self):
+        return self.query(V4L2_CID_EXPOSURE_ABSOLUTE)
+
+    def get_exposure(self):
+        return self.get(V4L2_CID_EXPOSURE_ABSOLUTE)
+
+    def set_exposure(self, exposure):
+        return self.set(V4L2_CID_EXPOSURE_ABSOLUTE, exposure)